@@ -1,10 +1,14 @@
 """Main module. Loads configuration and executes main control loops."""
+import copy
+import functools
 import logging
 import os
 import sys
-from typing import List, NewType
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NewType, Optional
 
 import configargparse
+import yaml
 
 from step_exec_lib.steps import (
     BuildStep,
@@ -13,10 +17,36 @@ from step_exec_lib.steps import (
 from step_exec_lib.types import STEP_ALL
 
 from app_build_suite.build_steps.helm import HelmBuildFilteringPipeline
-from step_exec_lib.errors import ConfigError
-from step_exec_lib.steps import Runner
+from app_build_suite.build_steps.pipeline import StepWrappingPipeline
+from step_exec_lib.errors import ConfigError, Error, ValidationError
 
 from app_build_suite.build_steps.steps import ALL_STEPS
+from app_build_suite.checkpoints import get_checkpoint_dir, get_state_file_path, step_checkpointer
+from app_build_suite.fast_check import (
+    find_charts_of_files,
+    format_fast_check_report,
+    get_fast_check_failure,
+    get_staged_files,
+    run_fast_checks,
+)
+from app_build_suite.history import BuildHistory, get_default_history_file_path
+from app_build_suite.monorepo import (
+    ChartBuildResult,
+    ChartNode,
+    MonorepoBuilder,
+    build_chart as monorepo_build_chart,
+    build_dependency_graph,
+    format_build_summary,
+    get_build_order,
+)
+from app_build_suite.plan import format_execution_plan, get_execution_plan
+from app_build_suite.prune import RetentionPolicy, format_prune_report, prune_catalog
+from app_build_suite.runner import BuildRunner
+from app_build_suite.sharding import parse_shard, select_shard
+from app_build_suite.utils.logs import ALL_LOG_FORMATS, LOG_FORMAT_TEXT, configure_logging, step_log_context
+from app_build_suite.utils.processes import parse_step_timeouts, process_limits, rlimits_supported
+from app_build_suite.utils.profiling import step_profiler
+from app_build_suite.work_queue import FileWorkQueue, QueueWorker, create_jobs, get_default_worker_id
 
 ver = "v0.0.0-dev"
 app_name = "app_build_suite"
@@ -53,6 +83,20 @@ def configure_global_options(config_parser: configargparse.ArgParser) -> None:
         help="Enable debug messages.",
     )
     config_parser.add_argument("--version", action="version", version=f"{app_name} {get_version()}")
+    config_parser.add_argument(
+        "--log-format",
+        required=False,
+        default=LOG_FORMAT_TEXT,
+        choices=ALL_LOG_FORMATS,
+        help="Format of log messages. 'json' writes one JSON object per line, including step and chart names.",
+    )
+    config_parser.add_argument(
+        "--step-log-dir",
+        required=False,
+        default="",
+        help="If set, messages logged by each build step are saved to a separate file in this directory and "
+        "only warnings and errors of build steps are shown on the console.",
+    )
     config_parser.add_argument(
         "-b",
         "--build-engine",
@@ -76,6 +120,200 @@ def configure_global_options(config_parser: configargparse.ArgParser) -> None:
         required=False,
         default=[],
     )
+    config_parser.add_argument(
+        "--plan",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Don't run the build, only show which steps would be executed and their expected durations.",
+    )
+    config_parser.add_argument(
+        "--default-step-timeout",
+        required=False,
+        default=0,
+        type=float,
+        help="Max time in seconds each build step can spend running external tools. 0 means no limit.",
+    )
+    config_parser.add_argument(
+        "--step-timeouts",
+        required=False,
+        default="",
+        help="Comma separated list of time limits for specific steps, overriding '--default-step-timeout', "
+        "like 'KubeLinter=120,HelmRequirementsUpdater=300'.",
+    )
+    config_parser.add_argument(
+        "--child-max-memory",
+        required=False,
+        default=0,
+        type=int,
+        help="Max size of address space in MiB of every external tool process and the processes it starts. "
+        "Requires the 'prlimit' command. 0 means no limit.",
+    )
+    config_parser.add_argument(
+        "--child-max-cpu-time",
+        required=False,
+        default=0,
+        type=int,
+        help="Max CPU time in seconds of every external tool process and the processes it starts. "
+        "Requires the 'prlimit' command. 0 means no limit.",
+    )
+    config_parser.add_argument(
+        "--profile-steps",
+        required=False,
+        default="",
+        help="If set, Python code of every build step is profiled with cProfile and the results are saved to "
+        "'<step name>.prof' files in this directory.",
+    )
+    config_parser.add_argument(
+        "--profile-memory",
+        required=False,
+        default=False,
+        action="store_true",
+        help="With '--profile-steps', also trace memory allocations of every build step and save the top "
+        "allocation sites to '<step name>.memory.txt' files.",
+    )
+    config_parser.add_argument(
+        "--profile-memory-top",
+        required=False,
+        default=25,
+        type=int,
+        help="Number of allocation sites included in memory summaries.",
+    )
+    config_parser.add_argument(
+        "--monorepo-root",
+        required=False,
+        default="",
+        help="If set, all the charts found in this directory are built, in the order required by their 'file://' "
+        "dependencies. Charts built in this run are used as subcharts of charts depending on them. "
+        "'--chart-dir' is ignored in this mode.",
+    )
+    config_parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        default=1,
+        type=int,
+        help="Max number of charts built concurrently in '--monorepo-root' mode.",
+    )
+    config_parser.add_argument(
+        "--shard",
+        required=False,
+        default="",
+        help="In '--monorepo-root' mode, build only the charts of shard 'i/N' (like '2/4'), for CI jobs splitting "
+        "the build. Shards are balanced by sizes of charts.",
+    )
+    config_parser.add_argument(
+        "--shard-by-history",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Balance '--shard' shards by durations of previous builds from '--history-file'. The history file "
+        "has to be the same for all the jobs, otherwise they split the charts differently.",
+    )
+    config_parser.add_argument(
+        "--queue-dir",
+        required=False,
+        default="",
+        help="In '--monorepo-root' mode, share builds of charts with other 'abs' processes, also on other machines, "
+        "through a work queue in this directory. The directory and '--destination' have to be on a filesystem "
+        "shared by all the workers.",
+    )
+    config_parser.add_argument(
+        "--queue-lease-timeout",
+        required=False,
+        default=300,
+        type=float,
+        help="Seconds after which a chart build claimed from '--queue-dir' by a worker that stopped responding "
+        "is claimed by another worker.",
+    )
+    config_parser.add_argument(
+        "--queue-worker-id",
+        required=False,
+        default="",
+        help="Unique id of this worker in '--queue-dir'. Defaults to a random id based on the host name, "
+        "created when the workers start.",
+    )
+    config_parser.add_argument(
+        "--fast",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Don't run the build, only run the checks that don't need external tools for charts containing "
+        "files staged in git. Meant to be used in a git pre-commit hook.",
+    )
+    config_parser.add_argument(
+        "--fast-budget",
+        required=False,
+        default=1.0,
+        type=float,
+        help="Time in seconds '--fast' mode can spend checking charts. Charts not checked in time are skipped "
+        "and fail the run, unless '--fast-allow-partial' is used.",
+    )
+    config_parser.add_argument(
+        "--fast-allow-partial",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Don't fail '--fast' mode when some charts were skipped, because '--fast-budget' was used up.",
+    )
+    config_parser.add_argument(
+        "--prune-catalog",
+        required=False,
+        default="",
+        help="Don't run the build, prune old chart versions from this catalog directory instead. Versions kept "
+        "by none of the '--prune-keep-*' policies are removed with their metadata and entries in 'index.yaml'.",
+    )
+    config_parser.add_argument(
+        "--prune-keep-last",
+        required=False,
+        default=10,
+        type=int,
+        help="Number of the most recently created versions of each chart kept by '--prune-catalog'.",
+    )
+    config_parser.add_argument(
+        "--prune-keep-days",
+        required=False,
+        default=0,
+        type=float,
+        help="Versions created less than this many days ago are kept by '--prune-catalog'. 0 disables the policy.",
+    )
+    config_parser.add_argument(
+        "--prune-keep-tagged",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Keep all tagged releases (versions without a pre-release part) when using '--prune-catalog'.",
+    )
+    config_parser.add_argument(
+        "--prune-dry-run",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Only show which versions '--prune-catalog' would remove.",
+    )
+    config_parser.add_argument(
+        "--resume",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Resume a failed build: skip the build stage of checking steps that succeeded in a previous build "
+        "of the chart if their inputs (chart files, config files and options) didn't change.",
+    )
+    config_parser.add_argument(
+        "--checkpoint-dir",
+        required=False,
+        default="",
+        help="Directory where checkpoints of build steps are saved for '--resume'. Checkpoints are only saved "
+        "if this option or '--resume' is set; '--resume' uses '$XDG_CACHE_HOME/app_build_suite/checkpoints' "
+        "by default.",
+    )
+    config_parser.add_argument(
+        "--history-file",
+        required=False,
+        default=get_default_history_file_path(),
+        help="Path to the file where durations of build steps are recorded. Used to estimate durations "
+        "in '--plan' mode. Set to empty string to disable.",
+    )
 
 
 def get_default_config_file_path() -> str:
@@ -99,12 +337,15 @@ def get_default_config_file_path() -> str:
     return config_path
 
 
-def get_global_config_parser(add_help: bool = True) -> configargparse.ArgParser:
-    config_file_path = get_default_config_file_path()
+def get_global_config_parser(
+    add_help: bool = True, default_config_files: Optional[List[str]] = None
+) -> configargparse.ArgParser:
+    if default_config_files is None:
+        default_config_files = [get_default_config_file_path()]
     config_parser = configargparse.ArgParser(
         prog=app_name,
         add_config_file_help=True,
-        default_config_files=[config_file_path],
+        default_config_files=default_config_files,
         description="Build and test Giant Swarm App Platform app.",
         add_env_var_help=True,
         auto_env_var_prefix="ABS_",
@@ -115,6 +356,45 @@ def get_global_config_parser(add_help: bool = True) -> configargparse.ArgParser:
     return config_parser
 
 
+def validate_limit_options(config: configargparse.Namespace) -> None:
+    parse_step_timeouts(config.step_timeouts)
+    for option in ["default_step_timeout", "child_max_memory", "child_max_cpu_time"]:
+        if getattr(config, option) < 0:
+            raise ConfigError(option.replace("_", "-"), "Value can't be negative.")
+    if (config.child_max_memory or config.child_max_cpu_time) and not rlimits_supported():
+        raise ConfigError(
+            "child-max-memory", "Resource limits of external tools require the 'prlimit' binary from util-linux."
+        )
+
+
+def validate_numeric_options(config: configargparse.Namespace) -> None:
+    validate_limit_options(config)
+    if config.profile_memory_top < 1:
+        raise ConfigError("profile-memory-top", "At least 1 allocation site has to be included.")
+    if config.jobs < 1:
+        raise ConfigError("jobs", "At least 1 job is required.")
+    if config.fast_budget <= 0:
+        raise ConfigError("fast-budget", "Budget has to be positive.")
+    if config.queue_lease_timeout <= 0:
+        raise ConfigError("queue-lease-timeout", "Timeout has to be positive.")
+    for option in ["prune_keep_last", "prune_keep_days"]:
+        if getattr(config, option) < 0:
+            raise ConfigError(option.replace("_", "-"), "Value can't be negative.")
+
+
+def validate_monorepo_options(config: configargparse.Namespace) -> None:
+    if config.monorepo_root and not os.path.isdir(config.monorepo_root):
+        raise ConfigError("monorepo-root", f"Directory '{config.monorepo_root}' doesn't exist.")
+    if config.queue_dir and not config.monorepo_root:
+        raise ConfigError("queue-dir", "A work queue can be used only with '--monorepo-root'.")
+    if config.shard:
+        parse_shard(config.shard)
+        if not config.monorepo_root or config.queue_dir:
+            raise ConfigError("shard", "Sharding can be used only with '--monorepo-root' and without '--queue-dir'.")
+    if config.shard_by_history and not (config.shard and config.history_file):
+        raise ConfigError("shard-by-history", "Balancing by history needs '--shard' and '--history-file'.")
+
+
 def validate_global_config(config: configargparse.Namespace) -> None:
     # validate build engine
     if config.build_engine not in ALL_BUILD_ENGINES:
@@ -129,6 +409,10 @@ def validate_global_config(config: configargparse.Namespace) -> None:
     for step in config.steps + config.skip_steps:
         if step not in ALL_STEPS:
             raise ConfigError("steps", f"Unknown step '{step}'. Valid steps are: {ALL_STEPS}.")
+    validate_numeric_options(config)
+    if config.prune_catalog and not os.path.isdir(config.prune_catalog):
+        raise ConfigError("prune-catalog", f"Directory '{config.prune_catalog}' doesn't exist.")
+    validate_monorepo_options(config)
 
 
 def get_config(steps: List[BuildStep]) -> configargparse.Namespace:
@@ -149,19 +433,151 @@ def get_config(steps: List[BuildStep]) -> configargparse.Namespace:
 
 
 def main() -> None:
-    log_format = "%(asctime)s %(name)s %(levelname)s: %(message)s"
-    logging.basicConfig(format=log_format)
-    logging.getLogger().setLevel(logging.INFO)
-
     global_only_config_parser = get_global_config_parser(add_help=False)
     global_only_config = global_only_config_parser.parse_known_args()[0]
-    if global_only_config.debug:
-        logging.getLogger().setLevel(logging.DEBUG)
+    log_listener = configure_logging(
+        logging.DEBUG if global_only_config.debug else logging.INFO,
+        global_only_config.log_format,
+        global_only_config.step_log_dir,
+    )
+    try:
+        run_build()
+    finally:
+        log_listener.stop()
+
+
+def add_step_wrappers(steps: List[BuildStep], config: configargparse.Namespace, history: BuildHistory) -> None:
+    for pipeline in steps:
+        if isinstance(pipeline, StepWrappingPipeline):
+            pipeline.add_step_wrapper(step_log_context(config.chart_dir))
+            checkpoint_dir = get_checkpoint_dir(config)
+            if checkpoint_dir:
+                # skipped steps are not timed, so they don't distort the history
+                state_file_path = get_state_file_path(checkpoint_dir, config.chart_dir)
+                pipeline.add_step_wrapper(step_checkpointer(config, state_file_path, config.resume))
+            pipeline.add_step_wrapper(history.step_timer(config.chart_dir))
+            pipeline.add_step_wrapper(process_limits(config))
+            if config.profile_steps:
+                profile_dir = config.profile_steps
+                if config.monorepo_root:
+                    profile_dir = os.path.join(profile_dir, os.path.basename(os.path.abspath(config.chart_dir)))
+                pipeline.add_step_wrapper(step_profiler(profile_dir, config.profile_memory, config.profile_memory_top))
+
+
+def run_queue_workers(
+    config: configargparse.Namespace,
+    graph: Dict[str, ChartNode],
+    history: BuildHistory,
+    build_chart: Callable[[str, Dict[str, str]], ChartBuildResult],
+) -> Dict[str, ChartBuildResult]:
+    """Adds the charts to the shared work queue and runs '--jobs' workers until all the charts are built."""
+    jobs = create_jobs(graph, config.monorepo_root, lambda d: history.get_expected_chart_duration(d) or 0.0)
+    workers: List[QueueWorker] = []
+    base_worker_id = config.queue_worker_id or get_default_worker_id()
+    for index in range(config.jobs):
+        worker_id = base_worker_id if config.jobs == 1 else f"{base_worker_id}-{index}"
+        queue = FileWorkQueue(config.queue_dir, worker_id, config.queue_lease_timeout)
+        if index == 0:
+            queue.add_jobs(jobs)
+        workers.append(QueueWorker(queue, config.monorepo_root, build_chart))
+    with ThreadPoolExecutor(max_workers=config.jobs, thread_name_prefix="queue-worker") as executor:
+        futures = [executor.submit(worker.run) for worker in workers]
+        # all the workers return the same results, read from the queue
+        return [future.result() for future in futures][0]
+
+
+def run_monorepo_build(config: configargparse.Namespace, history: BuildHistory) -> None:
+    graph = build_dependency_graph(config.monorepo_root)
+    if config.shard:
+        graph = select_shard(graph, parse_shard(config.shard), history if config.shard_by_history else None)
+    try:
+        order = get_build_order(graph)
+    except ValidationError as e:
+        logger.error(f"Can't build charts in '{config.monorepo_root}': {e.msg}")
+        sys.exit(1)
+    if config.plan:
+        for chart_dir in order:
+            chart_config = copy.copy(config)
+            chart_config.chart_dir = chart_dir
+            print(format_execution_plan(chart_config, get_execution_plan(chart_config, get_pipeline(), history)))
+        return
 
+    def create_pipeline(chart_config: configargparse.Namespace) -> List[BuildStep]:
+        chart_steps: List[BuildStep] = list(get_pipeline())
+        add_step_wrappers(chart_steps, chart_config, history)
+        return chart_steps
+
+    build_chart = functools.partial(monorepo_build_chart, config, create_pipeline)
+    try:
+        if config.queue_dir:
+            results = run_queue_workers(config, graph, history, build_chart)
+        else:
+            results = MonorepoBuilder(graph, build_chart, config.jobs).run()
+    finally:
+        history.save()
+    logger.info(format_build_summary(results))
+    if not all(r.succeeded for r in results.values()):
+        logger.error("Exit 1 due to failed chart builds.")
+        sys.exit(1)
+
+
+def run_fast_check(config: configargparse.Namespace) -> None:
+    root_dir = config.monorepo_root or config.chart_dir
+    try:
+        staged_files = get_staged_files(root_dir)
+    except Error as e:
+        logger.error(f"Can't run fast checks: {e.msg}")
+        sys.exit(1)
+    chart_dirs = find_charts_of_files(staged_files, root_dir)
+    if not chart_dirs:
+        logger.info("No charts with staged files found, nothing to check.")
+        return
+    report = run_fast_checks(config, chart_dirs, config.fast_budget)
+    logger.info(format_fast_check_report(report))
+    failure = get_fast_check_failure(report, config.fast_budget, config.fast_allow_partial)
+    if failure:
+        logger.error(failure)
+        sys.exit(1)
+    if report.skipped:
+        logger.warning(f"{len(report.skipped)} chart(s) were not checked within {config.fast_budget}s.")
+
+
+def run_prune_catalog(config: configargparse.Namespace) -> None:
+    policy = RetentionPolicy(config.prune_keep_last, config.prune_keep_days, config.prune_keep_tagged)
+    try:
+        report = prune_catalog(config.prune_catalog, policy, config.prune_dry_run)
+    except (OSError, yaml.YAMLError) as e:
+        logger.error(f"Can't prune catalog '{config.prune_catalog}': {e}")
+        sys.exit(1)
+    logger.info(format_prune_report(report, config.prune_dry_run))
+
+
+def run_build() -> None:
     steps = get_pipeline()
     config = get_config(steps)
-    runner = Runner(config, steps)
-    runner.run()
+    if config.prune_catalog:
+        run_prune_catalog(config)
+        return
+    if config.fast:
+        run_fast_check(config)
+        return
+    history = BuildHistory(config.history_file)
+    if config.monorepo_root:
+        run_monorepo_build(config, history)
+        return
+    if config.plan:
+        print(format_execution_plan(config, get_execution_plan(config, steps, history)))
+        return
+
+    add_step_wrappers(steps, config, history)
+    runner = BuildRunner(config, list(steps))
+    try:
+        runner.run()
+    finally:
+        history.save()
+    if runner.has_failed:
+        logger.error("Exit 1 due to failed build.")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
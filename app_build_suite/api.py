@@ -0,0 +1,168 @@
+"""
+Python API for building charts from another program. Config objects are created directly from keyword
+arguments, without parsing the command line, and failed builds are reported in results instead of exiting
+the process, so a single process can run many builds, also concurrently.
+"""
+import argparse
+import copy
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from step_exec_lib.errors import ConfigError, Error
+from step_exec_lib.steps import BuildStep, BuildStepsFilteringPipeline
+from step_exec_lib.utils.files import get_file_sha256
+
+from app_build_suite.__main__ import get_global_config_parser, get_pipeline, validate_global_config
+from app_build_suite.build_steps.helm import context_key_chart_digest, context_key_chart_full_path
+from app_build_suite.build_steps.pipeline import StepWrapper, StepWrappingPipeline
+from app_build_suite.runner import BuildRunner
+from app_build_suite.utils.logs import step_log_context
+from app_build_suite.utils.processes import process_limits
+
+logger = logging.getLogger(__name__)
+
+# options of the command line modes that don't build a single chart
+UNSUPPORTED_OPTIONS = {"monorepo_root", "fast", "plan", "prune_catalog", "resume"}
+
+
+class StepStatus(NamedTuple):
+    name: str
+    stage: str
+    succeeded: bool
+    # seconds spent executing the stage
+    duration: float
+    error: str = ""
+
+
+class BuildResult(NamedTuple):
+    chart_dir: str
+    succeeded: bool
+    # path and sha256 digest of the chart archive, if the chart was packaged
+    chart_path: Optional[str]
+    digest: Optional[str]
+    # executed stages of the steps, in the order of execution
+    steps: List[StepStatus]
+
+    @property
+    def error(self) -> str:
+        """Returns the error of the first failed step, empty if no step failed."""
+        return next((f"{s.name}: {s.error}" for s in self.steps if not s.succeeded), "")
+
+
+def step_recorder(statuses: List[StepStatus], clock: Callable[[], float] = time.perf_counter) -> StepWrapper:
+    """Returns a StepWrapper that appends the status and duration of every executed stage to 'statuses'."""
+
+    def wrapper(step: BuildStep, stage: str, call: Callable[[], None]) -> None:
+        start = clock()
+        try:
+            call()
+        except Error as e:
+            statuses.append(StepStatus(step.name, stage, False, clock() - start, e.msg))
+            raise
+        statuses.append(StepStatus(step.name, stage, True, clock() - start))
+
+    return wrapper
+
+
+class ChartBuilder:
+    """
+    Builds charts with configs created from keyword arguments. Default values of all the options are computed
+    once and pipelines are reused by the following builds; a pipeline is used by one build at a time, so
+    concurrent builds get separate pipelines. Checks of external tools' versions are cached for the whole
+    process. Builds don't record history and don't save checkpoints.
+    """
+
+    def __init__(self, pipeline_factory: Callable[[], List[BuildStepsFilteringPipeline]] = get_pipeline):
+        """
+        :param pipeline_factory: creates the pipelines to build charts with
+        """
+        self._pipeline_factory = pipeline_factory
+        self._lock = threading.Lock()
+        self._idle_pipelines: List[List[BuildStepsFilteringPipeline]] = []
+        pipelines = pipeline_factory()
+        # configuration files and environment variables are ignored; all the options come from the caller
+        config_parser = get_global_config_parser(add_help=False, default_config_files=[])
+        for pipeline in pipelines:
+            pipeline.initialize_config(config_parser)
+        self._defaults = config_parser.parse_args(args=[], env_vars={})
+        self._idle_pipelines.append(pipelines)
+
+    def create_config(self, chart_dir: str, **options: Any) -> argparse.Namespace:
+        """
+        Creates the config of a build: the default values of all the options overridden with 'options'.
+        :param chart_dir: directory of the chart to build
+        :param options: values of options, named like attributes of the config object, like 'destination'
+        or 'generate_metadata'
+        :return: the validated config
+        :raises ConfigError: if an option is unknown or unsupported, or a value is invalid
+        """
+        config = copy.copy(self._defaults)
+        for name, value in options.items():
+            if not hasattr(config, name) or name in UNSUPPORTED_OPTIONS:
+                raise ConfigError(name, "Unknown option or option not supported by the build API.")
+            setattr(config, name, value)
+        config.chart_dir = chart_dir
+        validate_global_config(config)
+        return config
+
+    def _acquire_pipelines(self) -> List[BuildStepsFilteringPipeline]:
+        with self._lock:
+            if self._idle_pipelines:
+                return self._idle_pipelines.pop()
+        return self._pipeline_factory()
+
+    def _release_pipelines(self, pipelines: List[BuildStepsFilteringPipeline]) -> None:
+        with self._lock:
+            self._idle_pipelines.append(pipelines)
+
+    def build(self, chart_dir: str, **options: Any) -> BuildResult:
+        """
+        Runs the whole build pipeline for the chart.
+        :param chart_dir: directory of the chart to build
+        :param options: values of options, as accepted by 'create_config'
+        :return: result of the build
+        :raises ConfigError: if the options are invalid
+        """
+        config = self.create_config(chart_dir, **options)
+        statuses: List[StepStatus] = []
+        pipelines = self._acquire_pipelines()
+        for pipeline in pipelines:
+            if isinstance(pipeline, StepWrappingPipeline):
+                pipeline.clear_step_wrappers()
+                pipeline.add_step_wrapper(step_log_context(chart_dir))
+                pipeline.add_step_wrapper(process_limits(config))
+                pipeline.add_step_wrapper(step_recorder(statuses))
+        runner = BuildRunner(config, list(pipelines))
+        # if an unexpected exception is raised, the steps may be left in any state, so the pipelines are
+        # dropped instead of being reused by the following builds
+        runner.run()
+        self._release_pipelines(pipelines)
+        chart_path = runner.context.get(context_key_chart_full_path)
+        digest = runner.context.get(context_key_chart_digest)
+        if chart_path is not None and digest is None and os.path.isfile(chart_path):
+            digest = get_file_sha256(chart_path)
+        return BuildResult(chart_dir, not runner.has_failed, chart_path, digest, statuses)
+
+
+_default_builder: Optional[ChartBuilder] = None
+_default_builder_lock = threading.Lock()
+
+
+def build_chart(chart_dir: str, **options: Any) -> BuildResult:
+    """
+    Builds the chart with a ChartBuilder shared by all the calls in the process.
+    :param chart_dir: directory of the chart to build
+    :param options: values of options, named like attributes of the config object, like 'destination'
+    or 'generate_metadata'
+    :return: result of the build
+    :raises ConfigError: if the options are invalid
+    """
+    global _default_builder
+    with _default_builder_lock:
+        if _default_builder is None:
+            _default_builder = ChartBuilder()
+        builder = _default_builder
+    return builder.build(chart_dir, **options)
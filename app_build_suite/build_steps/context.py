@@ -0,0 +1,166 @@
+"""
+Context object passed between build steps. BuildContext is a dict, so steps can keep using keys like
+'context[context_key_chart_full_path]', but it also offers typed attributes for the keys used by the build
+steps and can create snapshots for steps running concurrently. A snapshot is a copy of the context taken
+when the concurrent work starts. Merging a snapshot back detects keys changed both in the snapshot and
+in the parent since the snapshot was taken.
+"""
+import copy
+import threading
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar, overload
+
+from app_build_suite.errors import BuildError
+
+context_key_chart_full_path: str = "chart_full_path"
+context_key_chart_file_name: str = "chart_file_name"
+context_key_git_version: str = "git_version"
+context_key_changes_made: str = "changes_made"
+context_key_meta_dir_path: str = "meta_dir_path"
+context_key_chart_lock_files_to_restore: str = "chart_lock_files_to_restore"
+context_key_oci_references: str = "oci_references"
+context_key_chart_digest: str = "chart_digest"
+context_key_prebuilt_subcharts: str = "prebuilt_subcharts"
+context_key_injected_subcharts: str = "injected_subcharts"
+context_key_replaced_subcharts: str = "replaced_subcharts"
+context_key_rendered_manifests: str = "rendered_manifests"
+context_key_manifest_index: str = "manifest_index"
+context_key_package_size: str = "package_size"
+context_key_meta_file_digests: str = "meta_file_digests"
+context_key_version_overrides: str = "version_overrides"
+context_key_package_dir: str = "package_dir"
+context_key_staged_chart_dir: str = "staged_chart_dir"
+context_key_staged_dirs: str = "staged_dirs"
+context_key_lint_results: str = "lint_results"
+
+T = TypeVar("T")
+_missing = object()
+# default value factories of the typed attributes, by context key
+_field_defaults: Dict[str, Callable[[], Any]] = {}
+
+# keys that can be changed concurrently; values are combined with the function instead of being a conflict
+MERGE_RULES: Dict[str, Callable[[Any, Any], Any]] = {
+    # any step that changed chart files requires them to be restored
+    context_key_changes_made: lambda parent, snapshot: bool(parent) or bool(snapshot),
+    # every lint shard adds the result of its values file
+    context_key_lint_results: lambda parent, snapshot: {**parent, **snapshot},
+}
+
+
+class ContextConflictError(BuildError):
+    """Raised when a snapshot and its parent context both changed the same key to different values."""
+
+    def __init__(self, source: str, keys: List[str]):
+        super().__init__(source, f"Context keys {keys} were changed concurrently to different values.")
+        self.keys = keys
+
+
+class _Field(Generic[T]):
+    """Typed attribute of BuildContext stored under a context key."""
+
+    def __init__(self, key: str, default_factory: Callable[[], T]):
+        self.key = key
+        self._default_factory = default_factory
+        _field_defaults[key] = default_factory
+
+    @overload
+    def __get__(self, instance: None, owner: Any) -> "_Field[T]":
+        ...
+
+    @overload
+    def __get__(self, instance: "BuildContext", owner: Any) -> T:
+        ...
+
+    def __get__(self, instance: Optional["BuildContext"], owner: Any) -> Any:
+        if instance is None:
+            return self
+        # the default is stored, so changes of mutable defaults, like 'context.staged_dirs.append()', persist
+        return instance.setdefault(self.key, self._default_factory())
+
+    def __set__(self, instance: "BuildContext", value: T) -> None:
+        instance[self.key] = value
+
+
+class BuildContext(Dict[str, Any]):
+    """Context of a single chart's build, compatible with step_exec_lib's 'Context' dict."""
+
+    __slots__ = ("_base", "_lock")
+
+    chart_full_path = _Field[Optional[str]](context_key_chart_full_path, lambda: None)
+    chart_file_name = _Field[Optional[str]](context_key_chart_file_name, lambda: None)
+    git_version = _Field[Optional[str]](context_key_git_version, lambda: None)
+    changes_made = _Field[bool](context_key_changes_made, lambda: False)
+    meta_dir_path = _Field[Optional[str]](context_key_meta_dir_path, lambda: None)
+    chart_lock_files_to_restore = _Field[List[str]](context_key_chart_lock_files_to_restore, list)
+    oci_references = _Field[List[str]](context_key_oci_references, list)
+    chart_digest = _Field[Optional[str]](context_key_chart_digest, lambda: None)
+    prebuilt_subcharts = _Field[Dict[str, str]](context_key_prebuilt_subcharts, dict)
+    injected_subcharts = _Field[List[str]](context_key_injected_subcharts, list)
+    replaced_subcharts = _Field[Dict[str, str]](context_key_replaced_subcharts, dict)
+    rendered_manifests = _Field[List[Any]](context_key_rendered_manifests, list)
+    manifest_index = _Field[Any](context_key_manifest_index, lambda: None)
+    package_size = _Field[Any](context_key_package_size, lambda: None)
+    meta_file_digests = _Field[Dict[str, str]](context_key_meta_file_digests, dict)
+    version_overrides = _Field[Dict[str, str]](context_key_version_overrides, dict)
+    package_dir = _Field[Optional[str]](context_key_package_dir, lambda: None)
+    staged_chart_dir = _Field[Optional[str]](context_key_staged_chart_dir, lambda: None)
+    staged_dirs = _Field[List[str]](context_key_staged_dirs, list)
+    lint_results = _Field[Dict[str, Any]](context_key_lint_results, dict)
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # values of the parent context when the snapshot was taken, used to find keys changed since then
+        self._base: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> "BuildContext":
+        """
+        Returns a copy of the context for a step running concurrently with other steps. Lists, dicts and sets
+        are copied, so they can be modified in place without changing the parent.
+        """
+        with self._lock:
+            snapshot = BuildContext({key: _copy_value(value) for key, value in self.items()})
+            snapshot._base = {key: _copy_value(value) for key, value in self.items()}
+        return snapshot
+
+    def merge(self, snapshot: "BuildContext", source: str) -> None:
+        """
+        Applies keys changed in the snapshot to this context. Snapshots of concurrent steps can be merged
+        in any order; a key changed in the snapshot is a conflict if it was also changed in this context
+        since the snapshot was taken, to a different value, and there's no merge rule for it.
+        :param snapshot: a snapshot created by this context's 'snapshot'
+        :param source: name of the step that used the snapshot, used in errors
+        :raises ContextConflictError: if there are conflicting changes; nothing is merged then
+        """
+        with self._lock:
+            changes: Dict[str, Any] = {}
+            conflicts: List[str] = []
+            for key in sorted(set(snapshot) | set(snapshot._base)):
+                base = snapshot._base.get(key, _missing)
+                value = snapshot.get(key, _missing)
+                if not _is_changed(key, value, base):
+                    continue
+                current = self.get(key, _missing)
+                if not _is_changed(key, current, base) or current == value:
+                    changes[key] = value
+                elif key in MERGE_RULES and value is not _missing and current is not _missing:
+                    changes[key] = MERGE_RULES[key](current, value)
+                else:
+                    conflicts.append(key)
+            if conflicts:
+                raise ContextConflictError(source, conflicts)
+            for key, value in changes.items():
+                if value is _missing:
+                    self.pop(key, None)
+                else:
+                    self[key] = value
+
+
+def _copy_value(value: Any) -> Any:
+    return copy.copy(value) if isinstance(value, (list, dict, set)) else value
+
+
+def _is_changed(key: str, value: Any, base: Any) -> bool:
+    # defaults stored by reading typed attributes of missing keys are not changes
+    if base is _missing and key in _field_defaults and value == _field_defaults[key]():
+        return False
+    return bool(value != base)
@@ -0,0 +1,258 @@
+"""
+In-process resolution of chart dependencies hosted in HTTP chart repositories. Versions are taken from the
+chart's lock file, each repository's 'index.yaml' is fetched once per run and archives are downloaded
+concurrently over pooled connections and verified against digests from the repository index.
+"""
+import contextvars
+import hashlib
+import http.client
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import yaml
+from step_exec_lib.errors import Error
+
+from app_build_suite.build_steps.helm_consts import CHART_LOCK, REQUIREMENTS_LOCK
+from app_build_suite.build_steps.index_cache import IndexCache, InMemoryIndex, RepositoryIndex
+from app_build_suite.utils.http import HttpConnectionPool, HttpResponse
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+INDEX_YAML = "index.yaml"
+SUPPORTED_SCHEMES = ["http", "https"]
+
+
+class DependencyError(Error):
+    pass
+
+
+class LockedDependency(NamedTuple):
+    name: str
+    version: str
+    repository: str
+
+
+class ResolvedDependency(NamedTuple):
+    name: str
+    version: str
+    repository: str
+    url: str
+    digest: str
+
+    @property
+    def file_name(self) -> str:
+        return f"{self.name}-{self.version}.tgz"
+
+
+def _normalize_repository(repository: str) -> str:
+    return repository.rstrip("/")
+
+
+def read_locked_dependencies(chart_dir: str) -> List[LockedDependency]:
+    """Reads dependencies pinned in the chart's Chart.lock or, for 'apiVersion: v1' charts, requirements.lock."""
+    for lock_file in [CHART_LOCK, REQUIREMENTS_LOCK]:
+        lock_path = os.path.join(chart_dir, lock_file)
+        if os.path.isfile(lock_path):
+            with open(lock_path, "r") as f:
+                try:
+                    lock = yaml.safe_load(f) or {}
+                except yaml.YAMLError as e:
+                    raise DependencyError(f"Can't parse '{lock_path}': {e}")
+            return [
+                LockedDependency(str(d["name"]), str(d["version"]), _normalize_repository(str(d.get("repository", ""))))
+                for d in lock.get("dependencies") or []
+            ]
+    return []
+
+
+def get_unsupported_repositories(dependencies: List[Dict[str, Any]]) -> List[str]:
+    """Returns repositories of the dependencies that can't be resolved in-process, like 'file://' or 'oci://'."""
+    return sorted(
+        {
+            str(d.get("repository", ""))
+            for d in dependencies
+            if urlsplit(str(d.get("repository", ""))).scheme not in SUPPORTED_SCHEMES
+        }
+    )
+
+
+class NativeDependencyResolver:
+    """
+    Resolves and downloads chart dependencies. Repository indexes are cached for the lifetime of the
+    resolver, so a resolver shared by many builds fetches each index only once per run.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[HttpConnectionPool] = None,
+        max_workers: int = 8,
+        index_cache: Optional[IndexCache] = None,
+    ):
+        """
+        :param pool: connection pool to use for all the requests
+        :param max_workers: max number of concurrent requests
+        :param index_cache: optional on-disk cache of compiled indexes, revalidated with the repositories
+        """
+        self._pool = pool or HttpConnectionPool()
+        self._max_workers = max_workers
+        self._index_cache = index_cache
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, "Future[RepositoryIndex]"] = {}
+
+    def _request(self, url: str, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+        try:
+            return self._pool.request("GET", url, headers=headers)
+        except http.client.HTTPException as e:
+            raise DependencyError(f"Request to '{url}' failed: {e!r}")
+
+    @staticmethod
+    def _parse_index(url: str, body: bytes) -> Dict[str, Any]:
+        try:
+            index = yaml.load(body, Loader=SafeLoader)  # nosec, safe loader is used
+        except yaml.YAMLError as e:
+            raise DependencyError(f"Can't parse '{url}': {e}")
+        if not isinstance(index, dict) or not isinstance(index.get("entries"), dict):
+            raise DependencyError(f"'{url}' is not a valid chart repository index.")
+        return index
+
+    def _fetch_index(self, repository: str) -> RepositoryIndex:
+        url = f"{repository}/{INDEX_YAML}"
+        cached = self._index_cache.load(url) if self._index_cache is not None else None
+        logger.info(f"Fetching chart repository index '{url}'.")
+        response = self._request(url, headers=cached.validators if cached is not None else None)
+        if response.status == 304 and cached is not None:
+            logger.info(f"Index '{url}' was not modified, using the cached one.")
+            return cached.compiled
+        if cached is not None:
+            cached.compiled.close()
+        if response.status != 200:
+            raise DependencyError(f"Fetching '{url}' failed with HTTP status {response.status}.")
+        index = self._parse_index(url, response.body)
+        if self._index_cache is not None:
+            try:
+                compiled = self._index_cache.store(
+                    url, index["entries"], response.header("etag"), response.header("last-modified")
+                )
+            except OSError as e:
+                logger.warning(f"Can't save index '{url}' in the cache: {e}")
+                compiled = None
+            if compiled is not None:
+                return compiled
+        return InMemoryIndex(index["entries"])
+
+    def get_index(self, repository: str) -> RepositoryIndex:
+        """Returns the parsed index of the repository; only the first caller for each repository fetches it."""
+        repository = _normalize_repository(repository)
+        with self._lock:
+            future = self._indexes.get(repository)
+            is_owner = future is None
+            if future is None:
+                future = self._indexes[repository] = Future()
+        if is_owner:
+            try:
+                future.set_result(self._fetch_index(repository))
+            except BaseException as e:
+                # let the next build try again
+                with self._lock:
+                    del self._indexes[repository]
+                future.set_exception(e)
+        return future.result()
+
+    @staticmethod
+    def _get_required(dependencies: List[Dict[str, Any]], chart_dir: str) -> List[LockedDependency]:
+        locked = {(d.name, d.repository): d for d in read_locked_dependencies(chart_dir)}
+        required: Dict[Tuple[str, str], LockedDependency] = {}
+        for dependency in dependencies:
+            key = (str(dependency["name"]), _normalize_repository(str(dependency.get("repository", ""))))
+            if key not in locked:
+                raise DependencyError(
+                    f"Dependency '{key[0]}' from '{key[1]}' is not pinned in the lock file, the lock file is out "
+                    "of date. Run 'helm dependency update' and commit the lock file."
+                )
+            required[key] = locked[key]
+        return list(required.values())
+
+    def _resolve_one(self, locked: LockedDependency) -> ResolvedDependency:
+        index = self.get_index(locked.repository)
+        for entry in index.get_entries(locked.name):
+            if str(entry.get("version")) != locked.version:
+                continue
+            urls = entry.get("urls") or []
+            if not urls:
+                raise DependencyError(f"Chart '{locked.name}-{locked.version}' has no URLs in '{locked.repository}'.")
+            digest = str(entry.get("digest") or "")
+            if not digest:
+                raise DependencyError(
+                    f"Chart '{locked.name}-{locked.version}' has no digest in '{locked.repository}', can't verify it."
+                )
+            url = urljoin(f"{locked.repository}/", str(urls[0]))
+            return ResolvedDependency(locked.name, locked.version, locked.repository, url, digest)
+        raise DependencyError(f"Chart '{locked.name}-{locked.version}' not found in '{locked.repository}'.")
+
+    def _download(self, dependency: ResolvedDependency, destination_dir: str) -> str:
+        response = self._request(dependency.url)
+        if response.status != 200:
+            raise DependencyError(f"Downloading '{dependency.url}' failed with HTTP status {response.status}.")
+        digest = hashlib.sha256(response.body).hexdigest()
+        if digest != dependency.digest.split(":")[-1]:
+            raise DependencyError(
+                f"Digest of '{dependency.url}' is 'sha256:{digest}', but the repository index says "
+                f"'{dependency.digest}'."
+            )
+        target_path = os.path.join(destination_dir, dependency.file_name)
+        # write to a temporary file first, so a failed download never leaves a broken archive behind
+        fd, temp_path = tempfile.mkstemp(dir=destination_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(response.body)
+        os.replace(temp_path, target_path)
+        logger.info(f"Downloaded '{dependency.url}' to '{target_path}'.")
+        return target_path
+
+    def _map(self, func: Any, items: List[Any], *args: Any) -> List[Any]:
+        # every call runs in a copy of the current context, so logs and limits of the calling step apply
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="dependencies") as executor:
+            futures = [executor.submit(contextvars.copy_context().run, func, item, *args) for item in items]
+            return [future.result() for future in futures]
+
+    def resolve(self, chart_dir: str, dependencies: List[Dict[str, Any]]) -> List[ResolvedDependency]:
+        """
+        Finds archives and digests of the dependencies, in versions pinned in the chart's lock file.
+        :param chart_dir: directory of the chart
+        :param dependencies: dependencies from the chart's Chart.yaml to resolve
+        :return: resolved dependencies, each chart only once
+        :raises DependencyError: if a dependency isn't pinned in the lock file or not found in its repository
+        """
+        return self._map(self._resolve_one, self._get_required(dependencies, chart_dir))
+
+    def download(self, dependencies: List[ResolvedDependency], destination_dir: str) -> List[str]:
+        """
+        Downloads archives of the dependencies concurrently and verifies their digests.
+        :return: paths of the downloaded archives
+        :raises DependencyError: if a download fails or a digest doesn't match
+        """
+        os.makedirs(destination_dir, exist_ok=True)
+        downloaded = self._map(self._download, dependencies, destination_dir)
+        self._remove_outdated(dependencies, destination_dir)
+        return downloaded
+
+    @staticmethod
+    def _remove_outdated(dependencies: List[ResolvedDependency], destination_dir: str) -> None:
+        """Removes archives of the dependencies in other versions, like 'helm dependency update' does."""
+        current = {d.file_name for d in dependencies}
+        for dependency in dependencies:
+            name_regexp = re.compile(rf"^{re.escape(dependency.name)}-v?\d.*\.tgz$")
+            for file_name in os.listdir(destination_dir):
+                if name_regexp.match(file_name) and file_name not in current:
+                    logger.info(f"Removing outdated archive '{file_name}' of dependency '{dependency.name}'.")
+                    os.remove(os.path.join(destination_dir, file_name))
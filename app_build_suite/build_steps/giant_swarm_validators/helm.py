@@ -4,6 +4,7 @@ General idea for naming validation checks:
 - check types and first letters:
   - file system layout and structure: "F"
   - Chart.yaml related problems "C"
+  - rendered Kubernetes objects: "K"
 """
 import argparse
 import logging
@@ -12,6 +13,7 @@ import re
 
 import yaml
 from step_exec_lib.errors import Error
+from step_exec_lib.types import Context
 
 from app_build_suite.build_steps.helm_consts import (
     VALUES_SCHEMA_JSON,
@@ -20,6 +22,7 @@ from app_build_suite.build_steps.helm_consts import (
     HELPERS_YAML,
     HELPERS_TPL,
 )
+from app_build_suite.build_steps.manifests import get_manifest_index
 
 logger = logging.getLogger(__name__)
 
@@ -98,3 +101,30 @@ class HasTeamLabel:
                     f"Template file '{HELPERS_YAML}' or '{HELPERS_TPL}' not found in " f"'{TEMPLATES_DIR}' directory."
                 )
         return helpers_file_path
+
+
+class HasTeamLabelOnObjects:
+    """
+    Checks if all the objects rendered from the chart's own templates (not subcharts) have the team label.
+    Many existing charts don't label all their objects yet, so a failure is only reported as a warning.
+    """
+
+    warn_only = True
+
+    def get_check_code(self) -> str:
+        return "K0001"
+
+    def validate_manifests(self, config: argparse.Namespace, context: Context) -> bool:
+        index = get_manifest_index(context)
+        if index is None:
+            logger.info("Rendered manifests are not available, can't check labels of objects.")
+            return True
+        with open(os.path.join(config.chart_dir, CHART_YAML), "r") as stream:
+            chart_name = yaml.safe_load(stream)["name"]
+        missing = [o for o in index.get_from_chart_templates(chart_name) if GS_TEAM_LABEL_KEY not in o.labels]
+        for obj in missing:
+            logger.info(
+                f"Object '{obj.key.kind}/{obj.key.name}' rendered from '{obj.template}' doesn't have the "
+                f"'{GS_TEAM_LABEL_KEY}' label."
+            )
+        return not missing
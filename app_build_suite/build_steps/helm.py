@@ -1,26 +1,64 @@
 """Build steps implementing helm3 based builds."""
 import argparse
-import inspect
+import contextvars
+import copy
+import functools
+import hashlib
+import importlib
 import logging
 import os
 import pathlib
+import re
 import shutil
+import subprocess  # nosec: only used for type hints
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime
 from os import listdir
-from sys import path
-from typing import List, Optional, Set, Protocol, runtime_checkable
+from types import ModuleType
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Protocol, Tuple, cast, runtime_checkable
 from urllib.parse import urlsplit
 
 import configargparse
 import validators
 import yaml
-from step_exec_lib.errors import ValidationError
-from step_exec_lib.steps import BuildStep, BuildStepsFilteringPipeline
+from step_exec_lib.errors import Error, ValidationError
+from step_exec_lib.steps import BuildStep
 from step_exec_lib.types import Context, StepType
 from step_exec_lib.utils.files import get_file_sha256
 from step_exec_lib.utils.git import GitRepoVersionInfo
-from step_exec_lib.utils.processes import run_and_log
 
+from app_build_suite.build_steps import lint_batch, meta_files, native_lint, package_size, subcharts
+from app_build_suite.build_steps.context import (  # noqa: F401, keys are also imported from this module
+    BuildContext,
+    context_key_chart_digest,
+    context_key_chart_file_name,
+    context_key_chart_full_path,
+    context_key_chart_lock_files_to_restore,
+    context_key_changes_made,
+    context_key_git_version,
+    context_key_injected_subcharts,
+    context_key_lint_results,
+    context_key_replaced_subcharts,
+    context_key_manifest_index,
+    context_key_meta_dir_path,
+    context_key_meta_file_digests,
+    context_key_oci_references,
+    context_key_package_dir,
+    context_key_package_size,
+    context_key_prebuilt_subcharts,
+    context_key_rendered_manifests,
+    context_key_staged_chart_dir,
+    context_key_staged_dirs,
+    context_key_version_overrides,
+)
+from app_build_suite.build_steps.dependencies import (
+    DependencyError,
+    NativeDependencyResolver,
+    get_unsupported_repositories,
+)
+from app_build_suite.build_steps.index_cache import IndexCache, get_default_index_cache_dir
 from app_build_suite.build_steps.helm_consts import (
     CHART_YAML_APP_VERSION_KEY,
     CHART_YAML_CHART_VERSION_KEY,
@@ -28,18 +66,194 @@ from app_build_suite.build_steps.helm_consts import (
     VALUES_YAML,
     CHART_LOCK,
     REQUIREMENTS_LOCK,
+    REQUIREMENTS_YAML,
+    SUBCHARTS_DIR,
+)
+from app_build_suite.build_steps.pipeline import StepWrappingPipeline
+from app_build_suite.build_steps.oci import ChartArtifact, OciError, OciRegistryClient, push_charts
+from app_build_suite.build_steps.steps import (
+    STEP_BUILD,
+    STEP_VALIDATE,
+    STEP_STATIC_CHECK,
+    STEP_METADATA,
+    STEP_PUBLISH,
 )
-from app_build_suite.build_steps.steps import STEP_BUILD, STEP_VALIDATE, STEP_STATIC_CHECK, STEP_METADATA
 from app_build_suite.errors import BuildError
+from app_build_suite.utils.batching import BatcherRegistry, MicroBatcher
+from app_build_suite.utils.http import HttpConnectionPool
+from app_build_suite.utils.processes import run_and_log
 
 logger = logging.getLogger(__name__)
 
-context_key_chart_full_path: str = "chart_full_path"
-context_key_chart_file_name: str = "chart_file_name"
-context_key_git_version: str = "git_version"
-context_key_changes_made: str = "changes_made"
-context_key_meta_dir_path: str = "meta_dir_path"
-context_key_chart_lock_files_to_restore: str = "chart_lock_files_to_restore"
+
+LINT_ENGINE_CT = "ct"
+LINT_ENGINE_NATIVE = "native"
+DEPENDENCY_RESOLVER_HELM = "helm"
+DEPENDENCY_RESOLVER_NATIVE = "native"
+OCI_PASSWORD_ENV_VAR = "ABS_OCI_PASSWORD"
+
+
+_tool_versions: Dict[Tuple[str, float], str] = {}
+_tool_versions_lock = threading.Lock()
+
+
+def get_tool_version_output(bin_name: str) -> str:
+    """
+    Runs '<bin_name> version' and returns the first line of its output. The result is kept for the lifetime
+    of the process, keyed by the binary's path and modification time, so many builds run by one process
+    probe each tool only once, but still notice a tool replaced between the builds.
+    :param bin_name: name of the binary, looked up in PATH
+    :return: the first line of the tool's output
+    """
+    bin_path = shutil.which(bin_name)
+    key = (bin_path, os.path.getmtime(bin_path)) if bin_path is not None else None
+    with _tool_versions_lock:
+        if key is not None and key in _tool_versions:
+            return _tool_versions[key]
+    run_res = run_and_log([bin_name, "version"], capture_output=True)  # nosec
+    output = run_res.stdout.splitlines()[0]
+    if key is not None and run_res.returncode == 0:
+        with _tool_versions_lock:
+            _tool_versions[key] = output
+    return output
+
+
+def get_helm_version(source: str, helm_bin: str = "helm") -> str:
+    """
+    Runs 'helm version' and parses the version number out of its output.
+    :param source: name of the component requesting the check (used as a source of raised errors)
+    :param helm_bin: name of the helm binary
+    :return: version string reported by helm
+    """
+    version_line = get_tool_version_output(helm_bin)
+    prefix = "version.BuildInfo"
+    if version_line.startswith(prefix):
+        version_line = version_line[len(prefix) :].strip("{}")
+    else:
+        raise ValidationError(source, f"Can't parse '{helm_bin}' version number.")
+    version_entries = version_line.split(",")[0]
+    return version_entries.split(":")[1].strip('"')
+
+
+def get_chart_dependencies(chart_dir: str) -> List[Dict[str, Any]]:
+    """
+    Reads the list of dependencies of a chart, from Chart.yaml or, for 'apiVersion: v1' charts,
+    from requirements.yaml.
+    :param chart_dir: path to the chart's directory
+    :return: list of dependency entries, as present in the file
+    """
+    with open(os.path.join(chart_dir, CHART_YAML), "r") as file:
+        chart_yaml = yaml.safe_load(file)
+    dependencies = chart_yaml.get("dependencies") or []
+    requirements_path = os.path.join(chart_dir, REQUIREMENTS_YAML)
+    if not dependencies and os.path.isfile(requirements_path):
+        with open(requirements_path, "r") as file:
+            dependencies = (yaml.safe_load(file) or {}).get("dependencies") or []
+    return dependencies
+
+
+def is_modifying_chart_in_place(config: argparse.Namespace) -> bool:
+    """Checks if build steps write to the chart's files; keeping the changes requires making them first."""
+    return config.modify_chart_in_place or config.keep_chart_changes
+
+
+def get_checked_chart_dir(config: argparse.Namespace, context: Context) -> str:
+    """Returns the directory rendered and linted: the copy staged with versions from git, if there's one."""
+    return context.get(context_key_staged_chart_dir) or config.chart_dir
+
+
+def get_package_dir(config: argparse.Namespace, context: Context) -> str:
+    """
+    Returns the directory packaged by HelmChartBuilder: the copy of the chart with metadata annotations, if
+    there's one. Otherwise the chart's directory is packaged, with the versions passed to 'helm package'.
+    """
+    return context.get(context_key_package_dir) or config.chart_dir
+
+
+def stage_chart(chart_dir: str, context: Context) -> str:
+    """
+    Copies the chart to a new temporary directory, outside of the source tree. Relative 'file://'
+    dependencies in the copy's Chart.yaml are made absolute, so they resolve the same from the copy.
+    The copy is removed by HelmChartBuilder's cleanup.
+    :param chart_dir: the directory to copy
+    :param context: the context object, the copy is registered in
+    :return: path of the copy
+    """
+    chart_dir = os.path.abspath(chart_dir)
+    staging_dir = tempfile.mkdtemp(prefix=f"abs-staged-{os.path.basename(chart_dir)}-")
+    context[context_key_staged_dirs] = [*context.get(context_key_staged_dirs, []), staging_dir]
+    shutil.copytree(chart_dir, staging_dir, ignore=shutil.ignore_patterns(".git"), symlinks=True, dirs_exist_ok=True)
+    chart_yaml_path = os.path.join(staging_dir, CHART_YAML)
+    if os.path.isfile(chart_yaml_path):
+        make_file_dependencies_absolute(chart_yaml_path, chart_dir)
+    return staging_dir
+
+
+_relative_file_repository_regexp = re.compile(r"^(\s*(?:-\s*)?repository:\s*[\"']?)file://(?!/)([^\"'\s]+)")
+
+
+def make_file_dependencies_absolute(chart_yaml_path: str, source_dir: str) -> bool:
+    """
+    Replaces relative 'file://' repositories of dependencies in Chart.yaml with absolute paths resolved
+    against the source directory, keeping the rest of the file as it is.
+    :return: True if any repository was replaced
+    """
+    with open(chart_yaml_path, "r") as file:
+        lines = file.readlines()
+    new_lines = [
+        _relative_file_repository_regexp.sub(
+            lambda m: f"{m.group(1)}file://{os.path.normpath(os.path.join(source_dir, m.group(2)))}", line
+        )
+        for line in lines
+    ]
+    if new_lines == lines:
+        return False
+    with open(chart_yaml_path, "w") as file:
+        file.writelines(new_lines)
+    return True
+
+
+def replace_versions_in_chart_yaml(chart_yaml_path: str, overrides: Dict[str, str]) -> bool:
+    """
+    Replaces values of top level keys in Chart.yaml, keeping the rest of the file as it is.
+    :return: True if any key was replaced
+    """
+    new_lines: List[str] = []
+    replaced = False
+    with open(chart_yaml_path, "r") as file:
+        for line in file.readlines():
+            key = line.split(":")[0]
+            if key in overrides:
+                logger.info(f"Replacing '{key}' with git version '{overrides[key]}' in {CHART_YAML}.")
+                new_lines.append(f"{key}: {overrides[key]}\n")
+                replaced = True
+            else:
+                new_lines.append(line)
+    if replaced:
+        with open(chart_yaml_path, "w") as file:
+            file.writelines(new_lines)
+    return replaced
+
+
+def load_chart_yaml(config: argparse.Namespace, context: Context) -> Dict[str, Any]:
+    """Loads Chart.yaml of the chart as it will be packaged, with versions overridden by HelmGitVersionSetter."""
+    with open(os.path.join(get_package_dir(config, context), CHART_YAML), "r") as file:
+        chart_yaml = yaml.safe_load(file)
+    chart_yaml.update(context.get(context_key_version_overrides, {}))
+    return chart_yaml
+
+
+def backup_chart_yaml(config: argparse.Namespace, context: Context) -> str:
+    """
+    Saves a backup of the chart's Chart.yaml, restored by HelmChartYAMLRestorer, unless there's one already.
+    :return: path of the chart's Chart.yaml
+    """
+    chart_yaml_path = os.path.join(config.chart_dir, CHART_YAML)
+    if not context.get(context_key_changes_made, False):
+        logger.debug(f"Saving backup of {CHART_YAML} in {CHART_YAML}.back")
+        shutil.copy2(chart_yaml_path, chart_yaml_path + ".back")
+        context[context_key_changes_made] = True
+    return chart_yaml_path
 
 
 class HelmBuilderValidator(BuildStep):
@@ -75,6 +289,7 @@ class HelmBuilderValidator(BuildStep):
 class HelmGitVersionSetter(BuildStep):
     """
     Sets chart `version` and `appVersion` to a version discovered from `git`. Both options are configurable.
+    By default, the versions are passed to 'helm package' and the chart's files are not changed.
     """
 
     repo_info: Optional[GitRepoVersionInfo] = None
@@ -96,11 +311,24 @@ class HelmGitVersionSetter(BuildStep):
             action="store_true",
             help=f"Should the {CHART_YAML_CHART_VERSION_KEY} in {CHART_YAML} be replaced by a tag and hash from git",
         )
+        config_parser.add_argument(
+            "--modify-chart-in-place",
+            required=False,
+            action="store_true",
+            help=f"Write versions from git and metadata annotations to the chart's {CHART_YAML} and restore it "
+            f"after the build, instead of checking and packaging a staged copy of the chart. Implied by "
+            f"'--keep-chart-changes'.",
+        )
 
     # noinspection PyMethodMayBeStatic
     def _is_enabled(self, config: argparse.Namespace) -> bool:
         return config.replace_chart_version_with_git or config.replace_app_version_with_git
 
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if not self._is_enabled(config):
+            return "no version override options requested"
+        return None
+
     def pre_run(self, config: argparse.Namespace) -> None:
         """
         Checks if we can find a git directory in the chart's dir or that dir's parent.
@@ -116,7 +344,8 @@ class HelmGitVersionSetter(BuildStep):
 
     def run(self, config: argparse.Namespace, context: Context) -> None:
         """
-        Gets the git-version, then replaces keys in Chart.yaml
+        Gets the git-version and saves the versions to set in the context, so HelmChartBuilder passes them
+        to 'helm package'. With '--modify-chart-in-place', replaces keys in Chart.yaml instead.
         :param config: the config object
         :param context: the context object
         :return: None
@@ -132,32 +361,34 @@ class HelmGitVersionSetter(BuildStep):
             raise ValidationError(self.name, f"Can't find valid git repository in {config.chart_dir}")
         # add the version info to context, so other BuildSteps can use it
         context[context_key_git_version] = git_version
+        overrides: Dict[str, str] = {}
+        if config.replace_chart_version_with_git:
+            overrides[CHART_YAML_CHART_VERSION_KEY] = git_version
+        if config.replace_app_version_with_git:
+            overrides[CHART_YAML_APP_VERSION_KEY] = git_version
+        if is_modifying_chart_in_place(config):
+            self._replace_in_chart_yaml(config, context, overrides)
+            return
+        logger.info(f"Packaging the chart with {overrides} set from git.")
+        context[context_key_version_overrides] = overrides
 
-        new_lines: List[str] = []
+    @staticmethod
+    def _replace_in_chart_yaml(config: argparse.Namespace, context: Context, overrides: Dict[str, str]) -> None:
+        """Replaces the versions in Chart.yaml, saving its backup restored by HelmChartYAMLRestorer."""
         chart_yaml_path = os.path.join(config.chart_dir, CHART_YAML)
-        with open(chart_yaml_path, "r") as file:
-            lines = file.readlines()
-            for line in lines:
-                fields = line.split(":")
-                if (config.replace_chart_version_with_git and fields[0] == CHART_YAML_CHART_VERSION_KEY) or (
-                    config.replace_app_version_with_git and fields[0] == CHART_YAML_APP_VERSION_KEY
-                ):
-                    logger.info(f"Replacing '{fields[0]}' with git version '{git_version}' in {CHART_YAML}.")
-                    context[context_key_changes_made] = True
-                    new_lines.append(f"{fields[0]}: {git_version}\n")
-                else:
-                    new_lines.append(line)
+        logger.debug(f"Saving backup of {CHART_YAML} in {CHART_YAML}.back")
+        shutil.copy2(chart_yaml_path, chart_yaml_path + ".back")
+        context[context_key_changes_made] = replace_versions_in_chart_yaml(chart_yaml_path, overrides)
         if context[context_key_changes_made]:
-            logger.debug(f"Saving backup of {CHART_YAML} in {CHART_YAML}.back")
-            shutil.copy2(chart_yaml_path, chart_yaml_path + ".back")
-            with open(chart_yaml_path, "w") as file:
-                logger.info(f"Saving {CHART_YAML} with version set from git.")
-                file.writelines(new_lines)
+            logger.info(f"Saved {CHART_YAML} with version set from git.")
+        else:
+            os.remove(chart_yaml_path + ".back")
 
 
 class HelmChartToolLinter(BuildStep):
     """
-    Runs helm ct linter against the chart.
+    Runs helm ct linter against the chart. Optionally, the checks done by ct can be executed in-process
+    by the native lint engine, with only 'helm lint' executed as an external tool.
     """
 
     @property
@@ -167,9 +398,25 @@ class HelmChartToolLinter(BuildStep):
     _ct_bin = "ct"
     _min_ct_version = "3.5.1"
     _max_ct_version = "4.0.0"
+    _helm_bin = "helm"
+    _min_helm_version = "3.2.0"
+    _max_helm_version = "4.0.0"
     _metadata_schema = "gs_metadata_chart_schema.yaml"
+    # batches are shared by all the instances of the step, so charts built in parallel are linted together
+    _batchers = BatcherRegistry()
+
+    def __init__(self) -> None:
+        self._native_settings: Optional[native_lint.NativeLintSettings] = None
 
     def initialize_config(self, config_parser: configargparse.ArgParser) -> None:
+        config_parser.add_argument(
+            "--lint-engine",
+            required=False,
+            default=LINT_ENGINE_CT,
+            choices=[LINT_ENGINE_CT, LINT_ENGINE_NATIVE],
+            help=f"Select how chart linting is done. '{LINT_ENGINE_CT}' runs the 'ct' tool, '{LINT_ENGINE_NATIVE}' "
+            "runs the same schema and yamllint checks in-process and only executes 'helm lint'.",
+        )
         config_parser.add_argument(
             "--ct-config",
             required=False,
@@ -180,6 +427,25 @@ class HelmChartToolLinter(BuildStep):
             required=False,
             help="Path to optional 'ct' schema file.",
         )
+        config_parser.add_argument(
+            "--lint-workers",
+            required=False,
+            default=1,
+            type=int,
+            help=f"Number of values files from the chart's '{native_lint.CI_VALUES_DIR}' directory linted and rendered "
+            f"in parallel. Only supported by '--lint-engine {LINT_ENGINE_NATIVE}': 'ct lint' always checks all the "
+            "values files of a chart one after another, so values higher than 1 are rejected with the 'ct' engine.",
+        )
+        config_parser.add_argument(
+            "--ct-batch-size",
+            required=False,
+            default=1,
+            type=int,
+            help="Max number of charts linted by a single run of 'ct'. Charts reaching the linting step at about "
+            "the same time are batched when many charts are built in parallel in the monorepo mode with '--jobs' "
+            "higher than 1; other builds lint their chart right away. Works only with "
+            f"'--lint-engine {LINT_ENGINE_CT}'.",
+        )
 
     def pre_run(self, config: argparse.Namespace) -> None:
         """
@@ -187,13 +453,16 @@ class HelmChartToolLinter(BuildStep):
         :param config: the config object
         :return: None
         """
-        # verify if binary present
-        self._assert_binary_present_in_path(self._ct_bin)
-        # verify version
-        run_res = run_and_log([self._ct_bin, "version"], capture_output=True)  # nosec
-        version_line = run_res.stdout.splitlines()[0]
-        version = version_line.split(":")[1].strip()
-        self._assert_version_in_range(self._ct_bin, version, self._min_ct_version, self._max_ct_version)
+        self._validate_parallelism_options(config)
+        if config.lint_engine == LINT_ENGINE_NATIVE:
+            self._assert_native_engine_available()
+        else:
+            # verify if binary present
+            self._assert_binary_present_in_path(self._ct_bin)
+            # verify version
+            version_line = get_tool_version_output(self._ct_bin)
+            version = version_line.split(":")[1].strip()
+            self._assert_version_in_range(self._ct_bin, version, self._min_ct_version, self._max_ct_version)
         # validate config options
         if config.ct_config is not None and not os.path.isabs(config.ct_config):
             config.ct_config = os.path.join(os.getcwd(), config.ct_config)
@@ -225,13 +494,134 @@ class HelmChartToolLinter(BuildStep):
                 self.name,
                 f"Chart tool schema file {config.ct_schema} doesn't exist.",
             )
+        if config.lint_engine == LINT_ENGINE_NATIVE:
+            self._prepare_native_settings(config)
+
+    def _validate_parallelism_options(self, config: argparse.Namespace) -> None:
+        if config.lint_workers < 1:
+            raise ValidationError(self.name, "Option '--lint-workers' has to be at least 1.")
+        if config.ct_batch_size < 1:
+            raise ValidationError(self.name, "Option '--ct-batch-size' has to be at least 1.")
+        if config.lint_engine == LINT_ENGINE_NATIVE and config.ct_batch_size > 1:
+            raise ValidationError(self.name, f"Option '--ct-batch-size' requires '--lint-engine {LINT_ENGINE_CT}'.")
+        if config.lint_engine != LINT_ENGINE_NATIVE and config.lint_workers > 1:
+            raise ValidationError(
+                self.name,
+                f"Option '--lint-workers' requires '--lint-engine {LINT_ENGINE_NATIVE}', as 'ct lint' can't lint "
+                "values files of a chart separately.",
+            )
+
+    def _assert_native_engine_available(self) -> None:
+        if not native_lint.is_available():
+            raise ValidationError(
+                self.name,
+                f"Lint engine '{LINT_ENGINE_NATIVE}' requires 'yamale' and 'yamllint' python packages.",
+            )
+        self._assert_binary_present_in_path(self._helm_bin)
+        version = get_helm_version(self.name, self._helm_bin)
+        self._assert_version_in_range(self._helm_bin, version, self._min_helm_version, self._max_helm_version)
+
+    def _prepare_native_settings(self, config: argparse.Namespace) -> None:
+        self._native_settings = native_lint.resolve_settings(config.ct_config, config.ct_schema)
+        if self._native_settings.validate_schema and self._native_settings.schema_path is None:
+            raise ValidationError(self.name, "Can't find chart schema file for the native lint engine.")
+        try:
+            # load and cache the schema and the yamllint config, so we fail fast if they are broken
+            if self._native_settings.schema_path is not None:
+                native_lint.load_chart_schema(self._native_settings.schema_path)
+            native_lint.load_yamllint_config(self._native_settings.lint_conf_path)
+        except Exception as e:
+            raise ValidationError(self.name, f"Can't load lint configuration: {e}")
+
+    def get_checkpoint_inputs(self, config: argparse.Namespace) -> List[str]:
+        return [p for p in [config.chart_dir, config.ct_config, config.ct_schema] if p is not None]
+
+    def get_checkpoint_options(self) -> List[str]:
+        return ["chart_dir", "ct_config", "ct_schema", "lint_engine", "generate_metadata"]
 
-    def run(self, config: argparse.Namespace, _: Context) -> None:
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        chart_dir = get_checked_chart_dir(config, context)
+        if config.lint_engine == LINT_ENGINE_NATIVE:
+            # don't render the chart again if HelmChartTemplateRenderer did it already
+            self._run_native(
+                config, chart_dir, cast(BuildContext, context), render=context_key_rendered_manifests not in context
+            )
+        else:
+            self._run_ct(config, chart_dir)
+
+    def _run_native(
+        self, config: argparse.Namespace, chart_dir: str, context: BuildContext, render: bool = True
+    ) -> None:
+        if self._native_settings is None:
+            self._native_settings = native_lint.resolve_settings(config.ct_config, config.ct_schema)
+        logger.info("Running native chart linting")
+        problems = native_lint.lint_chart_files(chart_dir, self._native_settings)
+        for problem in problems:
+            if problem.is_error:
+                logger.error(str(problem))
+            else:
+                logger.warning(str(problem))
+        failed = any(p.is_error for p in problems)
+        values_files: List[Optional[str]] = [*native_lint.get_ci_values_files(config.chart_dir)] or [None]
+        # every shard records its result in its own snapshot of the build context, merged when it's done
+        snapshots = [context.snapshot() for _ in values_files]
+        with ThreadPoolExecutor(max_workers=config.lint_workers, thread_name_prefix="lint-shard") as executor:
+            # every shard runs in a copy of the current context, so logs and process limits of this step apply
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run, self._lint_shard, chart_dir, values_file, snapshot, render
+                )
+                for values_file, snapshot in zip(values_files, snapshots)
+            ]
+            for future, snapshot in zip(futures, snapshots):
+                future.result()
+                context.merge(snapshot, self.name)
+        results = [context.lint_results[native_lint.get_shard_label(v)] for v in values_files]
+        for result in results:
+            for line in result.output:
+                logger.info(f"[{result.label}] {line}")
+            for line in result.errors:
+                logger.error(f"[{result.label}] {line}")
+        logger.info(native_lint.format_shard_report(results))
+        failed_shards = [r.label for r in results if not r.succeeded]
+        if failed_shards:
+            raise BuildError(self.name, f"Linting failed for values files: {', '.join(failed_shards)}")
+        if failed:
+            raise BuildError(self.name, "Linting failed")
+
+    def _lint_shard(
+        self, chart_dir: str, values_file: Optional[str], context: BuildContext, render: bool = True
+    ) -> None:
+        """
+        Runs 'helm lint' and 'helm template' for a single values file and saves the result of the shard,
+        with the output of 'helm lint' and errors of the failed command, if any, in 'context.lint_results'.
+        :param chart_dir: path to the chart's directory
+        :param values_file: path to the values file or None to use only the default values
+        :param context: snapshot of the build context used by this shard
+        :param render: if False, only 'helm lint' is executed
+        :return: None
+        """
+        output: List[str] = []
+        result = native_lint.LintShardResult(values_file, None, output, [])
+        for command in ["lint", "template"] if render else ["lint"]:
+            args = [self._helm_bin, command, chart_dir]
+            if values_file is not None:
+                args.extend(["--values", values_file])
+            run_res = run_and_log(args, capture_output=True)  # nosec, input params checked above in pre_run
+            if command == "lint":
+                output.extend(run_res.stdout.splitlines())
+            if run_res.returncode != 0:
+                errors = [f"{self._helm_bin} {command} failed with exit code {run_res.returncode}"]
+                errors.extend(run_res.stderr.splitlines())
+                result = native_lint.LintShardResult(values_file, command, output, errors)
+                break
+        context.lint_results[result.label] = result
+
+    def _get_ct_args(self, config: argparse.Namespace) -> List[str]:
         args = [
             self._ct_bin,
             "lint",
             "--validate-maintainers=false",
-            f"--charts={config.chart_dir}",
         ]
         if config.debug:
             args.append("--debug")
@@ -239,7 +629,15 @@ class HelmChartToolLinter(BuildStep):
             args.append(f"--config={config.ct_config}")
         if config.ct_schema is not None:
             args.append(f"--chart-yaml-schema={config.ct_schema}")
+        return args
+
+    def _run_ct(self, config: argparse.Namespace, chart_dir: str) -> None:
+        args = self._get_ct_args(config)
         logger.info("Running chart tool linting")
+        if lint_batch.is_batching_useful(config, config.ct_batch_size):
+            self._run_ct_batched(config, args, chart_dir)
+            return
+        args.append(f"--charts={chart_dir}")
         run_res = run_and_log(args, capture_output=True)  # nosec, input params checked above in pre_run
         for line in run_res.stdout.splitlines():
             logger.info(line)
@@ -247,6 +645,144 @@ class HelmChartToolLinter(BuildStep):
             logger.error(f"{self._ct_bin} run failed with exit code {run_res.returncode}")
             raise BuildError(self.name, "Linting failed")
 
+    def _run_ct_batched(self, config: argparse.Namespace, args: List[str], chart_dir: str) -> None:
+        """Lints the chart together with other charts that use the same 'ct' options."""
+
+        def run_tool(chart_dirs: List[str]) -> subprocess.CompletedProcess:
+            # nosec, input params checked above in pre_run
+            return run_and_log([*args, f"--charts={','.join(chart_dirs)}"], capture_output=True)
+
+        batcher = self._batchers.get(
+            tuple(args),
+            lambda: MicroBatcher(
+                lambda chart_dirs: lint_batch.lint_batch(chart_dirs, run_tool, lint_batch.attribute_ct_output),
+                config.ct_batch_size,
+                lint_batch.BATCH_WAIT_SECONDS,
+            ),
+        )
+        result = batcher.submit(chart_dir)
+        for line in result.output:
+            logger.info(line)
+        if result.failed:
+            logger.error(f"{self._ct_bin} reported problems with the chart")
+            raise BuildError(self.name, "Linting failed")
+
+
+class RenderedManifests(NamedTuple):
+    """Manifests rendered from the chart with a single values file (None for the default values only)."""
+
+    values_file: Optional[str]
+    path: str
+
+
+class HelmChartTemplateRenderer(BuildStep):
+    """
+    Renders the chart with 'helm template' once for the default values and once for each 'ci/*-values.yaml'
+    file. Rendered manifests are saved as files and listed in the context, default values first, so the
+    following checks don't have to render the chart again. The copy staged by HelmChartStager is rendered,
+    if there's one. Nothing is rendered if none of the enabled steps reads the manifests.
+    """
+
+    _helm_bin = "helm"
+    _min_helm_version = "3.2.0"
+    _max_helm_version = "4.0.0"
+    _default_values_file_name = "default.yaml"
+
+    def __init__(self, gs_validator: Optional["GiantSwarmHelmValidator"] = None) -> None:
+        self._temp_render_dir: Optional[str] = None
+        self._gs_validator = gs_validator or GiantSwarmHelmValidator()
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {STEP_VALIDATE, STEP_STATIC_CHECK}
+
+    def initialize_config(self, config_parser: configargparse.ArgParser) -> None:
+        config_parser.add_argument(
+            "--render-dir",
+            required=False,
+            default="",
+            help="Directory to save the chart's manifests rendered for static checks in. Manifests of every chart "
+            "are saved in a subdirectory named after the chart. If empty, a temporary directory is used and removed "
+            "after the build.",
+        )
+
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if not self._get_manifest_readers(config):
+            return "none of the enabled steps reads rendered manifests"
+        return None
+
+    def _get_manifest_readers(self, config: argparse.Namespace) -> List[str]:
+        """Returns names of the enabled steps that read the rendered manifests."""
+        readers: List[str] = []
+        if StepWrappingPipeline.is_step_requested(config, KubeLinter()):
+            readers.append(KubeLinter.__name__)
+        if config.lint_engine == LINT_ENGINE_NATIVE and StepWrappingPipeline.is_step_requested(
+            config, HelmChartToolLinter()
+        ):
+            readers.append(HelmChartToolLinter.__name__)
+        if StepWrappingPipeline.is_step_requested(
+            config, self._gs_validator
+        ) and self._gs_validator.may_check_manifests(config):
+            readers.append(GiantSwarmHelmValidator.__name__)
+        return readers
+
+    def pre_run(self, config: argparse.Namespace) -> None:
+        if not self._get_manifest_readers(config):
+            return
+        self._assert_binary_present_in_path(self._helm_bin)
+        version = get_helm_version(self.name, self._helm_bin)
+        self._assert_version_in_range(self._helm_bin, version, self._min_helm_version, self._max_helm_version)
+
+    def _get_render_dir(self, config: argparse.Namespace) -> str:
+        if config.render_dir:
+            # builds of different charts can share '--render-dir', so every chart gets its own subdirectory
+            chart_path = os.path.abspath(config.chart_dir)
+            path_hash = hashlib.sha256(chart_path.encode()).hexdigest()[:8]
+            render_dir = os.path.join(config.render_dir, f"{os.path.basename(chart_path)}-{path_hash}")
+            pathlib.Path(render_dir).mkdir(parents=True, exist_ok=True)
+            return os.path.abspath(render_dir)
+        self._temp_render_dir = tempfile.mkdtemp(prefix="abs-rendered-")
+        return self._temp_render_dir
+
+    def _render(self, chart_dir: str, values_file: Optional[str], output_path: str) -> None:
+        args = [self._helm_bin, "template", chart_dir]
+        if values_file is not None:
+            args.extend(["--values", values_file])
+        run_res = run_and_log(args, capture_output=True)  # nosec, input params checked above in pre_run
+        if run_res.returncode != 0:
+            logger.error(f"{self._helm_bin} template failed with exit code {run_res.returncode}")
+            for line in run_res.stderr.splitlines():
+                logger.error(line)
+            raise BuildError(self.name, f"Rendering chart with values file '{values_file or VALUES_YAML}' failed")
+        with open(output_path, "w") as f:
+            f.write(run_res.stdout)
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        if not self._get_manifest_readers(config):
+            logger.info("None of the enabled steps reads rendered manifests, not rendering the chart.")
+            return
+        render_dir = self._get_render_dir(config)
+        chart_dir = get_checked_chart_dir(config, context)
+        rendered: List[RenderedManifests] = []
+        values_files: List[Optional[str]] = [None, *native_lint.get_ci_values_files(config.chart_dir)]
+        for values_file in values_files:
+            file_name = os.path.basename(values_file) if values_file else self._default_values_file_name
+            output_path = os.path.join(render_dir, file_name)
+            self._render(chart_dir, values_file, output_path)
+            rendered.append(RenderedManifests(values_file, output_path))
+        logger.info(f"Rendered manifests for {len(rendered)} values file(s) saved in '{render_dir}'.")
+        context[context_key_rendered_manifests] = rendered
+
+    def cleanup(
+        self,
+        config: argparse.Namespace,
+        context: Context,
+        has_build_failed: bool,
+    ) -> None:
+        if self._temp_render_dir is not None:
+            shutil.rmtree(self._temp_render_dir, ignore_errors=True)
+            self._temp_render_dir = None
+
 
 class KubeLinter(BuildStep):
     """
@@ -261,6 +797,8 @@ class KubeLinter(BuildStep):
     _min_kubelinter_version = "0.2.5"
     _max_kubelinter_version = "1.0.0"
     _default_kubelinter_cfg_file = ".kube-linter.yaml"
+    # batches are shared by all the instances of the step, so charts built in parallel are linted together
+    _batchers = BatcherRegistry()
 
     def initialize_config(self, config_parser: configargparse.ArgParser) -> None:
         config_parser.add_argument(
@@ -269,6 +807,15 @@ class KubeLinter(BuildStep):
             help=f"Path to optional 'kube-linter' config file. If empty, tries to load "
             f"'{self._default_kubelinter_cfg_file}'.",
         )
+        config_parser.add_argument(
+            "--kubelinter-batch-size",
+            required=False,
+            default=1,
+            type=int,
+            help="Max number of charts linted by a single run of 'kube-linter'. Charts reaching the step at about "
+            "the same time and using the same 'kube-linter' config are batched when many charts are built in "
+            "parallel in the monorepo mode with '--jobs' higher than 1; other builds lint their chart right away.",
+        )
 
     def pre_run(self, config: argparse.Namespace) -> None:
         """
@@ -276,11 +823,12 @@ class KubeLinter(BuildStep):
         :param config: the config object
         :return: None
         """
+        if config.kubelinter_batch_size < 1:
+            raise ValidationError(self.name, "Option '--kubelinter-batch-size' has to be at least 1.")
         # verify if binary present
         self._assert_binary_present_in_path(self._kubelinter_bin)
         # verify version
-        run_res = run_and_log([self._kubelinter_bin, "version"], capture_output=True)  # nosec
-        version = run_res.stdout.splitlines()[0]
+        version = get_tool_version_output(self._kubelinter_bin)
         self._assert_version_in_range(
             self._kubelinter_bin, version, self._min_kubelinter_version, self._max_kubelinter_version
         )
@@ -296,11 +844,21 @@ class KubeLinter(BuildStep):
         if not config.kubelinter_config and os.path.isfile(_default_cfg_path):
             config.kubelinter_config = _default_cfg_path
 
-    def run(self, config: argparse.Namespace, _: Context) -> None:
+    def get_checkpoint_inputs(self, config: argparse.Namespace) -> List[str]:
+        return [p for p in [config.chart_dir, config.kubelinter_config] if p is not None]
+
+    def get_checkpoint_options(self) -> List[str]:
+        return ["chart_dir", "kubelinter_config"]
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        # lint manifests rendered by HelmChartTemplateRenderer with default values, if available,
+        # so kube-linter doesn't have to render the chart again
+        rendered = context.get(context_key_rendered_manifests, [])
+        lint_target = rendered[0].path if rendered else get_checked_chart_dir(config, context)
         args = [
             self._kubelinter_bin,
             "lint",
-            config.chart_dir,
+            lint_target,
             "--verbose",
         ]
 
@@ -310,6 +868,9 @@ class KubeLinter(BuildStep):
         if config.kubelinter_config is not None:
             args.append(f"--config={config.kubelinter_config}")
         logger.info("Running kube-linter tool")
+        if lint_batch.is_batching_useful(config, config.kubelinter_batch_size):
+            self._run_batched(config, [a for a in args if a != lint_target], lint_target)
+            return
         run_res = run_and_log(args, capture_output=True)  # nosec, input params checked above in pre_run
         for line in run_res.stdout.splitlines():
             logger.info(line)
@@ -319,6 +880,28 @@ class KubeLinter(BuildStep):
                 logger.error(line)
             raise BuildError(self.name, "kube-linter failed")
 
+    def _run_batched(self, config: argparse.Namespace, args: List[str], lint_target: str) -> None:
+        """Lints the target together with targets of other charts that use the same 'kube-linter' options."""
+
+        def run_tool(targets: List[str]) -> subprocess.CompletedProcess:
+            # nosec, input params checked above in pre_run
+            return run_and_log([*args[:2], *targets, *args[2:]], capture_output=True)
+
+        batcher = self._batchers.get(
+            tuple(args),
+            lambda: MicroBatcher(
+                lambda targets: lint_batch.lint_batch(targets, run_tool, lint_batch.attribute_kube_linter_output),
+                config.kubelinter_batch_size,
+                lint_batch.BATCH_WAIT_SECONDS,
+            ),
+        )
+        result = batcher.submit(lint_target)
+        for line in result.output:
+            logger.info(line)
+        if result.failed:
+            logger.error(f"{self._kubelinter_bin} reported problems with the chart")
+            raise BuildError(self.name, "kube-linter failed")
+
 
 class HelmRequirementsUpdater(BuildStep):
     """
@@ -328,11 +911,33 @@ class HelmRequirementsUpdater(BuildStep):
     _helm_bin = "helm"
     _min_helm_version = "3.8.1"
     _max_helm_version = "4.0.0"
+    # shared by all the instances, so each repository index is fetched only once per run
+    _native_resolvers: Dict[str, NativeDependencyResolver] = {}
+    _native_resolvers_lock = threading.Lock()
 
     @property
     def steps_provided(self) -> Set[StepType]:
         return {STEP_BUILD}
 
+    def initialize_config(self, config_parser: configargparse.ArgParser) -> None:
+        config_parser.add_argument(
+            "--dependency-resolver",
+            required=False,
+            default=DEPENDENCY_RESOLVER_HELM,
+            choices=[DEPENDENCY_RESOLVER_HELM, DEPENDENCY_RESOLVER_NATIVE],
+            help=f"Select how chart dependencies are updated. '{DEPENDENCY_RESOLVER_HELM}' runs 'helm dependencies "
+            f"update', '{DEPENDENCY_RESOLVER_NATIVE}' downloads versions pinned in the lock file in-process and "
+            "concurrently, verifying their digests. Charts with dependencies not hosted in HTTP(S) repositories "
+            f"are always updated with '{DEPENDENCY_RESOLVER_HELM}'.",
+        )
+        config_parser.add_argument(
+            "--index-cache-dir",
+            required=False,
+            default=get_default_index_cache_dir(),
+            help=f"Directory where the '{DEPENDENCY_RESOLVER_NATIVE}' dependency resolver keeps compiled indexes of "
+            "chart repositories, revalidated with the repositories on each use. Set to empty string to disable.",
+        )
+
     # noinspection PyMethodMayBeStatic
     def _should_run(self, config: argparse.Namespace) -> bool:
         return config.replace_chart_version_with_git
@@ -346,6 +951,13 @@ class HelmRequirementsUpdater(BuildStep):
             lock_files.append(REQUIREMENTS_LOCK)
         return lock_files
 
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if not self._should_run(config):
+            return "no chart version override requested"
+        if len(self._detect_chart_lock_files(config)) == 0:
+            return f"no {CHART_LOCK} or {REQUIREMENTS_LOCK} file exists"
+        return None
+
     def pre_run(self, config: argparse.Namespace) -> None:
         """
         Checks if the required version of helm is installed and if a lock file is present.
@@ -359,34 +971,79 @@ class HelmRequirementsUpdater(BuildStep):
             logger.debug(f"No {CHART_LOCK} or {REQUIREMENTS_LOCK} file exists, skipping dependency update.")
             return
         self._assert_binary_present_in_path(self._helm_bin)
-        run_res = run_and_log([self._helm_bin, "version"], capture_output=True)  # nosec
-        version_line = run_res.stdout.splitlines()[0]
-        prefix = "version.BuildInfo"
-        if version_line.startswith(prefix):
-            version_line = version_line[len(prefix) :].strip("{}")
-        else:
-            raise ValidationError(self.name, f"Can't parse '{self._helm_bin}' version number.")
-        version_entries = version_line.split(",")[0]
-        version = version_entries.split(":")[1].strip('"')
+        version = get_helm_version(self.name, self._helm_bin)
         self._assert_version_in_range(self._helm_bin, version, self._min_helm_version, self._max_helm_version)
 
-    def run(self, config: argparse.Namespace, context: Context) -> None:
+    @staticmethod
+    def _are_all_dependencies_prebuilt(config: argparse.Namespace, context: Context) -> bool:
+        prebuilt = context.get(context_key_prebuilt_subcharts, {})
+        dependencies = get_chart_dependencies(config.chart_dir)
+        return bool(prebuilt) and all(dep.get("name") in prebuilt for dep in dependencies)
+
+    def _inject_prebuilt_subcharts(self, config: argparse.Namespace, context: Context) -> None:
         """
-        Runs 'helm dependencies update' to update or generate a Chart.lock file.
-        :param config: the config object
-        :param context: the context object
-        :return: None
+        Copies archives of subcharts built earlier in the same run to the chart's 'charts/' directory.
+        Archives of the same subchart already present there are moved to a temporary directory, so they
+        are not packaged, and HelmChartYAMLRestorer moves them back.
         """
-        context[context_key_chart_lock_files_to_restore] = []
-        present_lock_files = self._detect_chart_lock_files(config)
-        if not self._should_run(config):
-            logger.debug("No chart version override requested. Dependency update not required, ending step.")
+        context[context_key_injected_subcharts] = []
+        context[context_key_replaced_subcharts] = {}
+        prebuilt = context.get(context_key_prebuilt_subcharts, {})
+        if not prebuilt:
             return
-        if len(present_lock_files) == 0:
-            logger.debug(f"No {CHART_LOCK} or {REQUIREMENTS_LOCK} file exists, skipping dependency update.")
+        subcharts_dir = os.path.join(config.chart_dir, SUBCHARTS_DIR)
+        pathlib.Path(subcharts_dir).mkdir(exist_ok=True)
+        present = listdir(subcharts_dir)
+        for name, archive_path in sorted(prebuilt.items()):
+            name_regexp = re.compile(rf"^{re.escape(name)}-v?\d.*\.tgz$")
+            for file_name in filter(name_regexp.match, present):
+                self._move_aside_subchart(os.path.join(subcharts_dir, file_name), context)
+            target_path = os.path.join(subcharts_dir, os.path.basename(archive_path))
+            logger.info(f"Using subchart '{name}' built in this run: copying '{archive_path}' to '{target_path}'.")
+            shutil.copy2(archive_path, target_path)
+            context[context_key_injected_subcharts].append(target_path)
+
+    @staticmethod
+    def _move_aside_subchart(subchart_path: str, context: Context) -> None:
+        backup_path = os.path.join(tempfile.mkdtemp(prefix="abs-replaced-subchart-"), os.path.basename(subchart_path))
+        logger.info(f"Replacing subchart archive '{subchart_path}' with the one built in this run.")
+        shutil.move(subchart_path, backup_path)
+        context[context_key_replaced_subcharts][backup_path] = subchart_path
+
+    @classmethod
+    def _get_native_resolver(cls, config: argparse.Namespace) -> NativeDependencyResolver:
+        with cls._native_resolvers_lock:
+            if config.index_cache_dir not in cls._native_resolvers:
+                index_cache = IndexCache(config.index_cache_dir) if config.index_cache_dir else None
+                cls._native_resolvers[config.index_cache_dir] = NativeDependencyResolver(index_cache=index_cache)
+            return cls._native_resolvers[config.index_cache_dir]
+
+    def _resolve_natively(self, config: argparse.Namespace, context: Context) -> bool:
+        """
+        Downloads dependencies pinned in the lock file to the chart's 'charts/' directory. The lock file
+        is not changed.
+        :return: False if some dependencies can't be resolved natively and helm has to be used instead
+        """
+        prebuilt = context.get(context_key_prebuilt_subcharts, {})
+        dependencies = [d for d in get_chart_dependencies(config.chart_dir) if d.get("name") not in prebuilt]
+        unsupported = get_unsupported_repositories(dependencies)
+        if unsupported:
+            logger.info(f"Repositories {unsupported} are not supported by the native resolver, using helm instead.")
+            return False
+        logger.info(f"Resolving {len(dependencies)} chart dependencies with the native resolver.")
+        resolver = self._get_native_resolver(config)
+        try:
+            resolved = resolver.resolve(config.chart_dir, dependencies)
+            resolver.download(resolved, os.path.join(config.chart_dir, SUBCHARTS_DIR))
+        except (DependencyError, OSError) as e:
+            raise BuildError(self.name, f"Resolving chart dependencies failed: {e}")
+        return True
+
+    def _update_dependencies(self, config: argparse.Namespace, context: Context, lock_files: List[str]) -> None:
+        if config.dependency_resolver == DEPENDENCY_RESOLVER_NATIVE and self._resolve_natively(config, context):
             return
         args = []
-        for lock_file in present_lock_files:
+        for lock_file in lock_files:
             logger.debug(f"Saving backup of {lock_file} in {lock_file}.back")
             lock_path = os.path.join(config.chart_dir, lock_file)
             shutil.copy2(lock_path, lock_path + ".back")
@@ -403,6 +1060,57 @@ class HelmRequirementsUpdater(BuildStep):
             logger.error(f"{self._helm_bin} run failed with exit code {run_res.returncode}")
             raise BuildError(self.name, "Chart dependency update failed")
 
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        """
+        Runs 'helm dependencies update' to update or generate a Chart.lock file, or downloads the locked
+        dependencies with the native resolver. If all the dependencies were already built in the same run
+        (monorepo builds), their archives are put in the 'charts/' directory instead.
+        :param config: the config object
+        :param context: the context object
+        :return: None
+        """
+        context[context_key_chart_lock_files_to_restore] = []
+        present_lock_files = self._detect_chart_lock_files(config)
+        if not self._should_run(config):
+            logger.debug("No chart version override requested. Dependency update not required.")
+        elif len(present_lock_files) == 0:
+            logger.debug(f"No {CHART_LOCK} or {REQUIREMENTS_LOCK} file exists, skipping dependency update.")
+        elif self._are_all_dependencies_prebuilt(config, context):
+            logger.info("All dependencies were built in this run, skipping 'helm dependencies update'.")
+        else:
+            self._update_dependencies(config, context, present_lock_files)
+        self._inject_prebuilt_subcharts(config, context)
+
+
+class HelmChartStager(BuildStep):
+    """
+    Stages a copy of the chart with the versions set by HelmGitVersionSetter written to its Chart.yaml, after
+    the chart's dependencies are updated. The following steps render and lint the copy, so they see the same
+    versions as the packaged chart while the chart's files are not changed. The chart itself is packaged,
+    with the versions passed to 'helm package', unless there are annotations to add. Not used with
+    '--modify-chart-in-place', which writes the versions to the chart's Chart.yaml instead.
+    """
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {STEP_BUILD}
+
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if is_modifying_chart_in_place(config):
+            return "the chart is modified in place using 'modify-chart-in-place' or 'keep-chart-changes' option"
+        if not (config.replace_chart_version_with_git or config.replace_app_version_with_git):
+            return "no version override options requested"
+        return None
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        overrides = context.get(context_key_version_overrides)
+        if is_modifying_chart_in_place(config) or not overrides:
+            return
+        staged_chart_dir = stage_chart(config.chart_dir, context)
+        replace_versions_in_chart_yaml(os.path.join(staged_chart_dir, CHART_YAML), overrides)
+        logger.info(f"Chart with versions set from git staged in '{staged_chart_dir}'.")
+        context[context_key_staged_chart_dir] = staged_chart_dir
+
 
 class HelmChartBuilder(BuildStep):
     """
@@ -413,6 +1121,11 @@ class HelmChartBuilder(BuildStep):
     _min_helm_version = "3.2.0"
     _max_helm_version = "4.0.0"
 
+    def __init__(self) -> None:
+        self._speculative_build: Optional[Future] = None
+        self._speculative_dir: Optional[str] = None
+        self._speculative_context: Optional[BuildContext] = None
+
     @property
     def steps_provided(self) -> Set[StepType]:
         return {STEP_BUILD}
@@ -424,6 +1137,14 @@ class HelmChartBuilder(BuildStep):
             default=".",
             help="Path of a directory to store the packaged tgz.",
         )
+        config_parser.add_argument(
+            "--speculative-packaging",
+            required=False,
+            action="store_true",
+            help="Start packaging the chart in the background as soon as its metadata is prepared, while the "
+            "chart is still being validated. The package is saved in '--destination' only if all the validation "
+            "steps succeed.",
+        )
 
     def pre_run(self, config: argparse.Namespace) -> None:
         """
@@ -432,57 +1153,256 @@ class HelmChartBuilder(BuildStep):
         :return: None
         """
         self._assert_binary_present_in_path(self._helm_bin)
-        run_res = run_and_log([self._helm_bin, "version"], capture_output=True)  # nosec
-        version_line = run_res.stdout.splitlines()[0]
-        prefix = "version.BuildInfo"
-        if version_line.startswith(prefix):
-            version_line = version_line[len(prefix) :].strip("{}")
-        else:
-            raise ValidationError(self.name, f"Can't parse '{self._helm_bin}' version number.")
-        version_entries = version_line.split(",")[0]
-        version = version_entries.split(":")[1].strip('"')
+        version = get_helm_version(self.name, self._helm_bin)
         self._assert_version_in_range(self._helm_bin, version, self._min_helm_version, self._max_helm_version)
 
-    def run(self, config: argparse.Namespace, context: Context) -> None:
+    def _package(
+        self, config: argparse.Namespace, destination: str, chart_dir: str, version_overrides: Dict[str, str]
+    ) -> str:
         """
         Runs 'helm package' to build the chart.
         :param config: the config object
-        :param context: the context object
-        :return: None
+        :param destination: directory to save the chart archive in
+        :param chart_dir: directory to package, the chart's directory or its staged copy
+        :param version_overrides: versions to set in the packaged Chart.yaml, by key
+        :return: absolute path of the chart archive, as reported by helm
         """
         args = [
             self._helm_bin,
             "package",
-            config.chart_dir,
+            chart_dir,
             "--destination",
-            config.destination,
+            destination,
         ]
+        if CHART_YAML_CHART_VERSION_KEY in version_overrides:
+            args.extend(["--version", version_overrides[CHART_YAML_CHART_VERSION_KEY]])
+        if CHART_YAML_APP_VERSION_KEY in version_overrides:
+            args.extend(["--app-version", version_overrides[CHART_YAML_APP_VERSION_KEY]])
         logger.info("Building chart with 'helm package'")
         run_res = run_and_log(args, capture_output=True)  # nosec, input params checked above in pre_run
+        full_chart_path = ""
         for line in run_res.stdout.splitlines():
             logger.info(line)
             if line.startswith("Successfully packaged chart and saved it to"):
-                full_chart_path = line.split(":")[1].strip()
-                full_chart_path = os.path.abspath(full_chart_path)
-                # compare our expected chart_file_name with the one returned from helm and fail if differs
-                helm_chart_file_name = os.path.basename(full_chart_path)
-                if (
-                    context_key_chart_file_name in context
-                    and helm_chart_file_name != context[context_key_chart_file_name]
-                ):
-                    raise BuildError(
-                        self.name,
-                        f"unexpected chart path '{helm_chart_file_name}' != '{context[context_key_chart_file_name]}'",
-                    )
-                if context_key_chart_full_path in context and full_chart_path != context[context_key_chart_full_path]:
-                    raise BuildError(
-                        self.name,
-                        f"unexpected helm build result: path reported in output '{full_chart_path}' "
-                        f"is not equal to '{context[context_key_chart_full_path]}'",
-                    )
+                full_chart_path = os.path.abspath(line.split(":")[1].strip())
         if run_res.returncode != 0:
             logger.error(f"{self._helm_bin} run failed with exit code {run_res.returncode}")
             raise BuildError(self.name, "Chart build failed")
+        return full_chart_path
+
+    def _package_speculatively(self, config: argparse.Namespace, destination: str, snapshot: BuildContext) -> str:
+        full_chart_path = self._package(
+            config, destination, get_package_dir(config, snapshot), snapshot.version_overrides
+        )
+        snapshot.chart_digest = get_file_sha256(full_chart_path)
+        return full_chart_path
+
+    def _save_chart_path(self, context: Context, full_chart_path: str) -> None:
+        # compare our expected chart_file_name with the one returned from helm and fail if differs
+        helm_chart_file_name = os.path.basename(full_chart_path)
+        if context_key_chart_file_name in context and helm_chart_file_name != context[context_key_chart_file_name]:
+            raise BuildError(
+                self.name,
+                f"unexpected chart path '{helm_chart_file_name}' != '{context[context_key_chart_file_name]}'",
+            )
+        if context_key_chart_full_path in context and full_chart_path != context[context_key_chart_full_path]:
+            raise BuildError(
+                self.name,
+                f"unexpected helm build result: path reported in output '{full_chart_path}' "
+                f"is not equal to '{context[context_key_chart_full_path]}'",
+            )
+        context[context_key_chart_file_name] = helm_chart_file_name
+        context[context_key_chart_full_path] = full_chart_path
+
+    def start_speculative_build(self, config: argparse.Namespace, context: BuildContext) -> None:
+        """
+        Starts 'helm package' and computation of the archive's digest in a background thread, which works
+        on a snapshot of the context. The archive is saved in a temporary directory until 'run' commits it
+        to the destination directory and merges the snapshot.
+        :param config: the config object
+        :param context: the context object
+        :return: None
+        """
+        self._speculative_dir = tempfile.mkdtemp(prefix="abs-speculative-")
+        self._speculative_context = context.snapshot()
+        logger.info("Starting speculative build of the chart in the background.")
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative-package")
+        # run in a copy of the current context, so logs and process limits of the calling step still apply
+        self._speculative_build = executor.submit(
+            contextvars.copy_context().run,
+            self._package_speculatively,
+            config,
+            self._speculative_dir,
+            self._speculative_context,
+        )
+        executor.shutdown(wait=False)
+
+    def _commit_speculative_build(self, config: argparse.Namespace, context: BuildContext, build: Future) -> None:
+        self._speculative_build = None
+        speculative_chart_path = build.result()
+        if self._speculative_context is not None:
+            context.merge(self._speculative_context, self.name)
+            self._speculative_context = None
+        full_chart_path = os.path.abspath(os.path.join(config.destination, os.path.basename(speculative_chart_path)))
+        self._save_chart_path(context, full_chart_path)
+        pathlib.Path(config.destination).mkdir(parents=True, exist_ok=True)
+        shutil.move(speculative_chart_path, full_chart_path)
+        logger.info(f"Speculatively built chart saved to: {full_chart_path}")
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        """
+        Runs 'helm package' to build the chart or, if a speculative build was started, waits for it and
+        moves its result to the destination directory.
+        :param config: the config object
+        :param context: the context object
+        :return: None
+        """
+        if self._speculative_build is not None:
+            self._commit_speculative_build(config, cast(BuildContext, context), self._speculative_build)
+            return
+        chart_path = self._package(
+            config, config.destination, get_package_dir(config, context), context.get(context_key_version_overrides, {})
+        )
+        self._save_chart_path(context, chart_path)
+
+    def cleanup(
+        self,
+        config: argparse.Namespace,
+        context: Context,
+        has_build_failed: bool,
+    ) -> None:
+        if self._speculative_build is not None:
+            logger.info("Discarding speculatively built chart, as the build failed before it was committed.")
+            # 'helm package' can't be interrupted safely, so let it finish before removing its input and output
+            wait([self._speculative_build])
+            self._speculative_build = None
+            self._speculative_context = None
+        if self._speculative_dir is not None:
+            shutil.rmtree(self._speculative_dir, ignore_errors=True)
+            self._speculative_dir = None
+        # copies of the chart staged by other steps are removed here, when nothing reads them anymore
+        for staged_dir in context.get(context_key_staged_dirs, []):
+            shutil.rmtree(staged_dir, ignore_errors=True)
+        context[context_key_staged_dirs] = []
+
+
+class HelmChartPackageSizeAnalyzer(BuildStep):
+    """
+    Reports sizes of files in the chart archive built by HelmChartBuilder and checks the archive against
+    a size budget, the size of the previous build recorded in the metadata and a list of unwanted files,
+    like backups of chart files. Problems are logged as warnings, unless '--package-size-enforce' is set.
+    """
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {STEP_BUILD}
+
+    def initialize_config(self, config_parser: configargparse.ArgParser) -> None:
+        config_parser.add_argument(
+            "--analyze-package-size",
+            required=False,
+            action="store_true",
+            help="Report sizes of files in the chart archive and check it against '--package-size-*' limits.",
+        )
+        config_parser.add_argument(
+            "--package-size-budget",
+            required=False,
+            default=0,
+            type=int,
+            help="Max size of the chart archive in bytes. 0 disables the budget.",
+        )
+        config_parser.add_argument(
+            "--package-size-max-growth",
+            required=False,
+            default=10.0,
+            type=float,
+            help="Max growth, in percent, of the chart archive compared with the previous build of the chart "
+            "in '--destination'. Sizes are recorded only in generated metadata.",
+        )
+        config_parser.add_argument(
+            "--package-unwanted-files",
+            required=False,
+            default=package_size.DEFAULT_UNWANTED_FILES,
+            help="Comma-separated list of patterns of names of files that shouldn't be in the chart archive.",
+        )
+        config_parser.add_argument(
+            "--package-size-enforce",
+            required=False,
+            action="store_true",
+            help="Fail the build if the chart archive exceeds any of the limits or contains unwanted files, "
+            "instead of only logging warnings.",
+        )
+
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if not config.analyze_package_size:
+            return "package size analysis is not enabled using 'analyze-package-size' option"
+        return None
+
+    def pre_run(self, config: argparse.Namespace) -> None:
+        if not config.analyze_package_size:
+            return
+        if config.package_size_budget < 0:
+            raise ValidationError(self.name, "Option '--package-size-budget' can't be negative.")
+        if config.package_size_max_growth < 0:
+            raise ValidationError(self.name, "Option '--package-size-max-growth' can't be negative.")
+
+    def _find_problems(self, config: argparse.Namespace, report: package_size.PackageSizeReport) -> List[str]:
+        problems: List[str] = []
+        if report.unwanted_files:
+            problems.append(f"unwanted files were packaged, add them to '.helmignore': {report.unwanted_files}")
+        if config.package_size_budget and report.archive_size > config.package_size_budget:
+            problems.append(
+                f"archive size {report.archive_size} exceeds the budget of {config.package_size_budget} bytes"
+            )
+        previous = package_size.get_previous_archive_size(config.destination, os.path.basename(report.chart_path))
+        if previous:
+            growth = (report.archive_size - previous) / previous * 100
+            if growth > config.package_size_max_growth:
+                problems.append(
+                    f"archive grew by {growth:.1f}% from {previous} bytes in the previous build, more than "
+                    f"the allowed {config.package_size_max_growth}%"
+                )
+        return problems
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        if not config.analyze_package_size:
+            return
+        report = package_size.analyze_package(
+            context[context_key_chart_full_path], package_size.parse_patterns(config.package_unwanted_files)
+        )
+        logger.info(package_size.format_package_report(report))
+        context[context_key_package_size] = report
+        problems = self._find_problems(config, report)
+        for problem in problems:
+            logger.warning(f"Chart package problem: {problem}.")
+        if problems and config.package_size_enforce:
+            raise BuildError(self.name, f"Chart package has problems: {'; '.join(problems)}.")
+
+
+class HelmChartSpeculativePackager(BuildStep):
+    """
+    Starts HelmChartBuilder's speculative build as soon as Chart.yaml is final, so packaging runs
+    concurrently with the validation steps. Only used with the '--speculative-packaging' option, which
+    makes HelmBuildFilteringPipeline run this step and HelmChartMetadataPreparer before the chart is
+    rendered and linted.
+    """
+
+    def __init__(self, builder: HelmChartBuilder):
+        self._builder = builder
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {STEP_BUILD}
+
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if not config.speculative_packaging:
+            return "speculative packaging is not enabled using 'speculative-packaging' option"
+        return None
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        if not config.speculative_packaging:
+            return
+        self._builder.start_speculative_build(config, cast(BuildContext, context))
 
 
 class HelmChartMetadataPreparer(BuildStep):
@@ -522,6 +1442,19 @@ class HelmChartMetadataPreparer(BuildStep):
             required=False,
             help="Base URL of the catalog in which the app package will be stored in. Should end with a /",
         )
+        config_parser.add_argument(
+            "--precompress-metadata",
+            required=False,
+            default="",
+            help="Comma-separated list of encodings ('gzip', 'br') of precompressed copies of metadata files written "
+            "next to them, for static file servers. JSON files also get minified '.min.json' copies and digests "
+            "of all the files are saved in 'main.yaml'. Encoding 'br' requires the 'brotli' python package.",
+        )
+
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if not config.generate_metadata:
+            return "metadata generation is disabled using 'generate-metadata' option"
+        return None
 
     def pre_run(self, config: argparse.Namespace) -> None:
         if not config.generate_metadata:
@@ -533,6 +1466,7 @@ class HelmChartMetadataPreparer(BuildStep):
             )
         if not config.catalog_base_url.endswith("/"):
             raise ValidationError(self.name, "config option --catalog-base-url value should end with a /")
+        self._validate_encodings(config)
         # first step of validation should be done already by 'ct' with correct schema (unless explicitly disabled)
         chart_yaml_path = os.path.join(config.chart_dir, CHART_YAML)
         with open(chart_yaml_path, "r") as file:
@@ -554,6 +1488,16 @@ class HelmChartMetadataPreparer(BuildStep):
                 ):
                     raise ValidationError(self.name, f"Value of '{option}' is not a correct boolean.")
 
+    def _validate_encodings(self, config: argparse.Namespace) -> None:
+        try:
+            encodings = meta_files.parse_encodings(config.precompress_metadata)
+        except ValueError as e:
+            raise ValidationError(self.name, f"Invalid value of '--precompress-metadata': {e}")
+        if meta_files.ENCODING_BROTLI in encodings and not meta_files.is_brotli_available():
+            raise ValidationError(
+                self.name, f"Encoding '{meta_files.ENCODING_BROTLI}' requires 'brotli' python package."
+            )
+
     @staticmethod
     def write_chart_yaml(chart_yaml_file_name: str, data: Context) -> None:
         with open(chart_yaml_file_name, "w") as f:
@@ -579,14 +1523,29 @@ class HelmChartMetadataPreparer(BuildStep):
 
         return annotations
 
+    def write_file_variants(self, config: argparse.Namespace, meta_dir_path: str) -> Dict[str, str]:
+        """
+        Writes minified and precompressed variants of the files copied into the metadata directory.
+        :return: sha256 digests of the files and their variants, by file name
+        """
+        encodings = meta_files.parse_encodings(config.precompress_metadata)
+        digests: Dict[str, str] = {}
+        for additional_file in self._annotation_files_map:
+            source_file_path = os.path.join(os.path.abspath(config.chart_dir), additional_file)
+            if os.path.isfile(source_file_path):
+                target_file_path = os.path.join(meta_dir_path, os.path.basename(additional_file))
+                try:
+                    digests.update(meta_files.write_file_variants(target_file_path, encodings))
+                except ValueError as e:
+                    raise BuildError(self.name, f"Can't minify '{additional_file}': {e}")
+        return digests
+
     def run(self, config: argparse.Namespace, context: Context) -> None:
         if not config.generate_metadata:
             logger.info("Metadata generation is disabled using 'generate-metadata' option.")
             return
-        # read current Chart.yaml
-        chart_yaml_path = os.path.join(config.chart_dir, CHART_YAML)
-        with open(chart_yaml_path, "r") as file:
-            chart_yaml = yaml.safe_load(file)
+        # read current Chart.yaml, with versions that will be set by 'helm package'
+        chart_yaml = load_chart_yaml(config, context)
         original_annotations = chart_yaml.get(self._key_annotations, None)
         # try to guess the package file name. we need it for url generation in annotations
         chart_name = chart_yaml["name"]
@@ -608,15 +1567,33 @@ class HelmChartMetadataPreparer(BuildStep):
                 context[context_key_meta_dir_path],
             ),
         }
-        # save Chart.yaml
-        if (
-            not context.get(context_key_changes_made, False)
-            and original_annotations != chart_yaml[self._key_annotations]
-        ):
-            logger.debug(f"Saving backup of {CHART_YAML} in {CHART_YAML}.back")
-            shutil.copy2(chart_yaml_path, chart_yaml_path + ".back")
-            context[context_key_changes_made] = True
-        self.write_chart_yaml(chart_yaml_path, chart_yaml)
+        if config.precompress_metadata:
+            context[context_key_meta_file_digests] = self.write_file_variants(
+                config, context[context_key_meta_dir_path]
+            )
+        if original_annotations == chart_yaml[self._key_annotations]:
+            return
+        packaging = StepWrappingPipeline.is_step_requested(config, HelmChartBuilder())
+        # with '--speculative-packaging' the checks still run, so they have to see the unmodified Chart.yaml;
+        # HelmChartMetadataFinalizer copies the annotated one into the chart when it's modified in place
+        if is_modifying_chart_in_place(config) and not (config.speculative_packaging and packaging):
+            self.write_chart_yaml(backup_chart_yaml(config, context), chart_yaml)
+        elif packaging:
+            self._stage_package_dir(config, context, chart_yaml)
+
+    def _stage_package_dir(self, config: argparse.Namespace, context: Context, chart_yaml: Dict[str, Any]) -> None:
+        """
+        Writes the annotations to a copy of the chart that HelmChartBuilder packages instead of the chart's
+        directory. The copy staged by HelmChartStager is reused, unless it's still going to be checked: with
+        '--speculative-packaging', this step runs before the checks. Chart.yaml of the copy is replaced with
+        the one loaded from the chart, so relative 'file://' dependencies stay relative in the package.
+        """
+        package_dir = context.get(context_key_staged_chart_dir)
+        if package_dir is None or config.speculative_packaging:
+            package_dir = stage_chart(config.chart_dir, context)
+        context[context_key_package_dir] = package_dir
+        logger.info(f"Packaging a copy of the chart staged in '{package_dir}' with metadata annotations.")
+        self.write_chart_yaml(os.path.join(package_dir, CHART_YAML), chart_yaml)
 
 
 class HelmChartMetadataFinalizer(BuildStep):
@@ -640,11 +1617,17 @@ class HelmChartMetadataFinalizer(BuildStep):
     _key_annotations = "annotations"
     _key_icon = "icon"
     _key_home = "home"
+    _key_file_digests = "fileDigests"
 
     @property
     def steps_provided(self) -> Set[StepType]:
         return {STEP_METADATA}
 
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if not config.generate_metadata:
+            return "metadata generation is disabled using 'generate-metadata' option"
+        return None
+
     def pre_run(self, config: argparse.Namespace) -> None:
         chart_yaml_path = os.path.join(config.chart_dir, CHART_YAML)
         with open(chart_yaml_path, "r") as file:
@@ -671,12 +1654,12 @@ class HelmChartMetadataFinalizer(BuildStep):
             logger.info("Metadata generation is disabled using 'generate-metadata' option.")
             return
         meta = {}
-        chart_yaml_path = os.path.join(config.chart_dir, CHART_YAML)
-        with open(chart_yaml_path, "r") as file:
-            chart_yaml = yaml.safe_load(file)
+        chart_yaml = load_chart_yaml(config, context)
         # mandatory metadata
         meta[self._key_chart_file] = context[context_key_chart_file_name]
-        meta[self._key_digest] = get_file_sha256(context[context_key_chart_full_path])
+        meta[self._key_digest] = context.get(context_key_chart_digest) or get_file_sha256(
+            context[context_key_chart_full_path]
+        )
         meta[self._key_date_created] = self.get_build_timestamp()
         meta[self._key_chart_api_version] = chart_yaml[self._key_api_version]
         # optional metadata
@@ -690,11 +1673,21 @@ class HelmChartMetadataFinalizer(BuildStep):
         ]:
             if key in chart_yaml:
                 meta[key] = chart_yaml[key]
+        if context.get(context_key_package_size) is not None:
+            meta[package_size.META_KEY_PACKAGE_SIZE] = context[context_key_package_size].to_metadata()
+        if context.get(context_key_meta_file_digests):
+            meta[self._key_file_digests] = context[context_key_meta_file_digests]
         # save metadata file
         pathlib.Path(context[context_key_meta_dir_path]).mkdir(exist_ok=True)
         meta_file_name = os.path.join(context[context_key_meta_dir_path], "main.yaml")
         self.write_meta_file(meta_file_name, meta)
+        if config.precompress_metadata:
+            meta_files.write_compressed_files(meta_file_name, meta_files.parse_encodings(config.precompress_metadata))
         logger.info(f"Metadata file saved to '{meta_file_name}'")
+        package_dir = context.get(context_key_package_dir)
+        if is_modifying_chart_in_place(config) and package_dir:
+            logger.info(f"Copying {CHART_YAML} with metadata annotations from '{package_dir}' to the chart.")
+            shutil.copy2(os.path.join(package_dir, CHART_YAML), backup_chart_yaml(config, context))
 
 
 class HelmChartYAMLRestorer(BuildStep):
@@ -707,9 +1700,14 @@ class HelmChartYAMLRestorer(BuildStep):
             "--keep-chart-changes",
             required=False,
             action="store_true",
-            help=f"Should the changes made in {CHART_YAML} be kept",
+            help=f"Should the changes made in {CHART_YAML} be kept. Implies '--modify-chart-in-place'.",
         )
 
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if config.keep_chart_changes:
+            return f"changes made in {CHART_YAML} are kept using 'keep-chart-changes' option"
+        return None
+
     def run(self, config: argparse.Namespace, context: Context) -> None:
         # nothing to do here, we run in cleanup
         pass
@@ -720,6 +1718,13 @@ class HelmChartYAMLRestorer(BuildStep):
         context: Context,
         has_build_failed: bool,
     ) -> None:
+        for subchart_path in context.get(context_key_injected_subcharts, []):
+            logger.info(f"Removing subchart archive '{subchart_path}' added by the build.")
+            pathlib.Path(subchart_path).unlink(missing_ok=True)
+        for backup_path, subchart_path in context.get(context_key_replaced_subcharts, {}).items():
+            logger.info(f"Restoring subchart archive '{subchart_path}' replaced by the build.")
+            shutil.move(backup_path, subchart_path)
+            os.rmdir(os.path.dirname(backup_path))
         if config.keep_chart_changes:
             logger.info(f"Skipping restore of {CHART_YAML}.")
             return
@@ -734,6 +1739,91 @@ class HelmChartYAMLRestorer(BuildStep):
                 shutil.move(lock_file_path + ".back", lock_file_path)
 
 
+class HelmChartOciPublisher(BuildStep):
+    """
+    Pushes the built chart archive and its metadata files to an OCI registry. Blobs already present in the
+    registry are not uploaded again.
+    """
+
+    # shared by all the instances, so connections are reused between charts built by the same process
+    _http_pool = HttpConnectionPool()
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {STEP_PUBLISH}
+
+    def initialize_config(self, config_parser: configargparse.ArgParser) -> None:
+        config_parser.add_argument(
+            "--oci-registry",
+            required=False,
+            default="",
+            help="OCI registry and namespace to push the chart to, like 'registry.example.com/charts'. "
+            "Use 'http://' prefix for registries that don't support TLS. Publishing is disabled if empty.",
+        )
+        config_parser.add_argument(
+            "--oci-username",
+            required=False,
+            default="",
+            help="User name used to authenticate to the OCI registry.",
+        )
+        config_parser.add_argument(
+            "--oci-password-file",
+            required=False,
+            default="",
+            help="Path of a file with the password or token used to authenticate to the OCI registry. If empty, "
+            f"the password is read from the '{OCI_PASSWORD_ENV_VAR}' environment variable. The password can't be "
+            "passed as an option, as all the options are logged.",
+        )
+        config_parser.add_argument(
+            "--oci-push-workers",
+            required=False,
+            default=4,
+            type=int,
+            help="Max number of blobs uploaded to the OCI registry concurrently.",
+        )
+
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if not config.oci_registry:
+            return "no registry configured with 'oci-registry' option"
+        return None
+
+    def pre_run(self, config: argparse.Namespace) -> None:
+        if not config.oci_registry:
+            logger.debug("No OCI registry configured, skipping pre-run.")
+            return
+        if config.oci_push_workers < 1:
+            raise ValidationError(self.name, "config option --oci-push-workers has to be at least 1")
+        if config.oci_password_file and not os.path.isfile(config.oci_password_file):
+            raise ValidationError(self.name, f"OCI password file '{config.oci_password_file}' doesn't exist")
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        if not config.oci_registry:
+            logger.debug("No OCI registry configured, ending step.")
+            return
+        if context_key_chart_full_path not in context:
+            raise BuildError(self.name, "can't find the path of the built chart")
+        meta_dir_path = context.get(context_key_meta_dir_path)
+        client = OciRegistryClient(
+            config.oci_registry, config.oci_username, self._read_password(config), pool=self._http_pool
+        )
+        artifact = ChartArtifact(context[context_key_chart_full_path], meta_dir_path)
+        logger.info(f"Pushing chart '{artifact.chart_path}' to OCI registry '{config.oci_registry}'.")
+        try:
+            results = push_charts(client, [artifact], config.oci_push_workers)
+        except (OciError, OSError) as e:
+            raise BuildError(self.name, f"Pushing to OCI registry failed: {e}")
+        context[context_key_oci_references] = [r.reference for r in results]
+
+    def _read_password(self, config: argparse.Namespace) -> str:
+        if not config.oci_password_file:
+            return os.environ.get(OCI_PASSWORD_ENV_VAR, "")
+        try:
+            with open(config.oci_password_file, "r") as f:
+                return f.read().strip()
+        except OSError as e:
+            raise BuildError(self.name, f"Can't read OCI password file: {e}")
+
+
 @runtime_checkable
 class GiantSwarmValidator(Protocol):
     """This class is only used for type hinting of simple giant_swarm_validators below"""
@@ -745,11 +1835,57 @@ class GiantSwarmValidator(Protocol):
         ...
 
 
+@runtime_checkable
+class GiantSwarmManifestValidator(Protocol):
+    """
+    This class is only used for type hinting of giant_swarm_validators that check manifests rendered
+    from the chart. They run in the build stage, after HelmChartTemplateRenderer.
+    """
+
+    def validate_manifests(self, config: argparse.Namespace, context: Context) -> bool:
+        ...
+
+    def get_check_code(self) -> str:
+        ...
+
+
+GIANT_SWARM_VALIDATORS_PACKAGE = "app_build_suite.build_steps.giant_swarm_validators"
+
+_giant_swarm_validator_modules: Optional[List[ModuleType]] = None
+_giant_swarm_validator_modules_lock = threading.Lock()
+
+
+def _get_giant_swarm_validator_modules() -> List[ModuleType]:
+    """
+    Imports all the modules of the Giant Swarm validators package once per process. Builds running in threads
+    share the imported modules, so 'sys.path' is never changed.
+    """
+    global _giant_swarm_validator_modules
+    with _giant_swarm_validator_modules_lock:
+        if _giant_swarm_validator_modules is None:
+            modules: List[ModuleType] = []
+            validators_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "giant_swarm_validators")
+            for modname in sorted(listdir(validators_dir)):
+                if not modname.endswith(".py") or modname == "__init__.py":
+                    continue
+                try:
+                    modules.append(importlib.import_module(f"{GIANT_SWARM_VALIDATORS_PACKAGE}.{modname[:-3]}"))
+                except ImportError:
+                    logger.warning(f"Couldn't import Giant Swarm validation module '{modname}'.")
+            _giant_swarm_validator_modules = modules
+        return _giant_swarm_validator_modules
+
+
 class GiantSwarmHelmValidator(BuildStep):
     """
-    Validator that checks Helm Chart compliance according to Giant Swarm internal rules.
+    Validator that checks Helm Chart compliance according to Giant Swarm internal rules. Checks of source
+    files run in the pre-run stage, checks of rendered manifests in the build stage.
     """
 
+    def __init__(self) -> None:
+        self._manifest_validators: List[Any] = []
+        self._validators_loaded = False
+
     @property
     def steps_provided(self) -> Set[StepType]:
         return {STEP_VALIDATE}
@@ -779,6 +1915,11 @@ class GiantSwarmHelmValidator(BuildStep):
             help="Comma-separated list of Giant Swarm validation checks to ignore even if they fail",
         )
 
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if config.disable_giantswarm_helm_validator:
+            return "disabled using 'disable-giantswarm-helm-validator' option"
+        return None
+
     def pre_run(self, config: argparse.Namespace) -> None:
         """Runs a set of Giant Swarm specific validations."""
         if config.disable_giantswarm_helm_validator:
@@ -786,80 +1927,264 @@ class GiantSwarmHelmValidator(BuildStep):
             return
 
         gs_validators = self._load_giant_swarm_validators()
+        self._manifest_validators = [v for v in gs_validators if isinstance(v, GiantSwarmManifestValidator)]
+        self._validators_loaded = True
+        self.validate_chart_files(config, [v for v in gs_validators if isinstance(v, GiantSwarmValidator)])
+
+    def may_check_manifests(self, config: argparse.Namespace) -> bool:
+        """
+        Tells if the build stage validates rendered manifests. Until the validators are loaded in the pre-run
+        stage, it's only known that it can't if the validation is disabled.
+        """
+        if config.disable_giantswarm_helm_validator:
+            return False
+        return not self._validators_loaded or bool(self._manifest_validators)
+
+    def get_chart_file_validators(self) -> List[GiantSwarmValidator]:
+        """Loads validators that check source files of charts."""
+        return [v for v in self._load_giant_swarm_validators() if isinstance(v, GiantSwarmValidator)]
 
+    def validate_chart_files(self, config: argparse.Namespace, gs_validators: List[GiantSwarmValidator]) -> None:
+        """Runs the validators of source files for the chart in 'config.chart_dir'."""
+        for validator in gs_validators:
+            self._report_result(config, validator, lambda v: v.validate(config))
+
+    def get_checkpoint_inputs(self, config: argparse.Namespace) -> List[str]:
+        return [config.chart_dir]
+
+    def get_checkpoint_options(self) -> List[str]:
+        return [
+            "chart_dir",
+            "disable_giantswarm_helm_validator",
+            "disable_strict_giantswarm_validator",
+            "giantswarm_validator_ignored_checks",
+        ]
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        """Runs Giant Swarm validations of manifests rendered from the chart."""
+        if config.disable_giantswarm_helm_validator or not self._manifest_validators:
+            return
+        if context_key_rendered_manifests not in context:
+            logger.warning("Rendered manifests are not available, skipping Giant Swarm manifest validation.")
+            return
+        for validator in self._manifest_validators:
+            self._report_result(config, validator, lambda v: v.validate_manifests(config, context))
+
+    @staticmethod
+    def _get_ignored_checks(config: argparse.Namespace) -> List[str]:
         ignore_list: List[str] = []
         ignore_str_list: List[str] = config.giantswarm_validator_ignored_checks.split(",")
         for name in ignore_str_list:
             n = name.strip()
             if n:
                 ignore_list.append(n)
+        return ignore_list
 
-        for validator in gs_validators:
-            validator_name = type(validator).__name__
-            logger.info(f"Running Giant Swarm validator '{validator.get_check_code()}: {validator_name}'.")
-            if validator.validate(config):
-                logger.debug(f"Giant Swarm validator '{validator.get_check_code()}: {validator_name}' is OK.")
+    def _report_result(self, config: argparse.Namespace, validator: Any, validate: Callable[[Any], bool]) -> None:
+        validator_name = type(validator).__name__
+        logger.info(f"Running Giant Swarm validator '{validator.get_check_code()}: {validator_name}'.")
+        if validate(validator):
+            logger.debug(f"Giant Swarm validator '{validator.get_check_code()}: {validator_name}' is OK.")
+        else:
+            msg = f"Giant Swarm validator '{validator.get_check_code()}: {validator_name}' failed its checks."
+            ignore_list = self._get_ignored_checks(config)
+            # new checks can be introduced as warnings first, so they don't break builds of existing charts
+            warn_only = getattr(validator, "warn_only", False)
+            if (
+                not config.disable_strict_giantswarm_validator
+                and not warn_only
+                and validator.get_check_code() not in ignore_list
+            ):
+                raise ValidationError(self.name, msg)
             else:
-                msg = f"Giant Swarm validator '{validator.get_check_code()}: {validator_name}' failed its checks."
-                if not config.disable_strict_giantswarm_validator and validator.get_check_code() not in ignore_list:
-                    raise ValidationError(self.name, msg)
-                else:
-                    logger.warning(msg)
-
-    def _load_giant_swarm_validators(self) -> List[GiantSwarmValidator]:
-        gs_validators: List[GiantSwarmValidator] = []
-        current_frame = inspect.currentframe()
-        if current_frame is None:
-            raise ValidationError(self.name, "Can't check current frame and detect current module's path.")
-
-        cur_mod_path = os.path.dirname(os.path.abspath(inspect.getfile(current_frame)))
-        validators_mod_path = os.path.join(cur_mod_path, "giant_swarm_validators")
-        for modname in listdir(validators_mod_path):
-            if modname.endswith(".py"):
-                old_path, path[:] = path[:], [validators_mod_path]
-                try:
-                    module = __import__(modname[:-3])
-                except ImportError:
-                    logger.warning(f"Couldn't import Giant Swarm validation module '{modname}'.")
-                    continue
-                finally:  # always restore the real path
-                    path[:] = old_path
-
-                for attr in dir(module):
-                    cls = getattr(module, attr)
-                    if isinstance(cls, type) and issubclass(cls, GiantSwarmValidator):
-                        new_validator = cls()
-                        if new_validator.get_check_code() in (c.get_check_code() for c in gs_validators):
-                            raise ValidationError(
-                                self.name,
-                                f"Found more than 1 Giant Swarm validator with check code "
-                                f"'{new_validator.get_check_code()}'. Check codes have to be unique.",
-                            )
-                        gs_validators.append(new_validator)
+                logger.warning(msg)
+
+    def _load_giant_swarm_validators(self) -> List[Any]:
+        gs_validators: List[Any] = []
+        for module in _get_giant_swarm_validator_modules():
+            for attr in dir(module):
+                cls = getattr(module, attr)
+                if isinstance(cls, type) and (
+                    issubclass(cls, GiantSwarmValidator) or issubclass(cls, GiantSwarmManifestValidator)
+                ):
+                    new_validator = cls()
+                    if new_validator.get_check_code() in (c.get_check_code() for c in gs_validators):
+                        raise ValidationError(
+                            self.name,
+                            f"Found more than 1 Giant Swarm validator with check code "
+                            f"'{new_validator.get_check_code()}'. Check codes have to be unique.",
+                        )
+                    gs_validators.append(new_validator)
         return gs_validators
 
+
+class HelmSubchartValidator(BuildStep):
+    """
+    Validates unpacked subcharts vendored in the chart's 'charts/' directory, recursively. Each subchart is checked
+    in a worker pool by HelmBuilderValidator, the Giant Swarm checks of chart files and, unless static checks
+    are skipped, KubeLinter. Results are cached by the contents of subcharts for the whole process.
+    """
+
+    # shared by all the instances of the step, so subcharts used by many umbrella charts are validated once
+    _cache = subcharts.SubchartValidationCache()
+
+    def __init__(self) -> None:
+        self._gs_validator = GiantSwarmHelmValidator()
+        self._gs_file_validators: List[GiantSwarmValidator] = []
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {STEP_VALIDATE}
+
+    def initialize_config(self, config_parser: configargparse.ArgParser) -> None:
+        config_parser.add_argument(
+            "--validate-subcharts",
+            required=False,
+            default=False,
+            action="store_true",
+            help="Validate all the unpacked subcharts found in the chart's 'charts/' directory, recursively.",
+        )
+        config_parser.add_argument(
+            "--subchart-workers",
+            required=False,
+            default=4,
+            type=int,
+            help="Max number of subcharts validated in parallel with '--validate-subcharts'.",
+        )
+
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        if not config.validate_subcharts:
+            return "subchart validation is not enabled using 'validate-subcharts' option"
+        return None
+
+    def pre_run(self, config: argparse.Namespace) -> None:
+        if not config.validate_subcharts:
+            return
+        if config.subchart_workers < 1:
+            raise ValidationError(self.name, "Option '--subchart-workers' has to be at least 1.")
+        if not config.disable_giantswarm_helm_validator:
+            self._gs_file_validators = self._gs_validator.get_chart_file_validators()
+
+    def get_checkpoint_inputs(self, config: argparse.Namespace) -> List[str]:
+        return [p for p in [config.chart_dir, config.kubelinter_config] if p is not None]
+
+    def get_checkpoint_options(self) -> List[str]:
+        return [
+            "chart_dir",
+            "validate_subcharts",
+            "disable_giantswarm_helm_validator",
+            "disable_strict_giantswarm_validator",
+            "giantswarm_validator_ignored_checks",
+            "kubelinter_config",
+            "steps",
+            "skip_steps",
+        ]
+
+    def _get_options_key(self, config: argparse.Namespace) -> str:
+        options = [
+            config.disable_giantswarm_helm_validator,
+            config.disable_strict_giantswarm_validator,
+            config.giantswarm_validator_ignored_checks,
+            StepWrappingPipeline.is_step_requested(config, KubeLinter()),
+            config.kubelinter_config,
+            get_file_sha256(config.kubelinter_config) if config.kubelinter_config else "",
+        ]
+        return ":".join(str(o) for o in options)
+
+    @staticmethod
+    def _lint_subchart(subchart_config: argparse.Namespace) -> None:
+        linter = KubeLinter()
+        linter.pre_run(subchart_config)
+        # a subchart is a different chart, so it gets a new context instead of a snapshot of the parent's one
+        linter.run(subchart_config, BuildContext())
+
+    def _validate_subchart(self, config: argparse.Namespace, subchart_dir: str) -> List[str]:
+        subchart_config = copy.copy(config)
+        subchart_config.chart_dir = subchart_dir
+        errors: List[str] = []
+        checks: List[Tuple[str, Callable[[], None]]] = [
+            (HelmBuilderValidator.__name__, lambda: HelmBuilderValidator().pre_run(subchart_config))
+        ]
+        if not config.disable_giantswarm_helm_validator:
+            checks.append(
+                (
+                    GiantSwarmHelmValidator.__name__,
+                    lambda: self._gs_validator.validate_chart_files(subchart_config, self._gs_file_validators),
+                )
+            )
+        if StepWrappingPipeline.is_step_requested(config, KubeLinter()):
+            checks.append((KubeLinter.__name__, lambda: self._lint_subchart(subchart_config)))
+        for name, check in checks:
+            try:
+                check()
+            except Error as e:
+                errors.append(f"{name}: {e.msg}")
+        return errors
+
     def run(self, config: argparse.Namespace, context: Context) -> None:
-        pass
+        if not config.validate_subcharts:
+            return
+        subchart_dirs = subcharts.find_subcharts(config.chart_dir)
+        if not subchart_dirs:
+            logger.info("No unpacked subcharts found, nothing to validate.")
+            return
+        logger.info(f"Validating {len(subchart_dirs)} subchart(s).")
+        results = subcharts.validate_subcharts(
+            subchart_dirs,
+            functools.partial(self._validate_subchart, config),
+            self._cache,
+            self._get_options_key(config),
+            config.subchart_workers,
+        )
+        failed = [r for r in results if not r.succeeded]
+        for result in results:
+            status = "OK" if result.succeeded else "FAILED"
+            logger.info(f"Subchart '{result.chart_dir}': {status}{' (cached)' if result.cached else ''}")
+            for error in result.errors:
+                logger.error(f"Subchart '{result.chart_dir}': {error}")
+        if failed:
+            raise BuildError(self.name, f"Validation of subcharts failed: {[r.chart_dir for r in failed]}.")
 
 
-class HelmBuildFilteringPipeline(BuildStepsFilteringPipeline):
+class HelmBuildFilteringPipeline(StepWrappingPipeline):
     """
     Pipeline that combines all the steps required to use helm3 as a chart builder.
     """
 
     def __init__(self) -> None:
+        builder = HelmChartBuilder()
+        gs_validator = GiantSwarmHelmValidator()
         super().__init__(
             [
                 HelmBuilderValidator(),
-                GiantSwarmHelmValidator(),
                 HelmGitVersionSetter(),
                 HelmRequirementsUpdater(),
+                HelmChartStager(),
+                HelmChartTemplateRenderer(gs_validator),
+                gs_validator,
+                HelmSubchartValidator(),
                 HelmChartToolLinter(),
                 KubeLinter(),
                 HelmChartMetadataPreparer(),
-                HelmChartBuilder(),
+                HelmChartSpeculativePackager(builder),
+                builder,
+                HelmChartPackageSizeAnalyzer(),
                 HelmChartMetadataFinalizer(),
+                HelmChartOciPublisher(),
                 HelmChartYAMLRestorer(),
             ],
             "Helm 3 build engine options",
         )
+
+    def get_steps(self, config: argparse.Namespace) -> List[BuildStep]:
+        """
+        With '--speculative-packaging', metadata is prepared and packaging started before the chart is rendered
+        and linted, so the checks run while the chart is being packaged.
+        """
+        steps = super().get_steps(config)
+        if not config.speculative_packaging:
+            return steps
+        moved = [s for s in steps if isinstance(s, (HelmChartMetadataPreparer, HelmChartSpeculativePackager))]
+        remaining = [s for s in steps if s not in moved]
+        first_check = next(i for i, s in enumerate(remaining) if isinstance(s, HelmChartTemplateRenderer))
+        return remaining[:first_check] + moved + remaining[first_check:]
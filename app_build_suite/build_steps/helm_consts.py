@@ -5,6 +5,8 @@ CHART_YAML = "Chart.yaml"
 VALUES_YAML = "values.yaml"
 CHART_LOCK = "Chart.lock"
 REQUIREMENTS_LOCK = "requirements.lock"
+REQUIREMENTS_YAML = "requirements.yaml"
 TEMPLATES_DIR = "templates"
 HELPERS_YAML = "_helpers.yaml"
 HELPERS_TPL = "_helpers.tpl"
+SUBCHARTS_DIR = "charts"
@@ -0,0 +1,159 @@
+"""
+On-disk cache of chart repository indexes. Each 'index.yaml' is parsed once and compiled into a compact
+binary file, which is memory-mapped and queried by chart name without loading the whole index. Cached
+indexes are revalidated with the repository using their ETag or Last-Modified headers.
+
+Layout of a compiled index file (all integers little-endian):
+  header:  8 bytes magic, uint32 number of charts
+  records: for each chart, sorted by name: uint64 name offset, uint32 name length,
+           uint64 entries offset, uint32 entries length
+  data:    UTF-8 encoded chart names and JSON encoded lists of the charts' index entries
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, Dict, List, NamedTuple, Optional, Protocol
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ABSIDX01"
+INDEX_FILE_SUFFIX = ".idx"
+META_FILE_SUFFIX = ".meta.json"
+_header = struct.Struct("<8sI")
+_record = struct.Struct("<QIQI")
+
+
+def get_default_index_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "app_build_suite", "indexes")
+
+
+class RepositoryIndex(Protocol):
+    def get_entries(self, name: str) -> List[Dict[str, Any]]:
+        """Returns index entries (one per version) of the chart, empty if the chart is not in the index."""
+        ...
+
+
+class InMemoryIndex:
+    """Index parsed from 'index.yaml' and kept in memory."""
+
+    def __init__(self, entries: Dict[str, List[Dict[str, Any]]]):
+        self._entries = entries
+
+    def get_entries(self, name: str) -> List[Dict[str, Any]]:
+        return list(self._entries.get(name) or [])
+
+
+class CompiledIndex:
+    """Memory-mapped compiled index. Only records read by the binary search and the found chart are loaded."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = _header.unpack_from(self._mmap, 0)
+        if magic != MAGIC or len(self._mmap) < _header.size + self._count * _record.size:
+            self._mmap.close()
+            raise ValueError(f"'{path}' is not a compiled chart repository index.")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _read_record(self, position: int) -> Any:
+        return _record.unpack_from(self._mmap, _header.size + position * _record.size)
+
+    def get_entries(self, name: str) -> List[Dict[str, Any]]:
+        wanted = name.encode()
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            name_offset, name_length, entries_offset, entries_length = self._read_record(middle)
+            current = self._mmap[name_offset : name_offset + name_length]
+            if current == wanted:
+                return json.loads(self._mmap[entries_offset : entries_offset + entries_length])
+            if current < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        return []
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+def compile_index(entries: Dict[str, List[Dict[str, Any]]], path: str) -> None:
+    """Writes the entries of a parsed 'index.yaml' as a compiled index file, replacing it atomically."""
+    names = sorted(name.encode() for name in entries)
+    records: List[bytes] = []
+    data: List[bytes] = []
+    offset = _header.size + len(names) * _record.size
+    for name in names:
+        # timestamps parsed by yaml are saved as strings
+        encoded = json.dumps(entries[name.decode()], separators=(",", ":"), default=str).encode()
+        records.append(_record.pack(offset, len(name), offset + len(name), len(encoded)))
+        data.extend([name, encoded])
+        offset += len(name) + len(encoded)
+    _write_atomically(path, b"".join([_header.pack(MAGIC, len(names)), *records, *data]))
+
+
+def _write_atomically(path: str, content: bytes) -> None:
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class CachedIndex(NamedTuple):
+    compiled: CompiledIndex
+    # headers of a conditional request that revalidates the cached index
+    validators: Dict[str, str]
+
+
+class IndexCache:
+    """Compiled indexes stored in a directory, keyed by the URL of 'index.yaml'."""
+
+    def __init__(self, cache_dir: str):
+        self._cache_dir = cache_dir
+
+    def _get_path(self, url: str, suffix: str) -> str:
+        return os.path.join(self._cache_dir, hashlib.sha256(url.encode()).hexdigest() + suffix)
+
+    def load(self, url: str) -> Optional[CachedIndex]:
+        """Returns the cached index, or None if it's not cached or the cached files are broken."""
+        try:
+            with open(self._get_path(url, META_FILE_SUFFIX), "r") as f:
+                meta = json.load(f)
+            index = CompiledIndex(self._get_path(url, INDEX_FILE_SUFFIX))
+        except (OSError, ValueError, struct.error) as e:
+            logger.debug(f"No usable cached index for '{url}': {e}")
+            return None
+        validators: Dict[str, str] = {}
+        if meta.get("etag"):
+            validators["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            validators["If-Modified-Since"] = meta["last_modified"]
+        return CachedIndex(index, validators)
+
+    def store(
+        self, url: str, entries: Dict[str, List[Dict[str, Any]]], etag: str, last_modified: str
+    ) -> Optional[CompiledIndex]:
+        """
+        Compiles and saves the index. Indexes without ETag and Last-Modified can't be revalidated, so they
+        are not saved.
+        :return: the saved index or None, if it wasn't saved
+        """
+        if not etag and not last_modified:
+            return None
+        os.makedirs(self._cache_dir, exist_ok=True)
+        index_path = self._get_path(url, INDEX_FILE_SUFFIX)
+        compile_index(entries, index_path)
+        meta = {"url": url, "etag": etag, "last_modified": last_modified}
+        _write_atomically(self._get_path(url, META_FILE_SUFFIX), json.dumps(meta).encode())
+        return CompiledIndex(index_path)
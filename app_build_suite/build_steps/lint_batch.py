@@ -0,0 +1,135 @@
+"""
+Linting many charts with a single invocation of 'ct' or 'kube-linter' and attributing the tools' output
+back to the charts. Results are only attributed when the output identifies the chart without doubt;
+charts the output is ambiguous for are linted again, one by one.
+"""
+import argparse
+import logging
+import os
+import re
+import subprocess  # nosec: only used for type hints
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# how long the first chart of a batch waits for other charts to join it
+BATCH_WAIT_SECONDS = 2.0
+
+# 'ct' prints charts as 'name => (version: "1.0.0", path: "dir")', quoted with escapes in section headers
+_ct_chart_path_regexp = re.compile(r'path: \\?"(?P<path>[^"\\]+)\\?"\)')
+_ct_header_prefix = "Linting chart "
+_ct_summary_regexp = re.compile(r"^\s*(?P<mark>[✔✖])")
+
+
+def is_batching_useful(config: argparse.Namespace, batch_size: int) -> bool:
+    """
+    Tells if charts should be linted in batches. Other charts can only join a batch when many charts are built
+    at the same time, in the monorepo mode with '--jobs' higher than 1; otherwise batching would only delay
+    the build by 'BATCH_WAIT_SECONDS'.
+    """
+    return batch_size > 1 and bool(config.monorepo_root) and config.jobs > 1
+
+
+class BatchLintResult(NamedTuple):
+    failed: bool
+    output: List[str]
+
+
+# runs the tool for the given targets and returns the completed process
+ToolRunner = Callable[[List[str]], subprocess.CompletedProcess]
+# maps output of a batch run to the targets it can be attributed to without doubt
+OutputAttributor = Callable[[str, List[str]], Dict[str, BatchLintResult]]
+
+
+def _normalize(path: str) -> str:
+    return os.path.normpath(os.path.abspath(path))
+
+
+def attribute_ct_output(stdout: str, chart_dirs: List[str]) -> Dict[str, BatchLintResult]:
+    """
+    Splits the output of 'ct lint --charts=...' into the sections printed for each chart and reads the
+    status of each chart from the summary printed at the end of the run.
+    :param stdout: output of 'ct lint'
+    :param chart_dirs: directories of the linted charts, as passed to 'ct'
+    :return: results of charts that are listed in the summary
+    """
+    by_path = {_normalize(chart_dir): chart_dir for chart_dir in chart_dirs}
+    output: Dict[str, List[str]] = {chart_dir: [] for chart_dir in chart_dirs}
+    status: Dict[str, bool] = {}
+    current: Optional[str] = None
+    for line in stdout.splitlines():
+        path_match = _ct_chart_path_regexp.search(line)
+        chart_dir = by_path.get(_normalize(path_match.group("path"))) if path_match else None
+        summary_match = _ct_summary_regexp.match(line)
+        if chart_dir is not None and summary_match is not None:
+            status[chart_dir] = summary_match.group("mark") == "✖"
+            output[chart_dir].append(line.strip())
+            current = None
+            continue
+        if line.startswith(_ct_header_prefix):
+            current = chart_dir
+        if current is not None:
+            output[current].append(line)
+        else:
+            logger.debug(line)
+    return {chart_dir: BatchLintResult(failed, output[chart_dir]) for chart_dir, failed in status.items()}
+
+
+def attribute_kube_linter_output(stdout: str, targets: List[str]) -> Dict[str, BatchLintResult]:
+    """
+    Assigns problems reported by 'kube-linter lint target1 target2...' to the targets. Each problem is
+    printed by kube-linter in a line starting with the path of the file the object was loaded from.
+    :param stdout: output of 'kube-linter lint'
+    :param targets: linted files or chart directories, as passed to 'kube-linter'
+    :return: results of targets with at least one problem reported
+    """
+    prefixes = [(_normalize(target), target) for target in targets]
+    output: Dict[str, List[str]] = {}
+    for line in stdout.splitlines():
+        file_path, separator, _ = line.partition(": ")
+        target = None
+        # lines like 'Error: found 2 lint errors' aren't reports, so the path has to exist
+        if separator and os.path.exists(file_path.strip()):
+            normalized = _normalize(file_path.strip())
+            target = next((t for p, t in prefixes if normalized == p or normalized.startswith(p + os.sep)), None)
+        if target is None:
+            logger.debug(line)
+        else:
+            output.setdefault(target, []).append(line)
+    return {target: BatchLintResult(True, lines) for target, lines in output.items()}
+
+
+def _run_single(run_tool: ToolRunner, target: str) -> BatchLintResult:
+    run_res = run_tool([target])
+    output = run_res.stdout.splitlines()
+    if run_res.returncode != 0:
+        output.extend(run_res.stderr.splitlines())
+    return BatchLintResult(run_res.returncode != 0, output)
+
+
+def lint_batch(targets: List[str], run_tool: ToolRunner, attribute: OutputAttributor) -> Dict[str, BatchLintResult]:
+    """
+    Lints all the targets with a single run of a tool. If the tool succeeds, all targets pass. If it fails,
+    targets the output couldn't be attributed to are linted again one by one; if the output blames none
+    of the targets, all of them are linted again.
+    :param targets: charts or files to lint
+    :param run_tool: runs the tool for a list of targets
+    :param attribute: maps the tool's output to the targets
+    :return: result of each target
+    """
+    if len(targets) == 1:
+        return {targets[0]: _run_single(run_tool, targets[0])}
+    run_res = run_tool(targets)
+    results = attribute(run_res.stdout, targets)
+    if run_res.returncode == 0:
+        return {t: BatchLintResult(False, results[t].output if t in results else []) for t in targets}
+    if not any(r.failed for r in results.values()):
+        results = {}
+    unattributed = [t for t in targets if t not in results]
+    if unattributed:
+        logger.info(f"Can't attribute the failure of a batch lint run to {len(unattributed)} target(s), linting each.")
+        for line in run_res.stderr.splitlines():
+            logger.debug(line)
+    for target in unattributed:
+        results[target] = _run_single(run_tool, target)
+    return results
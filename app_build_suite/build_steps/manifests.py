@@ -0,0 +1,192 @@
+"""
+In-memory index of manifests rendered from a chart. Manifests are parsed once per build and indexed by object
+identity, so many checks of the rendered Kubernetes objects can query them cheaply.
+"""
+import logging
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+import yaml
+from step_exec_lib.errors import ValidationError
+from step_exec_lib.types import Context
+
+from app_build_suite.build_steps.helm import (
+    RenderedManifests,
+    context_key_manifest_index,
+    context_key_rendered_manifests,
+)
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+SOURCE_COMMENT_PREFIX = "# Source: "
+_document_separator_regexp = re.compile(r"^---\s*$", re.MULTILINE)
+
+# kinds of workloads and the path to the pod spec in their manifests
+POD_SPEC_PATHS: Dict[str, List[str]] = {
+    "Pod": ["spec"],
+    "Deployment": ["spec", "template", "spec"],
+    "StatefulSet": ["spec", "template", "spec"],
+    "DaemonSet": ["spec", "template", "spec"],
+    "ReplicaSet": ["spec", "template", "spec"],
+    "Job": ["spec", "template", "spec"],
+    "CronJob": ["spec", "jobTemplate", "spec", "template", "spec"],
+}
+
+
+class ObjectKey(NamedTuple):
+    kind: str
+    api_version: str
+    namespace: str
+    name: str
+
+
+class ManifestObject:
+    """A single rendered Kubernetes object."""
+
+    __slots__ = ("key", "values_file", "template", "body")
+
+    def __init__(self, key: ObjectKey, values_file: Optional[str], template: str, body: Dict[str, Any]):
+        self.key = key
+        # values file the object was rendered with, None for the default values
+        self.values_file = values_file
+        # template the object was rendered from, as reported by 'helm template', like 'app/templates/svc.yaml'
+        self.template = template
+        self.body = body
+
+    @property
+    def labels(self) -> Dict[str, str]:
+        return (self.body.get("metadata") or {}).get("labels") or {}
+
+    def get_pod_spec(self) -> Optional[Dict[str, Any]]:
+        path = POD_SPEC_PATHS.get(self.key.kind)
+        if path is None:
+            return None
+        spec: Any = self.body
+        for part in path:
+            if not isinstance(spec, dict):
+                return None
+            spec = spec.get(part)
+        return spec if isinstance(spec, dict) else None
+
+    def __repr__(self) -> str:
+        return f"ManifestObject({self.key}, values_file={self.values_file!r})"
+
+
+class ContainerRef(NamedTuple):
+    owner: ManifestObject
+    container: Dict[str, Any]
+    is_init_container: bool
+
+
+class ManifestIndex:
+    """
+    Index of rendered objects, keyed by kind, apiVersion, namespace and name. The same object rendered with
+    different values files is stored once per values file. Lookups of containers and labels are computed
+    when objects are added.
+    """
+
+    __slots__ = ("_objects", "_by_kind", "_containers", "_by_label")
+
+    def __init__(self) -> None:
+        self._objects: Dict[ObjectKey, List[ManifestObject]] = defaultdict(list)
+        self._by_kind: Dict[str, List[ManifestObject]] = defaultdict(list)
+        self._containers: List[ContainerRef] = []
+        self._by_label: Dict[str, List[ManifestObject]] = defaultdict(list)
+
+    def add_object(self, obj: ManifestObject) -> None:
+        self._objects[obj.key].append(obj)
+        self._by_kind[obj.key.kind].append(obj)
+        for label in obj.labels:
+            self._by_label[label].append(obj)
+        pod_spec = obj.get_pod_spec()
+        if pod_spec is not None:
+            for field, is_init in [("initContainers", True), ("containers", False)]:
+                for container in pod_spec.get(field) or []:
+                    self._containers.append(ContainerRef(obj, container, is_init))
+
+    def add_rendered_text(self, text: str, values_file: Optional[str] = None) -> None:
+        """Parses the output of 'helm template' and adds all the objects found to the index."""
+        for document in _document_separator_regexp.split(text):
+            template = ""
+            for line in document.splitlines():
+                if line.startswith(SOURCE_COMMENT_PREFIX):
+                    template = line[len(SOURCE_COMMENT_PREFIX) :].strip()
+                    break
+            try:
+                body = yaml.load(document, Loader=SafeLoader)  # nosec, safe loader is used
+            except yaml.YAMLError as e:
+                raise ValidationError(
+                    type(self).__name__,
+                    f"Can't parse manifest rendered from '{template or values_file or 'the chart'}': {e}",
+                )
+            if not isinstance(body, dict) or "kind" not in body:
+                continue
+            metadata = body.get("metadata") or {}
+            key = ObjectKey(
+                str(body["kind"]),
+                str(body.get("apiVersion", "")),
+                str(metadata.get("namespace") or ""),
+                str(metadata.get("name", "")),
+            )
+            self.add_object(ManifestObject(key, values_file, template, body))
+
+    @classmethod
+    def from_rendered_manifests(cls, rendered: List[RenderedManifests]) -> "ManifestIndex":
+        index = cls()
+        for manifests in rendered:
+            with open(manifests.path, "r") as f:
+                index.add_rendered_text(f.read(), manifests.values_file)
+        return index
+
+    def __len__(self) -> int:
+        return sum(len(objects) for objects in self._objects.values())
+
+    def __iter__(self) -> Iterator[ManifestObject]:
+        for objects in self._objects.values():
+            yield from objects
+
+    def get(self, kind: str, name: str, namespace: str = "", api_version: Optional[str] = None) -> List[ManifestObject]:
+        """Returns the object rendered with each of the values files; any apiVersion matches if not given."""
+        if api_version is not None:
+            return list(self._objects.get(ObjectKey(kind, api_version, namespace, name), []))
+        return [o for o in self._by_kind.get(kind, []) if o.key.name == name and o.key.namespace == namespace]
+
+    def get_by_kind(self, kind: str) -> List[ManifestObject]:
+        return list(self._by_kind.get(kind, []))
+
+    def get_containers(self) -> List[ContainerRef]:
+        return list(self._containers)
+
+    def get_by_label(self, label: str, value: Optional[str] = None) -> List[ManifestObject]:
+        """Returns objects that have the label set (to the given value, if not None)."""
+        objects = self._by_label.get(label, [])
+        if value is None:
+            return list(objects)
+        return [o for o in objects if o.labels.get(label) == value]
+
+    def get_from_chart_templates(self, chart_name: str) -> List[ManifestObject]:
+        """Returns objects rendered from templates of the chart itself, not from its subcharts."""
+        prefix = f"{chart_name}/templates/"
+        return [o for o in self if o.template.startswith(prefix)]
+
+
+def get_manifest_index(context: Context) -> Optional[ManifestIndex]:
+    """
+    Returns the index of manifests rendered by HelmChartTemplateRenderer. The index is built on the first call
+    and saved in the context, so manifests are parsed only once per build.
+    :return: the index or None if the chart wasn't rendered
+    """
+    if context_key_manifest_index not in context:
+        if context_key_rendered_manifests not in context:
+            return None
+        logger.debug("Building index of rendered manifests.")
+        context[context_key_manifest_index] = ManifestIndex.from_rendered_manifests(
+            context[context_key_rendered_manifests]
+        )
+    return context[context_key_manifest_index]
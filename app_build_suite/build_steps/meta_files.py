@@ -0,0 +1,102 @@
+"""
+Variants of metadata files for static file servers: minified copies of JSON files and siblings precompressed
+with gzip or brotli, named like the file with a '.gz' or '.br' suffix, which servers like nginx
+('gzip_static', 'brotli_static') send instead of compressing the file for every request. Compressed files
+don't depend on the time of the build, so their digests change only when the contents change.
+"""
+import gzip
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List
+
+ENCODING_GZIP = "gzip"
+ENCODING_BROTLI = "br"
+ALL_ENCODINGS = [ENCODING_GZIP, ENCODING_BROTLI]
+ENCODING_SUFFIXES = {ENCODING_GZIP: ".gz", ENCODING_BROTLI: ".br"}
+MINIFIED_JSON_SUFFIX = ".min.json"
+
+
+def is_brotli_available() -> bool:
+    """Checks if the optional 'brotli' library can be imported."""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _compress_gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _compress_brotli(data: bytes) -> bytes:
+    import brotli
+
+    return brotli.compress(data, quality=11)
+
+
+_compressors: Dict[str, Callable[[bytes], bytes]] = {
+    ENCODING_GZIP: _compress_gzip,
+    ENCODING_BROTLI: _compress_brotli,
+}
+
+
+def parse_encodings(value: str) -> List[str]:
+    """
+    Parses a comma-separated list of encodings.
+    :raises ValueError: if an encoding is unknown
+    """
+    encodings = [e.strip() for e in value.split(",") if e.strip()]
+    unknown = [e for e in encodings if e not in ALL_ENCODINGS]
+    if unknown:
+        raise ValueError(f"Unknown encodings {unknown}. Valid encodings are: {ALL_ENCODINGS}.")
+    return encodings
+
+
+def get_minified_json_path(path: str) -> str:
+    return f"{path[: -len('.json')]}{MINIFIED_JSON_SUFFIX}"
+
+
+def _write_file(path: str, data: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_compressed_files(path: str, encodings: List[str]) -> Dict[str, str]:
+    """
+    Writes the file's siblings compressed with the encodings.
+    :return: sha256 digests of the compressed files, by file name
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    return {
+        f"{os.path.basename(path)}{ENCODING_SUFFIXES[e]}": _write_file(
+            f"{path}{ENCODING_SUFFIXES[e]}", _compressors[e](data)
+        )
+        for e in encodings
+    }
+
+
+def write_file_variants(path: str, encodings: List[str]) -> Dict[str, str]:
+    """
+    Writes the minified copy of a JSON file and compressed siblings of the file and of its minified copy.
+    :param path: path to the file
+    :param encodings: encodings to compress the files with
+    :return: sha256 digests of the file and all its variants, by file name
+    :raises ValueError: if a '.json' file is not valid JSON
+    """
+    with open(path, "rb") as f:
+        digests = {os.path.basename(path): hashlib.sha256(f.read()).hexdigest()}
+    paths = [path]
+    if path.endswith(".json") and not path.endswith(MINIFIED_JSON_SUFFIX):
+        with open(path, "r") as f:
+            data = json.load(f)
+        minified_path = get_minified_json_path(path)
+        minified = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+        digests[os.path.basename(minified_path)] = _write_file(minified_path, minified)
+        paths.append(minified_path)
+    for variant_path in paths:
+        digests.update(write_compressed_files(variant_path, encodings))
+    return digests
@@ -0,0 +1,187 @@
+"""
+In-process implementation of the checks executed by `ct lint`. Loaded schemas and yamllint configs are cached
+for the whole process, so linting many charts pays the cost of parsing them only once.
+"""
+import functools
+import glob
+import logging
+import os
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import yaml
+
+from app_build_suite.build_steps.helm_consts import CHART_YAML, VALUES_YAML
+
+logger = logging.getLogger(__name__)
+
+CT_CONFIG_KEY_LINT_CONF = "lint-conf"
+CT_CONFIG_KEY_CHART_SCHEMA = "chart-yaml-schema"
+CT_CONFIG_KEY_VALIDATE_SCHEMA = "validate-chart-schema"
+CT_CONFIG_KEY_VALIDATE_YAML = "validate-yaml"
+CT_LINT_CONF_FILE = "lintconf.yaml"
+CT_CHART_SCHEMA_FILE = "chart_schema.yaml"
+CI_VALUES_DIR = "ci"
+CI_VALUES_GLOB = "*-values.yaml"
+
+
+class LintProblem(NamedTuple):
+    file_path: str
+    message: str
+    is_error: bool
+
+    def __str__(self) -> str:
+        return f"{self.file_path}: {self.message}"
+
+
+def is_available() -> bool:
+    """Checks if the libraries required by the native lint engine can be imported."""
+    try:
+        import yamale  # noqa: F401
+        import yamllint  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_ct_config_search_dirs() -> List[str]:
+    """The same directories `ct` checks for its config files, in the same order."""
+    return [os.path.join(os.path.expanduser("~"), ".ct"), os.path.join("/", "etc", "ct")]
+
+
+def find_ct_config_file(file_name: str) -> Optional[str]:
+    for search_dir in get_ct_config_search_dirs():
+        candidate = os.path.join(search_dir, file_name)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def load_ct_config(ct_config_path: Optional[str]) -> Dict[str, Any]:
+    if ct_config_path is None:
+        return {}
+    with open(ct_config_path, "r") as f:
+        ct_config = yaml.safe_load(f)
+    return ct_config if isinstance(ct_config, dict) else {}
+
+
+@functools.lru_cache(maxsize=None)
+def load_chart_schema(schema_path: str) -> Any:
+    import yamale
+
+    logger.debug(f"Compiling chart schema '{schema_path}'.")
+    return yamale.make_schema(schema_path)
+
+
+@functools.lru_cache(maxsize=None)
+def load_yamllint_config(lint_conf_path: Optional[str]) -> Any:
+    from yamllint.config import YamlLintConfig
+
+    if lint_conf_path is None:
+        return YamlLintConfig("extends: default")
+    logger.debug(f"Loading yamllint config '{lint_conf_path}'.")
+    return YamlLintConfig(file=lint_conf_path)
+
+
+def get_ci_values_files(chart_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(chart_dir, CI_VALUES_DIR, CI_VALUES_GLOB)))
+
+
+def validate_chart_schema(chart_dir: str, schema_path: str) -> List[LintProblem]:
+    import yamale
+
+    chart_yaml_path = os.path.join(chart_dir, CHART_YAML)
+    schema = load_chart_schema(schema_path)
+    data = yamale.make_data(chart_yaml_path)
+    try:
+        yamale.validate(schema, data, strict=True)
+    except yamale.YamaleError as e:
+        return [LintProblem(chart_yaml_path, err, True) for result in e.results for err in result.errors]
+    return []
+
+
+def lint_yaml_file(file_path: str, lint_conf_path: Optional[str]) -> List[LintProblem]:
+    from yamllint import linter
+
+    conf = load_yamllint_config(lint_conf_path)
+    with open(file_path, "r") as f:
+        problems = linter.run(f, conf, file_path)
+        return [
+            LintProblem(file_path, f"{p.line}:{p.column} [{p.level}] {p.desc} ({p.rule})", p.level == "error")
+            for p in problems
+        ]
+
+
+class LintShardResult(NamedTuple):
+    """Result of linting and rendering the chart with a single values file (None for the default values)."""
+
+    values_file: Optional[str]
+    failed_command: Optional[str]
+    output: List[str]
+    errors: List[str]
+
+    @property
+    def succeeded(self) -> bool:
+        return self.failed_command is None
+
+    @property
+    def label(self) -> str:
+        return get_shard_label(self.values_file)
+
+
+def get_shard_label(values_file: Optional[str]) -> str:
+    """Returns the name of the lint shard of the values file, used in reports and as its key in the context."""
+    return os.path.join(CI_VALUES_DIR, os.path.basename(values_file)) if values_file else "default values"
+
+
+def format_shard_report(results: List[LintShardResult]) -> str:
+    """Merges results of all the lint shards into a single report, naming the values file of each shard."""
+    lines = ["Lint report:"]
+    for result in results:
+        status = "OK" if result.succeeded else f"FAILED ('helm {result.failed_command}')"
+        lines.append(f"  {result.label}: {status}")
+    return "\n".join(lines)
+
+
+class NativeLintSettings(NamedTuple):
+    schema_path: Optional[str]
+    lint_conf_path: Optional[str]
+    validate_schema: bool
+    validate_yaml: bool
+
+
+def resolve_settings(ct_config_path: Optional[str], ct_schema_path: Optional[str]) -> NativeLintSettings:
+    """
+    Resolves paths to the chart schema and yamllint config the same way `ct` does: explicit options first,
+    then the `ct` config file, then the default config directories.
+    """
+    ct_config = load_ct_config(ct_config_path)
+    schema_path = (
+        ct_schema_path or ct_config.get(CT_CONFIG_KEY_CHART_SCHEMA) or find_ct_config_file(CT_CHART_SCHEMA_FILE)
+    )
+    lint_conf_path = ct_config.get(CT_CONFIG_KEY_LINT_CONF) or find_ct_config_file(CT_LINT_CONF_FILE)
+    return NativeLintSettings(
+        schema_path=schema_path,
+        lint_conf_path=lint_conf_path,
+        validate_schema=bool(ct_config.get(CT_CONFIG_KEY_VALIDATE_SCHEMA, True)),
+        validate_yaml=bool(ct_config.get(CT_CONFIG_KEY_VALIDATE_YAML, True)),
+    )
+
+
+def lint_chart_files(chart_dir: str, settings: NativeLintSettings) -> List[LintProblem]:
+    """
+    Runs the schema validation of Chart.yaml and yamllint checks of Chart.yaml and all the values files.
+    :param chart_dir: path to the chart's directory
+    :param settings: resolved lint settings
+    :return: list of all the problems found
+    """
+    problems: List[LintProblem] = []
+    if settings.validate_schema and settings.schema_path is not None:
+        problems.extend(validate_chart_schema(chart_dir, settings.schema_path))
+    if settings.validate_yaml:
+        yaml_files = [os.path.join(chart_dir, CHART_YAML), os.path.join(chart_dir, VALUES_YAML)]
+        yaml_files.extend(get_ci_values_files(chart_dir))
+        for file_path in yaml_files:
+            if os.path.isfile(file_path):
+                problems.extend(lint_yaml_file(file_path, settings.lint_conf_path))
+    return problems
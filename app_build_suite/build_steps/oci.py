@@ -0,0 +1,259 @@
+"""Client for pushing Helm charts and their metadata to OCI registries."""
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode, urljoin, urlsplit
+
+import yaml
+from step_exec_lib.errors import Error
+
+from app_build_suite.build_steps.helm_consts import CHART_YAML
+from app_build_suite.utils.http import HttpConnectionPool, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPE_OCI_MANIFEST = "application/vnd.oci.image.manifest.v1+json"
+MEDIA_TYPE_HELM_CONFIG = "application/vnd.cncf.helm.config.v1+json"
+MEDIA_TYPE_HELM_CHART = "application/vnd.cncf.helm.chart.content.v1.tar+gzip"
+MEDIA_TYPE_ABS_METADATA_CONFIG = "application/vnd.giantswarm.abs.metadata.config.v1+json"
+MEDIA_TYPE_ABS_METADATA_FILE = "application/vnd.giantswarm.abs.metadata.file.v1"
+ANNOTATION_TITLE = "org.opencontainers.image.title"
+META_REPOSITORY_SUFFIX = "-meta"
+
+_bearer_param_regexp = re.compile(r'(\w+)="([^"]*)"')
+
+
+class OciError(Error):
+    pass
+
+
+class Blob(NamedTuple):
+    media_type: str
+    data: bytes
+    digest: str
+    title: Optional[str] = None
+
+    @classmethod
+    def from_bytes(cls, media_type: str, data: bytes, title: Optional[str] = None) -> "Blob":
+        return cls(media_type, data, f"sha256:{hashlib.sha256(data).hexdigest()}", title)
+
+    def descriptor(self) -> Dict[str, object]:
+        desc: Dict[str, object] = {"mediaType": self.media_type, "digest": self.digest, "size": len(self.data)}
+        if self.title is not None:
+            desc["annotations"] = {ANNOTATION_TITLE: self.title}
+        return desc
+
+
+class ChartArtifact(NamedTuple):
+    chart_path: str
+    meta_dir_path: Optional[str] = None
+
+
+class PushResult(NamedTuple):
+    reference: str
+    manifest_digest: str
+    blobs_uploaded: int
+    blobs_skipped: int
+
+
+def to_oci_tag(version: str) -> str:
+    """OCI tags don't allow '+' that is valid in semver, helm uses '_' instead."""
+    return version.replace("+", "_")
+
+
+def read_chart_metadata(chart_path: str) -> Dict[str, object]:
+    """Reads Chart.yaml from a packaged chart archive."""
+    with tarfile.open(chart_path, "r:gz") as tar:
+        for member in tar.getmembers():
+            parts = member.name.split("/")
+            if len(parts) == 2 and parts[1] == CHART_YAML:
+                extracted = tar.extractfile(member)
+                if extracted is not None:
+                    return yaml.safe_load(extracted)
+    raise OciError(f"Can't find {CHART_YAML} in chart archive '{chart_path}'.")
+
+
+class OciRegistryClient:
+    """
+    Implements the subset of the OCI distribution API required to push artifacts: blob existence checks,
+    monolithic blob uploads and manifest uploads. Supports basic auth and bearer token auth challenges.
+    All requests share a single pool of persistent connections, so the client is cheap to use from many threads.
+    """
+
+    def __init__(
+        self,
+        registry_url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        pool: Optional[HttpConnectionPool] = None,
+    ):
+        if "://" not in registry_url:
+            registry_url = f"https://{registry_url}"
+        parts = urlsplit(registry_url)
+        self._base_url = f"{parts.scheme}://{parts.netloc}"
+        self._namespace = parts.path.strip("/")
+        self._basic_auth: Optional[str] = None
+        if username:
+            self._basic_auth = base64.b64encode(f"{username}:{password or ''}".encode()).decode()
+        self._pool = pool or HttpConnectionPool()
+        self._tokens: Dict[str, str] = {}
+        self._tokens_lock = threading.Lock()
+
+    def repository_for(self, name: str) -> str:
+        return f"{self._namespace}/{name}" if self._namespace else name
+
+    def reference_for(self, repository: str, tag: str) -> str:
+        return f"{urlsplit(self._base_url).netloc}/{repository}:{tag}"
+
+    def _fetch_token(self, challenge: str) -> str:
+        params = dict(_bearer_param_regexp.findall(challenge))
+        realm = params.pop("realm", None)
+        if realm is None:
+            raise OciError(f"Can't parse authentication challenge '{challenge}'.")
+        headers = {"Authorization": f"Basic {self._basic_auth}"} if self._basic_auth else {}
+        resp = self._pool.request("GET", f"{realm}?{urlencode(params)}", headers=headers)
+        if resp.status != 200:
+            raise OciError(f"Getting registry token from '{realm}' failed with status {resp.status}.")
+        payload = json.loads(resp.body)
+        return payload.get("token") or payload.get("access_token", "")
+
+    def _request(
+        self, method: str, url: str, repository: str, body: Optional[bytes] = None, headers: Optional[Dict] = None
+    ) -> HttpResponse:
+        url = urljoin(self._base_url, url)
+        for _ in range(2):
+            req_headers = dict(headers or {})
+            with self._tokens_lock:
+                token = self._tokens.get(repository)
+            if token:
+                req_headers["Authorization"] = f"Bearer {token}"
+            elif self._basic_auth:
+                req_headers["Authorization"] = f"Basic {self._basic_auth}"
+            resp = self._pool.request(method, url, body=body, headers=req_headers)
+            challenge = resp.header("www-authenticate")
+            if resp.status != 401 or not challenge.lower().startswith("bearer ") or token:
+                return resp
+            new_token = self._fetch_token(challenge[len("bearer ") :])
+            with self._tokens_lock:
+                self._tokens[repository] = new_token
+        return resp
+
+    def blob_exists(self, repository: str, digest: str) -> bool:
+        resp = self._request("HEAD", f"/v2/{repository}/blobs/{digest}", repository)
+        if resp.status == 200:
+            return True
+        if resp.status == 404:
+            return False
+        raise OciError(f"Checking blob '{digest}' in '{repository}' failed with status {resp.status}.")
+
+    def upload_blob(self, repository: str, blob: Blob) -> bool:
+        """
+        Uploads a blob unless the registry already has it.
+        :return: True if the blob was uploaded, False if it already existed
+        """
+        if self.blob_exists(repository, blob.digest):
+            logger.debug(f"Blob '{blob.digest}' already exists in '{repository}', skipping upload.")
+            return False
+        resp = self._request("POST", f"/v2/{repository}/blobs/uploads/", repository, body=b"")
+        location = resp.header("location")
+        if resp.status != 202 or not location:
+            raise OciError(f"Starting blob upload to '{repository}' failed with status {resp.status}.")
+        separator = "&" if "?" in location else "?"
+        resp = self._request(
+            "PUT",
+            f"{location}{separator}{urlencode({'digest': blob.digest})}",
+            repository,
+            body=blob.data,
+            headers={"Content-Type": "application/octet-stream", "Content-Length": str(len(blob.data))},
+        )
+        if resp.status != 201:
+            raise OciError(f"Uploading blob '{blob.digest}' to '{repository}' failed with status {resp.status}.")
+        return True
+
+    def put_manifest(self, repository: str, tag: str, config: Blob, layers: List[Blob]) -> str:
+        manifest = {
+            "schemaVersion": 2,
+            "mediaType": MEDIA_TYPE_OCI_MANIFEST,
+            "config": config.descriptor(),
+            "layers": [layer.descriptor() for layer in layers],
+        }
+        data = json.dumps(manifest, separators=(",", ":")).encode()
+        resp = self._request(
+            "PUT",
+            f"/v2/{repository}/manifests/{tag}",
+            repository,
+            body=data,
+            headers={"Content-Type": MEDIA_TYPE_OCI_MANIFEST},
+        )
+        if resp.status != 201:
+            raise OciError(f"Uploading manifest '{repository}:{tag}' failed with status {resp.status}.")
+        return resp.header("docker-content-digest", f"sha256:{hashlib.sha256(data).hexdigest()}")
+
+    def push_artifact(
+        self, repository: str, tag: str, config: Blob, layers: List[Blob], executor: ThreadPoolExecutor
+    ) -> PushResult:
+        blobs = [config, *layers]
+        uploaded = list(executor.map(lambda b: self.upload_blob(repository, b), blobs))
+        digest = self.put_manifest(repository, tag, config, layers)
+        reference = self.reference_for(repository, tag)
+        logger.info(f"Pushed '{reference}' ({sum(uploaded)} blobs uploaded, {len(uploaded) - sum(uploaded)} skipped).")
+        return PushResult(reference, digest, sum(uploaded), len(uploaded) - sum(uploaded))
+
+
+def _build_chart_blobs(artifact: ChartArtifact) -> Tuple[str, str, Blob, List[Blob]]:
+    chart_meta = read_chart_metadata(artifact.chart_path)
+    with open(artifact.chart_path, "rb") as f:
+        chart_blob = Blob.from_bytes(MEDIA_TYPE_HELM_CHART, f.read())
+    config_blob = Blob.from_bytes(MEDIA_TYPE_HELM_CONFIG, json.dumps(chart_meta, separators=(",", ":")).encode())
+    return str(chart_meta["name"]), str(chart_meta["version"]), config_blob, [chart_blob]
+
+
+def _build_meta_blobs(meta_dir_path: str) -> List[Blob]:
+    blobs: List[Blob] = []
+    for file_name in sorted(os.listdir(meta_dir_path)):
+        file_path = os.path.join(meta_dir_path, file_name)
+        if os.path.isfile(file_path):
+            with open(file_path, "rb") as f:
+                blobs.append(Blob.from_bytes(MEDIA_TYPE_ABS_METADATA_FILE, f.read(), title=file_name))
+    return blobs
+
+
+def push_chart(client: OciRegistryClient, artifact: ChartArtifact, executor: ThreadPoolExecutor) -> List[PushResult]:
+    """
+    Pushes the chart archive as a Helm OCI artifact and, if present, files from its metadata directory as
+    a separate artifact with the same tag in the '<chart-name>-meta' repository.
+    """
+    name, version, config_blob, layers = _build_chart_blobs(artifact)
+    tag = to_oci_tag(version)
+    results = [client.push_artifact(client.repository_for(name), tag, config_blob, layers, executor)]
+    if artifact.meta_dir_path and os.path.isdir(artifact.meta_dir_path):
+        meta_layers = _build_meta_blobs(artifact.meta_dir_path)
+        meta_config = Blob.from_bytes(
+            MEDIA_TYPE_ABS_METADATA_CONFIG,
+            json.dumps({"name": name, "version": version}, separators=(",", ":")).encode(),
+        )
+        meta_repository = client.repository_for(f"{name}{META_REPOSITORY_SUFFIX}")
+        results.append(client.push_artifact(meta_repository, tag, meta_config, meta_layers, executor))
+    return results
+
+
+def push_charts(client: OciRegistryClient, artifacts: List[ChartArtifact], max_workers: int) -> List[PushResult]:
+    """
+    Pushes many charts concurrently. Charts are processed in parallel and so are blob uploads of every chart.
+    :param client: registry client to use; its connections are shared by all the workers
+    :param artifacts: list of charts to push
+    :param max_workers: max number of concurrent blob uploads
+    :return: push results of all the charts, in the order of artifacts
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as blob_executor, ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(artifacts)))
+    ) as chart_executor:
+        per_chart = chart_executor.map(lambda a: push_chart(client, a, blob_executor), artifacts)
+        return [result for results in per_chart for result in results]
@@ -0,0 +1,130 @@
+"""
+Analysis of the contents of packaged chart archives. The archive's index is read without extracting
+the files; sizes are reported for every file and summed by the top level directory of the chart. The size
+of each build is recorded in the chart's metadata, so following builds can detect regressions.
+"""
+import fnmatch
+import os
+import tarfile
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+from app_build_suite.catalog import (
+    META_DIR_SUFFIX,
+    META_FILE_NAME,
+    parse_chart_file_name,
+    parse_date_created,
+    read_meta_file,
+)
+
+# key of the package size record in the metadata 'main.yaml' file
+META_KEY_PACKAGE_SIZE = "packageSize"
+DEFAULT_UNWANTED_FILES = "*.back,*.bak,*.orig,*.swp,*~"
+
+
+class PackageFile(NamedTuple):
+    # path relative to the chart's directory
+    path: str
+    # uncompressed size in bytes
+    size: int
+
+
+class PackageSizeReport(NamedTuple):
+    chart_path: str
+    archive_size: int
+    unpacked_size: int
+    # files sorted from the largest
+    files: List[PackageFile]
+    # files matching the unwanted files patterns
+    unwanted_files: List[str]
+
+    def get_directory_sizes(self) -> Dict[str, int]:
+        """Returns total sizes of files by the top level directory of the chart; '.' for files in its root."""
+        sizes: Dict[str, int] = defaultdict(int)
+        for file in self.files:
+            sizes[file.path.split("/", 1)[0] if "/" in file.path else "."] += file.size
+        return dict(sorted(sizes.items(), key=lambda item: (-item[1], item[0])))
+
+    def to_metadata(self) -> Dict[str, int]:
+        return {"archive": self.archive_size, "unpacked": self.unpacked_size, "files": len(self.files)}
+
+
+def parse_patterns(value: str) -> List[str]:
+    return [p.strip() for p in value.split(",") if p.strip()]
+
+
+def analyze_package(chart_path: str, unwanted_patterns: List[str]) -> PackageSizeReport:
+    """
+    Reads sizes of all the files in a chart archive.
+    :param chart_path: path to the chart archive
+    :param unwanted_patterns: shell-style patterns of names of files that shouldn't be packaged
+    :return: the report
+    """
+    files: List[PackageFile] = []
+    with tarfile.open(chart_path, "r:gz") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            # the archive's paths start with the chart's name
+            path = member.name.split("/", 1)[1] if "/" in member.name else member.name
+            files.append(PackageFile(path, member.size))
+    files.sort(key=lambda f: (-f.size, f.path))
+    unwanted = sorted(
+        f.path for f in files if any(fnmatch.fnmatch(os.path.basename(f.path), p) for p in unwanted_patterns)
+    )
+    return PackageSizeReport(chart_path, os.path.getsize(chart_path), sum(f.size for f in files), files, unwanted)
+
+
+def _read_recorded_size(meta_file_path: str) -> Optional[Tuple[datetime, int]]:
+    """Returns the creation date and the archive size recorded in a metadata file, if it has the size."""
+    try:
+        meta = read_meta_file(meta_file_path)
+    except (OSError, yaml.YAMLError):
+        return None
+    record = meta.get(META_KEY_PACKAGE_SIZE)
+    size = record.get("archive") if isinstance(record, dict) else None
+    if not isinstance(size, int):
+        return None
+    created = parse_date_created(meta.get("dateCreated"))
+    return created or datetime.utcfromtimestamp(os.path.getmtime(meta_file_path)), size
+
+
+def get_previous_archive_size(catalog_dir: str, chart_file: str) -> Optional[int]:
+    """
+    Returns the archive size recorded in the metadata of the most recent build of the chart in the catalog
+    directory, which can be a different version of the chart or the same version built before. Only metadata
+    directories of the chart are read, not the whole catalog.
+    :param catalog_dir: directory with the chart archives and their metadata directories
+    :param chart_file: file name of the chart archive being built
+    :return: the size or None if no build of the chart has its size recorded
+    """
+    current = parse_chart_file_name(chart_file)
+    if current is None:
+        return None
+    records = []
+    for file_name in os.listdir(catalog_dir):
+        if not file_name.startswith(f"{current[0]}-") or not file_name.endswith(f".tgz{META_DIR_SUFFIX}"):
+            continue
+        parsed = parse_chart_file_name(file_name[: -len(META_DIR_SUFFIX)])
+        # 'app-extra-0.1.0.tgz' has the prefix of 'app' charts too
+        if parsed is None or parsed[0] != current[0]:
+            continue
+        record = _read_recorded_size(os.path.join(catalog_dir, file_name, META_FILE_NAME))
+        if record is not None:
+            records.append(record)
+    return max(records)[1] if records else None
+
+
+def format_package_report(report: PackageSizeReport, top: int = 10) -> str:
+    lines = [
+        f"Package '{os.path.basename(report.chart_path)}': {report.archive_size} bytes compressed, "
+        f"{report.unpacked_size} bytes in {len(report.files)} file(s).",
+        "Size by directory:",
+    ]
+    lines.extend(f"  {path}: {size}" for path, size in report.get_directory_sizes().items())
+    lines.append("Largest files:")
+    lines.extend(f"  {file.path}: {file.size}" for file in report.files[:top])
+    return "\n".join(lines)
@@ -0,0 +1,118 @@
+"""Pipeline base class that allows wrapping execution of every single BuildStep."""
+import argparse
+import contextvars
+import functools
+import logging
+from typing import Callable, List, Optional, Protocol, runtime_checkable
+
+from step_exec_lib.errors import Error
+from step_exec_lib.steps import BuildStep, BuildStepsFilteringPipeline
+from step_exec_lib.types import STEP_ALL, Context
+
+logger = logging.getLogger(__name__)
+
+STAGE_PRE_RUN = "pre-run"
+STAGE_BUILD = "build"
+STAGE_CLEANUP = "cleanup"
+
+# A StepWrapper is called with the step, the name of the stage being executed and a function that
+# executes the stage. The wrapper is responsible for calling the function (or deciding not to).
+StepWrapper = Callable[[BuildStep, str, Callable[[], None]], None]
+
+# context of the build stage currently executed by a StepWrappingPipeline, so StepWrappers can access it
+current_context: contextvars.ContextVar[Optional[Context]] = contextvars.ContextVar("current_context", default=None)
+
+
+@runtime_checkable
+class PlannableStep(Protocol):
+    """This class is only used for type hinting of BuildSteps that can explain if they will do any work."""
+
+    def get_skip_reason(self, config: argparse.Namespace) -> Optional[str]:
+        ...
+
+
+@runtime_checkable
+class ResumableStep(Protocol):
+    """
+    This class is only used for type hinting of BuildSteps whose build stage has no side effects other than
+    adding values to the context, so it doesn't have to run again if its inputs didn't change.
+    """
+
+    def get_checkpoint_inputs(self, config: argparse.Namespace) -> List[str]:
+        """Returns paths of files and directories the build stage of the step depends on."""
+        ...
+
+    def get_checkpoint_options(self) -> List[str]:
+        """Returns names of config options the build stage of the step depends on."""
+        ...
+
+
+class StepWrappingPipeline(BuildStepsFilteringPipeline):
+    """
+    BuildStepsFilteringPipeline that executes every stage of every BuildStep through a chain
+    of registered StepWrappers. Wrappers are called in the order of registration, the first one
+    registered being the outermost one.
+    """
+
+    def __init__(self, pipeline: List[BuildStep], config_group_desc: str):
+        super().__init__(pipeline, config_group_desc)
+        self._step_wrappers: List[StepWrapper] = []
+
+    @property
+    def pipeline(self) -> List[BuildStep]:
+        return self._pipeline
+
+    def get_steps(self, config: argparse.Namespace) -> List[BuildStep]:
+        """
+        Returns steps in the order in which they are executed for the given config. Override to make
+        the order depend on config options.
+        """
+        return self._pipeline
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        token = current_context.set(context)
+        try:
+            super().run(config, context)
+        finally:
+            current_context.reset(token)
+
+    def add_step_wrapper(self, wrapper: StepWrapper) -> None:
+        self._step_wrappers.append(wrapper)
+
+    def clear_step_wrappers(self) -> None:
+        """Removes all the registered StepWrappers, so the pipeline can be reused for another build."""
+        self._step_wrappers = []
+
+    @staticmethod
+    def is_step_requested(config: argparse.Namespace, step: BuildStep) -> bool:
+        """Checks if the step is selected to run by the '--steps' and '--skip-steps' config options."""
+        execute_all = STEP_ALL in config.steps
+        is_requested_step = any(s in step.steps_provided for s in config.steps)
+        is_requested_skip = any(s in step.steps_provided for s in config.skip_steps)
+        return (execute_all or is_requested_step) and not is_requested_skip
+
+    def _wrap(self, step: BuildStep, stage: str, step_function: Callable[[BuildStep], None]) -> Callable[[], None]:
+        call: Callable[[], None] = functools.partial(step_function, step)
+        for wrapper in reversed(self._step_wrappers):
+            call = functools.partial(wrapper, step, stage, call)
+        return call
+
+    def _iterate_steps(
+        self,
+        config: argparse.Namespace,
+        stage: str,
+        step_function: Callable[[BuildStep], None],
+    ) -> bool:
+        all_steps_skipped = True
+        for step in self.get_steps(config):
+            if self.is_step_requested(config, step):
+                logger.info(f"Running {stage} step for {step.name}")
+                all_steps_skipped = False
+                try:
+                    self._wrap(step, stage, step_function)()
+                except Error as e:
+                    logger.error(f"Error when running {stage} step for {step.name}: {e.msg}")
+                    raise
+            else:
+                logger.info(f"Skipping {stage} step for {step.name} as it was not configured to run.")
+        return all_steps_skipped
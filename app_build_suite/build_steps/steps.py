@@ -4,10 +4,12 @@ STEP_BUILD = StepType("build")
 STEP_METADATA = StepType("metadata")
 STEP_VALIDATE = StepType("validate")
 STEP_STATIC_CHECK = StepType("static_check")
+STEP_PUBLISH = StepType("publish")
 ALL_STEPS = {
     STEP_ALL,
     STEP_BUILD,
     STEP_METADATA,
     STEP_VALIDATE,
     STEP_STATIC_CHECK,
+    STEP_PUBLISH,
 }
@@ -0,0 +1,103 @@
+"""
+Validation of subcharts vendored in umbrella charts. Every unpacked subchart found in the 'charts/' directories
+of a chart (recursively) is validated in a worker pool. Results are cached by the contents of the subchart,
+so a subchart vendored by many umbrella charts built by one process is validated only once.
+"""
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple
+
+from app_build_suite.build_steps.helm_consts import CHART_YAML, SUBCHARTS_DIR
+from app_build_suite.utils.hashing import get_directory_digest
+
+logger = logging.getLogger(__name__)
+
+# validates a subchart and returns a list of problems found, empty if the subchart is valid
+SubchartValidator = Callable[[str], List[str]]
+
+
+class SubchartResult(NamedTuple):
+    chart_dir: str
+    errors: List[str]
+    # True, if the result was taken from the cache
+    cached: bool = False
+
+    @property
+    def succeeded(self) -> bool:
+        return not self.errors
+
+
+def find_subcharts(chart_dir: str) -> List[str]:
+    """Finds unpacked subcharts in the chart's 'charts/' directory and, recursively, in their 'charts/' directories."""
+    subcharts: List[str] = []
+    subcharts_dir = os.path.join(chart_dir, SUBCHARTS_DIR)
+    if not os.path.isdir(subcharts_dir):
+        return subcharts
+    for name in sorted(os.listdir(subcharts_dir)):
+        subchart_dir = os.path.join(subcharts_dir, name)
+        if os.path.isfile(os.path.join(subchart_dir, CHART_YAML)):
+            subcharts.append(subchart_dir)
+            subcharts.extend(find_subcharts(subchart_dir))
+    return subcharts
+
+
+class SubchartValidationCache:
+    """
+    Results of subchart validation keyed by the subchart's contents and a key of the validation options.
+    Only the first caller validates a subchart, concurrent callers wait for its result.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._results: Dict[str, "Future[List[str]]"] = {}
+
+    def get_or_validate(self, key: str, validate: Callable[[], List[str]]) -> SubchartResult:
+        """
+        :return: the result of the validation, with 'chart_dir' left empty
+        """
+        with self._lock:
+            future = self._results.get(key)
+            is_owner = future is None
+            if future is None:
+                future = self._results[key] = Future()
+        if not is_owner:
+            return SubchartResult("", future.result(), True)
+        try:
+            future.set_result(validate())
+        except BaseException as e:
+            # unexpected errors are not cached, so the next build tries again
+            with self._lock:
+                del self._results[key]
+            future.set_exception(e)
+        return SubchartResult("", future.result())
+
+
+def validate_subcharts(
+    subchart_dirs: List[str],
+    validate: SubchartValidator,
+    cache: SubchartValidationCache,
+    options_key: str,
+    max_workers: int,
+) -> List[SubchartResult]:
+    """
+    Validates the subcharts in parallel.
+    :param subchart_dirs: directories of the subcharts
+    :param validate: validates a single subchart
+    :param cache: cache of results shared by all the validations
+    :param options_key: identifies options the subcharts are validated with; it's a part of the cache key
+    :param max_workers: max number of subcharts validated concurrently
+    :return: results of the subcharts, in the order of 'subchart_dirs'
+    """
+
+    def validate_one(subchart_dir: str) -> SubchartResult:
+        key = f"{options_key}:{get_directory_digest(subchart_dir)}"
+        result = cache.get_or_validate(key, lambda: validate(subchart_dir))
+        return result._replace(chart_dir=subchart_dir)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="subcharts") as executor:
+        # every validation runs in a copy of the current context, so logs and limits of the calling step apply
+        futures = [executor.submit(contextvars.copy_context().run, validate_one, d) for d in subchart_dirs]
+        return [future.result() for future in futures]
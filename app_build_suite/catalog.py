@@ -0,0 +1,119 @@
+"""
+Reading of catalog directories: chart archives named '<name>-<version>.tgz' next to their '-meta' directories
+with metadata saved by HelmChartMetadataFinalizer in 'main.yaml'. Shared by catalog pruning and by build steps
+that compare a build with previous builds of the chart.
+"""
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import semver
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+CATALOG_INDEX_YAML = "index.yaml"
+META_DIR_SUFFIX = "-meta"
+META_FILE_NAME = "main.yaml"
+DEFAULT_READ_WORKERS = 8
+
+# chart archives are named '<name>-<version>.tgz' and versions start with a digit, optionally prefixed with 'v'
+_chart_file_regexp = re.compile(r"^(?P<name>.+?)-(?P<version>v?\d+\.\d+\.\d+[^/]*)\.tgz$")
+_iso_fraction_regexp = re.compile(r"(\.\d{6})\d+")
+
+
+class CatalogEntry(NamedTuple):
+    name: str
+    version: str
+    chart_file: str
+    created: datetime
+
+    @property
+    def is_tagged_release(self) -> bool:
+        """Versions built from git tags are plain 'x.y.z' versions, other builds have a pre-release part."""
+        try:
+            version = semver.VersionInfo.parse(self.version[1:] if self.version.startswith("v") else self.version)
+        except ValueError:
+            return False
+        return not version.prerelease and not version.build
+
+
+def parse_chart_file_name(chart_file: str) -> Optional[Tuple[str, str]]:
+    """Returns the name and version of the chart from its archive's file name, None if it's not a chart archive."""
+    match = _chart_file_regexp.match(chart_file)
+    return (match.group("name"), match.group("version")) if match is not None else None
+
+
+def read_meta_file(meta_file_path: str) -> Dict[str, Any]:
+    """Reads a metadata 'main.yaml' file; raises OSError or yaml.YAMLError if it can't be read."""
+    with open(meta_file_path, "r") as f:
+        meta = yaml.load(f, Loader=SafeLoader) or {}  # nosec, safe loader is used
+    return meta if isinstance(meta, dict) else {}
+
+
+def parse_date_created(value: object) -> Optional[datetime]:
+    """
+    Parses 'dateCreated' of chart metadata. abs writes it in UTC without a time zone, but other tools write it
+    with one, like helm's '2021-03-04T10:20:30.123456789Z', and YAML loaders can return it as a datetime.
+    :return: the date as a naive datetime in UTC, so dates in all the formats can be compared, or None
+    """
+    if isinstance(value, datetime):
+        created = value
+    else:
+        text = str(value).strip()
+        if text.endswith("Z"):
+            text = f"{text[:-1]}+00:00"
+        try:
+            # 'fromisoformat' accepts at most microseconds
+            created = datetime.fromisoformat(_iso_fraction_regexp.sub(r"\1", text, count=1))
+        except ValueError:
+            return None
+    if created.tzinfo is not None:
+        created = created.astimezone(timezone.utc).replace(tzinfo=None)
+    return created
+
+
+def read_catalog_entry(catalog_dir: str, chart_file: str) -> Optional[CatalogEntry]:
+    """
+    Reads the entry of a chart archive. The creation date is taken from 'dateCreated' in the archive's
+    metadata; if there's no metadata, the modification time of the archive (or of the metadata directory,
+    if the archive is gone) is used.
+    :return: the entry, or None if the file name doesn't look like a chart archive
+    """
+    parsed = parse_chart_file_name(chart_file)
+    if parsed is None:
+        logger.debug(f"'{chart_file}' is not named like a chart archive, ignoring it.")
+        return None
+    chart_path = os.path.join(catalog_dir, chart_file)
+    meta_file_path = os.path.join(f"{chart_path}{META_DIR_SUFFIX}", META_FILE_NAME)
+    created = None
+    if os.path.isfile(meta_file_path):
+        try:
+            created = parse_date_created(read_meta_file(meta_file_path).get("dateCreated"))
+        except (OSError, yaml.YAMLError) as e:
+            logger.warning(f"Can't read metadata file '{meta_file_path}': {e}")
+    if created is None:
+        path = chart_path if os.path.exists(chart_path) else f"{chart_path}{META_DIR_SUFFIX}"
+        created = datetime.utcfromtimestamp(os.path.getmtime(path))
+    return CatalogEntry(parsed[0], parsed[1], chart_file, created)
+
+
+def read_catalog(catalog_dir: str, max_workers: int = DEFAULT_READ_WORKERS) -> List[CatalogEntry]:
+    """Reads entries of all the chart archives and metadata directories in the catalog, in parallel."""
+    chart_files = set()
+    for file_name in os.listdir(catalog_dir):
+        if file_name.endswith(".tgz"):
+            chart_files.add(file_name)
+        elif file_name.endswith(f".tgz{META_DIR_SUFFIX}"):
+            chart_files.add(file_name[: -len(META_DIR_SUFFIX)])
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="catalog") as executor:
+        entries = executor.map(lambda chart_file: read_catalog_entry(catalog_dir, chart_file), sorted(chart_files))
+        return [entry for entry in entries if entry is not None]
@@ -0,0 +1,163 @@
+"""
+Checkpoints of build steps, used to resume failed builds. After the build stage of a ResumableStep succeeds,
+the values it added to the context are saved to a state file together with a fingerprint of its inputs.
+When resuming, the build stage of such a step is skipped if its inputs have the same fingerprint, and
+the saved values are put in the context instead.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from step_exec_lib.steps import BuildStep
+
+from app_build_suite.build_steps.pipeline import STAGE_BUILD, ResumableStep, StepWrapper, current_context
+from app_build_suite.utils.hashing import hash_directory, hash_file
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE_VERSION = 1
+
+
+def get_default_checkpoint_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "app_build_suite", "checkpoints")
+
+
+def get_checkpoint_dir(config: argparse.Namespace) -> str:
+    """
+    Returns the directory where checkpoints are saved: '--checkpoint-dir' if it's set or, with '--resume',
+    the default one. Empty if checkpoints are not used.
+    """
+    if config.checkpoint_dir:
+        return config.checkpoint_dir
+    return get_default_checkpoint_dir() if config.resume else ""
+
+
+def get_state_file_path(checkpoint_dir: str, chart_dir: str) -> str:
+    """Returns the path of the state file of the chart; every chart directory has its own file."""
+    chart_key = hashlib.sha256(os.path.abspath(chart_dir).encode()).hexdigest()[:16]
+    return os.path.join(checkpoint_dir, f"{chart_key}.json")
+
+
+def get_config_fingerprint(config: argparse.Namespace, option_names: List[str]) -> str:
+    """Hashes values of the named config options only; missing options are hashed as None."""
+    options = {name: getattr(config, name, None) for name in option_names}
+    return hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_inputs_fingerprint(paths: List[str]) -> str:
+    """Hashes names and contents of all the files in the paths; missing paths are hashed as missing."""
+    digest = hashlib.sha256()
+    for path in sorted(os.path.abspath(p) for p in paths):
+        digest.update(f"\0path:{path}".encode())
+        if os.path.isfile(path):
+            hash_file(digest, path)
+        else:
+            hash_directory(digest, path)
+    return digest.hexdigest()
+
+
+class Checkpoint(NamedTuple):
+    fingerprint: str
+    contributions: Dict[str, Any]
+
+
+class CheckpointState:
+    """Checkpoints of steps of a single chart, saved to a JSON file after every change."""
+
+    def __init__(self, file_path: str, checkpoints: Optional[Dict[str, Checkpoint]] = None):
+        self._file_path = file_path
+        self._checkpoints: Dict[str, Checkpoint] = checkpoints or {}
+
+    @classmethod
+    def load(cls, file_path: str) -> "CheckpointState":
+        """Loads the state; a missing or broken file results in an empty state."""
+        try:
+            with open(file_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") != STATE_FILE_VERSION:
+                raise ValueError(f"unsupported version {data.get('version')}")
+            checkpoints = {
+                name: Checkpoint(entry["fingerprint"], entry["contributions"]) for name, entry in data["steps"].items()
+            }
+        except FileNotFoundError:
+            return cls(file_path)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Can't load checkpoints from '{file_path}', starting from scratch: {e}")
+            return cls(file_path)
+        return cls(file_path, checkpoints)
+
+    def get(self, step_name: str) -> Optional[Checkpoint]:
+        return self._checkpoints.get(step_name)
+
+    def record(self, step_name: str, checkpoint: Checkpoint) -> None:
+        self._checkpoints[step_name] = checkpoint
+        data = {
+            "version": STATE_FILE_VERSION,
+            "steps": {name: c._asdict() for name, c in self._checkpoints.items()},
+        }
+        os.makedirs(os.path.dirname(self._file_path) or ".", exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self._file_path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self._file_path)
+
+
+def _serialize(value: Any) -> Optional[str]:
+    try:
+        return json.dumps(value, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_contributions(before: Dict[str, Optional[str]], context: Dict[str, Any]) -> Dict[str, Any]:
+    contributions: Dict[str, Any] = {}
+    for key, value in context.items():
+        serialized = _serialize(value)
+        if key in before and before[key] == serialized:
+            continue
+        if serialized is None:
+            # only caches, like the manifest index, are expected here; they are built again when needed
+            logger.debug(f"Context value '{key}' can't be saved in a checkpoint, skipping it.")
+            continue
+        contributions[key] = value
+    return contributions
+
+
+def step_checkpointer(config: argparse.Namespace, state_file_path: str, resume: bool) -> StepWrapper:
+    """
+    Returns a StepWrapper that saves a checkpoint after the build stage of every ResumableStep succeeds.
+    :param config: the config object of the chart's build
+    :param state_file_path: path of the chart's state file
+    :param resume: if True, build stages of steps with unchanged inputs are skipped and the checkpoints saved
+    by the previous runs are kept; otherwise, checkpoints of previous runs are ignored and replaced
+    :return: the wrapper
+    """
+    state = CheckpointState.load(state_file_path) if resume else CheckpointState(state_file_path)
+
+    def wrapper(step: BuildStep, stage: str, call: Callable[[], None]) -> None:
+        context = current_context.get()
+        step_name = step.name
+        if stage != STAGE_BUILD or context is None or not isinstance(step, ResumableStep):
+            call()
+            return
+        config_fingerprint = get_config_fingerprint(config, step.get_checkpoint_options())
+        inputs_fingerprint = get_inputs_fingerprint(step.get_checkpoint_inputs(config))
+        fingerprint = hashlib.sha256(f"{step_name}:{config_fingerprint}:{inputs_fingerprint}".encode()).hexdigest()
+        checkpoint = state.get(step_name)
+        if resume and checkpoint is not None and checkpoint.fingerprint == fingerprint:
+            logger.info(f"Inputs of step {step_name} didn't change since it succeeded, resuming after it.")
+            context.update(checkpoint.contributions)
+            return
+        before = {key: _serialize(value) for key, value in context.items()}
+        call()
+        try:
+            state.record(step_name, Checkpoint(fingerprint, _get_contributions(before, context)))
+        except OSError as e:
+            logger.warning(f"Can't save checkpoint of step {step_name}: {e}")
+
+    return wrapper
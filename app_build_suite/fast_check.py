@@ -0,0 +1,148 @@
+"""
+Fast checks of charts with staged changes, meant to be run as a git pre-commit hook. Only the checks that
+run in-process and don't need any external tool are executed, and only for charts containing staged files.
+"""
+import argparse
+import copy
+import logging
+import os
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from step_exec_lib.errors import Error
+from step_exec_lib.steps import BuildStep
+
+from app_build_suite.build_steps.helm import GiantSwarmHelmValidator, HelmBuilderValidator, HelmChartMetadataPreparer
+from app_build_suite.build_steps.helm_consts import CHART_YAML
+from app_build_suite.utils.processes import run_and_log
+
+logger = logging.getLogger(__name__)
+
+
+class FastCheckResult(NamedTuple):
+    chart_dir: str
+    errors: List[str]
+
+    @property
+    def succeeded(self) -> bool:
+        return not self.errors
+
+
+class FastCheckReport(NamedTuple):
+    results: List[FastCheckResult]
+    # charts that were not checked, because the latency budget was used up
+    skipped: List[str]
+
+
+def get_fast_check_steps() -> List[BuildStep]:
+    """Returns steps which 'pre_run' stage only checks chart files in-process."""
+    return [HelmBuilderValidator(), GiantSwarmHelmValidator(), HelmChartMetadataPreparer()]
+
+
+def get_staged_files(work_dir: str) -> List[str]:
+    """Returns absolute paths of files added, copied, modified or renamed in the git index."""
+    run_res = run_and_log(["git", "-C", work_dir, "rev-parse", "--show-toplevel"], capture_output=True)  # nosec
+    if run_res.returncode != 0:
+        raise Error(f"'{work_dir}' is not in a git repository: {run_res.stderr.strip()}")
+    top_dir = run_res.stdout.strip()
+    run_res = run_and_log(
+        ["git", "-C", top_dir, "diff", "--cached", "--name-only", "--diff-filter=ACMR", "-z"], capture_output=True
+    )  # nosec
+    if run_res.returncode != 0:
+        raise Error(f"Can't list staged files: {run_res.stderr.strip()}")
+    return [os.path.join(top_dir, name) for name in run_res.stdout.split("\0") if name]
+
+
+def find_charts_of_files(files: List[str], root_dir: str) -> List[str]:
+    """
+    Finds charts the files belong to: the closest parent directory of each file that contains Chart.yaml.
+    Only charts inside 'root_dir' are returned.
+    """
+    root_dir = os.path.abspath(root_dir)
+    chart_of_dir: Dict[str, Optional[str]] = {}
+
+    def find(dir_path: str) -> Optional[str]:
+        if dir_path not in chart_of_dir:
+            if os.path.isfile(os.path.join(dir_path, CHART_YAML)):
+                chart_of_dir[dir_path] = dir_path
+            elif dir_path == root_dir or os.path.dirname(dir_path) == dir_path:
+                chart_of_dir[dir_path] = None
+            else:
+                chart_of_dir[dir_path] = find(os.path.dirname(dir_path))
+        return chart_of_dir[dir_path]
+
+    charts = set()
+    for file_path in files:
+        dir_path = os.path.dirname(os.path.abspath(file_path))
+        if dir_path != root_dir and not dir_path.startswith(root_dir + os.sep):
+            continue
+        chart_dir = find(dir_path)
+        if chart_dir is not None:
+            charts.add(chart_dir)
+    return sorted(charts)
+
+
+def check_chart(config: argparse.Namespace, steps: List[BuildStep], chart_dir: str) -> FastCheckResult:
+    """Runs the 'pre_run' stage of the steps for the chart, stopping at the first failed step."""
+    chart_config = copy.copy(config)
+    chart_config.chart_dir = chart_dir
+    for step in steps:
+        try:
+            step.pre_run(chart_config)
+        except Error as e:
+            return FastCheckResult(chart_dir, [f"{step.name}: {e.msg}"])
+        except Exception as e:
+            return FastCheckResult(chart_dir, [f"{step.name}: unexpected error: {e}"])
+    return FastCheckResult(chart_dir, [])
+
+
+def run_fast_checks(
+    config: argparse.Namespace,
+    chart_dirs: List[str],
+    budget: float,
+    steps_factory: Callable[[], List[BuildStep]] = get_fast_check_steps,
+) -> FastCheckReport:
+    """
+    Checks the charts one by one until all of them are checked or the latency budget is used up.
+    :param config: the config object
+    :param chart_dirs: charts to check
+    :param budget: time in seconds after which no more charts are checked
+    :param steps_factory: creates the steps to run; the same steps are used for all the charts
+    :return: results of checked charts and the list of charts that were skipped
+    """
+    deadline = time.monotonic() + budget
+    steps = steps_factory()
+    results: List[FastCheckResult] = []
+    for position, chart_dir in enumerate(chart_dirs):
+        if time.monotonic() >= deadline:
+            return FastCheckReport(results, chart_dirs[position:])
+        results.append(check_chart(config, steps, chart_dir))
+    return FastCheckReport(results, [])
+
+
+def format_fast_check_report(report: FastCheckReport) -> str:
+    lines = [f"Fast check of {len(report.results)} chart(s):"]
+    for result in report.results:
+        lines.append(f"  {result.chart_dir}: {'OK' if result.succeeded else 'FAILED'}")
+        lines.extend(f"    {error}" for error in result.errors)
+    for chart_dir in report.skipped:
+        lines.append(f"  {chart_dir}: SKIPPED (latency budget used up)")
+    return "\n".join(lines)
+
+
+def get_fast_check_failure(report: FastCheckReport, budget: float, allow_partial: bool) -> Optional[str]:
+    """
+    Tells why the fast check has to fail, or returns None if it passed.
+    :param report: the report of the fast check
+    :param budget: the latency budget the check was run with
+    :param allow_partial: if charts skipped because of the latency budget are accepted
+    :return: reason of the failure or None
+    """
+    if not all(r.succeeded for r in report.results):
+        return "Exit 1 due to failed fast checks."
+    if report.skipped and not allow_partial:
+        return (
+            f"Exit 1, because {len(report.skipped)} chart(s) were not checked within {budget}s. Increase "
+            "'--fast-budget' or use '--fast-allow-partial' to accept partial checks."
+        )
+    return None
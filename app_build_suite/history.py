@@ -0,0 +1,139 @@
+"""Local history of build steps execution times."""
+import functools
+import json
+import logging
+import os
+import statistics
+import subprocess  # nosec
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from step_exec_lib.steps import BuildStep
+
+from app_build_suite.build_steps.pipeline import StepWrapper
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FORMAT_VERSION = 2
+MAX_SAMPLES_PER_STAGE = 10
+
+# chart key -> step name -> stage -> list of durations in seconds
+HistoryData = Dict[str, Dict[str, Dict[str, List[float]]]]
+
+
+def get_default_history_file_path() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "app_build_suite", "history.json")
+
+
+@functools.lru_cache(maxsize=None)
+def get_git_top_level_dir(path: str) -> str:
+    """Returns the top-level directory of the git repository containing the path or "" if there's none."""
+    try:
+        run_res = subprocess.run(
+            ["git", "-C", path, "rev-parse", "--show-toplevel"], capture_output=True, text=True
+        )  # nosec
+    except OSError:
+        return ""
+    return os.path.realpath(run_res.stdout.strip()) if run_res.returncode == 0 else ""
+
+
+class BuildHistory:
+    """
+    Stores durations of build steps executed for charts in a local JSON file. Only a limited number of
+    the most recent samples is kept for every chart, step and stage. Durations are recorded only
+    for stages that completed successfully.
+    """
+
+    def __init__(self, file_path: str):
+        """
+        :param file_path: path to the history file; empty to keep the history only in memory
+        """
+        self._file_path = file_path
+        self._lock = threading.Lock()
+        self._data: HistoryData = self._load()
+
+    @property
+    def file_path(self) -> str:
+        return self._file_path
+
+    @staticmethod
+    def chart_key(chart_dir: str) -> str:
+        """
+        Returns the key of the chart in the history: its path relative to the top-level directory of its git
+        repository, the same for single chart and monorepo builds and for any checkout of the repository.
+        Charts outside of git repositories are keyed by their absolute path.
+        """
+        chart_dir = os.path.realpath(chart_dir)
+        top_dir = get_git_top_level_dir(chart_dir)
+        return os.path.relpath(chart_dir, top_dir) if top_dir else chart_dir
+
+    def _load(self) -> HistoryData:
+        if not self._file_path or not os.path.isfile(self._file_path):
+            return {}
+        try:
+            with open(self._file_path, "r") as f:
+                raw = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Can't load build history from '{self._file_path}', ignoring it. Error: {e}.")
+            return {}
+        if raw.get("version") != HISTORY_FORMAT_VERSION:
+            logger.info(f"Build history in '{self._file_path}' has unknown format version, ignoring it.")
+            return {}
+        return raw.get("charts", {})
+
+    def save(self) -> None:
+        if not self._file_path:
+            return
+        with self._lock:
+            payload = {"version": HISTORY_FORMAT_VERSION, "charts": self._data}
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self._file_path)), exist_ok=True)
+                tmp_path = f"{self._file_path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(payload, f)
+                os.replace(tmp_path, self._file_path)
+            except OSError as e:
+                logger.warning(f"Can't save build history to '{self._file_path}'. Error: {e}.")
+
+    def record(self, chart_dir: str, step_name: str, stage: str, duration: float) -> None:
+        with self._lock:
+            steps = self._data.setdefault(self.chart_key(chart_dir), {})
+            samples = steps.setdefault(step_name, {}).setdefault(stage, [])
+            samples.append(round(duration, 4))
+            del samples[:-MAX_SAMPLES_PER_STAGE]
+
+    def has_chart(self, chart_dir: str) -> bool:
+        return self.chart_key(chart_dir) in self._data
+
+    def get_expected_step_duration(self, chart_dir: str, step_name: str) -> Optional[float]:
+        """
+        Returns the expected duration of all the stages of a step, based on a median of recorded samples.
+        :param chart_dir: path to the chart's directory
+        :param step_name: name of the BuildStep
+        :return: expected duration in seconds or None if there's no history for the step
+        """
+        stages = self._data.get(self.chart_key(chart_dir), {}).get(step_name)
+        if not stages:
+            return None
+        return sum(statistics.median(samples) for samples in stages.values() if samples)
+
+    def get_expected_chart_duration(self, chart_dir: str) -> Optional[float]:
+        steps = self._data.get(self.chart_key(chart_dir))
+        if not steps:
+            return None
+        durations = [self.get_expected_step_duration(chart_dir, step_name) for step_name in steps]
+        return sum(d for d in durations if d is not None)
+
+    def step_timer(self, chart_dir: str, clock: Callable[[], float] = time.perf_counter) -> StepWrapper:
+        """Returns a StepWrapper that records durations of executed steps for the chart."""
+        # find the chart's key now, not while running limited build steps
+        self.chart_key(chart_dir)
+
+        def wrapper(step: BuildStep, stage: str, call: Callable[[], None]) -> None:
+            start = clock()
+            call()
+            self.record(chart_dir, step.name, stage, clock() - start)
+
+        return wrapper
@@ -0,0 +1,235 @@
+"""
+Builds all the charts found in a directory tree. Charts are built in the order required by their local
+('file://') dependencies, with independent charts built in parallel.
+"""
+import argparse
+import copy
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from step_exec_lib.errors import ValidationError
+from step_exec_lib.steps import BuildStep
+
+from app_build_suite.build_steps.helm import (
+    SUBCHARTS_DIR,
+    context_key_chart_full_path,
+    context_key_prebuilt_subcharts,
+    get_chart_dependencies,
+)
+from app_build_suite.build_steps.helm_consts import CHART_YAML
+from app_build_suite.runner import BuildRunner
+
+logger = logging.getLogger(__name__)
+
+FILE_REPOSITORY_PREFIX = "file://"
+
+# Creates the pipeline used to build a single chart, configured with the given config.
+PipelineFactory = Callable[[argparse.Namespace], List[BuildStep]]
+
+
+class ChartNode(NamedTuple):
+    chart_dir: str
+    name: str
+    # maps names of local dependencies to directories of charts found in the same tree
+    dependencies: Dict[str, str]
+
+
+class ChartBuildResult(NamedTuple):
+    chart_dir: str
+    succeeded: bool
+    chart_path: Optional[str] = None
+    reason: str = ""
+
+
+def find_chart_dirs(root_dir: str) -> List[str]:
+    """
+    Finds all the chart directories in a tree. Hidden directories and 'charts/' directories of charts
+    (which contain subcharts vendored into their parent chart) are not searched.
+    """
+    chart_dirs: List[str] = []
+    for dir_path, dir_names, file_names in os.walk(os.path.abspath(root_dir)):
+        is_chart = CHART_YAML in file_names
+        if is_chart:
+            chart_dirs.append(dir_path)
+        dir_names[:] = sorted(d for d in dir_names if not d.startswith(".") and not (is_chart and d == SUBCHARTS_DIR))
+    return sorted(chart_dirs)
+
+
+def build_dependency_graph(root_dir: str) -> Dict[str, ChartNode]:
+    """
+    Builds the graph of dependencies between charts found in a directory tree.
+    :param root_dir: root of the tree
+    :return: a map of chart directories to chart nodes; only 'file://' dependencies pointing to
+    other charts in the tree are included
+    """
+    chart_dirs = find_chart_dirs(root_dir)
+    graph: Dict[str, ChartNode] = {}
+    for chart_dir in chart_dirs:
+        local_dependencies: Dict[str, str] = {}
+        for dependency in get_chart_dependencies(chart_dir):
+            repository = str(dependency.get("repository", ""))
+            if not repository.startswith(FILE_REPOSITORY_PREFIX):
+                continue
+            dependency_dir = os.path.normpath(os.path.join(chart_dir, repository[len(FILE_REPOSITORY_PREFIX) :]))
+            if dependency_dir in chart_dirs:
+                local_dependencies[dependency["name"]] = dependency_dir
+            else:
+                logger.debug(f"Dependency '{repository}' of chart '{chart_dir}' is not a chart in the tree.")
+        graph[chart_dir] = ChartNode(chart_dir, os.path.basename(chart_dir), local_dependencies)
+    return graph
+
+
+def _get_dependents(graph: Dict[str, ChartNode]) -> Dict[str, List[str]]:
+    dependents: Dict[str, List[str]] = defaultdict(list)
+    for node in graph.values():
+        for dependency_dir in node.dependencies.values():
+            dependents[dependency_dir].append(node.chart_dir)
+    return dependents
+
+
+def get_build_order(graph: Dict[str, ChartNode]) -> List[str]:
+    """
+    Sorts charts topologically (using Kahn's algorithm), so every chart comes after all of its dependencies.
+    Charts that can be built at the same stage are sorted by their path, so the order is deterministic.
+    :raises ValidationError: if dependencies of charts form a cycle
+    """
+    dependents = _get_dependents(graph)
+    pending = {chart_dir: len(set(node.dependencies.values())) for chart_dir, node in graph.items()}
+    ready = sorted(chart_dir for chart_dir, count in pending.items() if count == 0)
+    order: List[str] = []
+    while ready:
+        order.extend(ready)
+        next_ready: List[str] = []
+        for chart_dir in ready:
+            for dependent in set(dependents[chart_dir]):
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    next_ready.append(dependent)
+        ready = sorted(next_ready)
+    if len(order) != len(graph):
+        cycle = sorted(chart_dir for chart_dir, count in pending.items() if count > 0)
+        raise ValidationError("monorepo", f"Dependencies of the following charts form a cycle: {cycle}.")
+    return order
+
+
+class MonorepoBuilder:
+    """
+    Schedules builds of charts from a dependency graph. A chart is started as soon as all of its dependencies
+    are built, with at most 'jobs' charts being built at the same time. Charts depending on a chart that failed
+    to build are not built at all.
+    """
+
+    def __init__(
+        self,
+        graph: Dict[str, ChartNode],
+        build_chart: Callable[[str, Dict[str, str]], ChartBuildResult],
+        jobs: int = 1,
+    ):
+        """
+        :param graph: the graph of charts to build
+        :param build_chart: called with the chart's directory and a map of names of the chart's dependencies
+        to paths of their archives built in this run; returns the result of the build
+        :param jobs: max number of charts built concurrently
+        """
+        self._graph = graph
+        self._build_chart = build_chart
+        self._jobs = jobs
+        self._dependents = _get_dependents(graph)
+        self._results: Dict[str, ChartBuildResult] = {}
+
+    def _get_failed_dependencies(self, chart_dir: str) -> List[str]:
+        return sorted(
+            dependency_dir
+            for dependency_dir in self._graph[chart_dir].dependencies.values()
+            if not self._results[dependency_dir].succeeded
+        )
+
+    def _get_prebuilt_subcharts(self, chart_dir: str) -> Dict[str, str]:
+        prebuilt: Dict[str, str] = {}
+        for name, dependency_dir in self._graph[chart_dir].dependencies.items():
+            chart_path = self._results[dependency_dir].chart_path
+            # no archive is available if the build steps were skipped
+            if chart_path is not None:
+                prebuilt[name] = chart_path
+        return prebuilt
+
+    def _build(self, chart_dir: str, prebuilt_subcharts: Dict[str, str]) -> ChartBuildResult:
+        try:
+            return self._build_chart(chart_dir, prebuilt_subcharts)
+        except Exception as e:
+            logger.exception(f"Unexpected error when building chart '{chart_dir}'.")
+            return ChartBuildResult(chart_dir, False, reason=f"unexpected error: {e}")
+
+    def _complete(self, result: ChartBuildResult) -> List[str]:
+        """Saves the result and returns charts that can be built now."""
+        finished = [result]
+        ready: List[str] = []
+        while finished:
+            current = finished.pop()
+            self._results[current.chart_dir] = current
+            for dependent in sorted(set(self._dependents[current.chart_dir])):
+                if dependent in self._results or any(
+                    d not in self._results for d in self._graph[dependent].dependencies.values()
+                ):
+                    continue
+                failed = self._get_failed_dependencies(dependent)
+                if failed:
+                    finished.append(ChartBuildResult(dependent, False, reason=f"dependencies failed: {failed}"))
+                else:
+                    ready.append(dependent)
+        return ready
+
+    def run(self) -> Dict[str, ChartBuildResult]:
+        """
+        Builds all the charts.
+        :return: results of all the charts, in the build order
+        """
+        order = get_build_order(self._graph)
+        ready = [chart_dir for chart_dir in order if not self._graph[chart_dir].dependencies]
+        with ThreadPoolExecutor(max_workers=self._jobs, thread_name_prefix="chart-build") as executor:
+            running: Dict[Future, str] = {}
+            while ready or running:
+                for chart_dir in ready:
+                    logger.info(f"Starting build of chart '{chart_dir}'.")
+                    # only this thread accesses the results, so subcharts are collected here
+                    future = executor.submit(self._build, chart_dir, self._get_prebuilt_subcharts(chart_dir))
+                    running[future] = chart_dir
+                ready = []
+                done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: running[f]):
+                    del running[future]
+                    ready.extend(self._complete(future.result()))
+        return {chart_dir: self._results[chart_dir] for chart_dir in order}
+
+
+def build_chart(
+    config: argparse.Namespace, pipeline_factory: PipelineFactory, chart_dir: str, prebuilt_subcharts: Dict[str, str]
+) -> ChartBuildResult:
+    """
+    Runs the whole build pipeline for a single chart of a monorepo.
+    :param config: the config object; a copy with 'chart_dir' set to the chart's directory is used for the build
+    :param pipeline_factory: creates new steps to build the chart with
+    :param chart_dir: directory of the chart to build
+    :param prebuilt_subcharts: map of names of the chart's dependencies to their archives built in this run
+    :return: result of the build
+    """
+    chart_config = copy.copy(config)
+    chart_config.chart_dir = chart_dir
+    runner = BuildRunner(
+        chart_config, pipeline_factory(chart_config), {context_key_prebuilt_subcharts: prebuilt_subcharts}
+    )
+    runner.run()
+    if runner.has_failed:
+        return ChartBuildResult(chart_dir, False, reason="build failed")
+    return ChartBuildResult(chart_dir, True, runner.context.get(context_key_chart_full_path))
+
+
+def format_build_summary(results: Dict[str, ChartBuildResult]) -> str:
+    lines = ["Monorepo build summary:"]
+    for chart_dir, result in results.items():
+        status = "OK" if result.succeeded else f"FAILED ({result.reason})"
+        lines.append(f"  {chart_dir}: {status}")
+    return "\n".join(lines)
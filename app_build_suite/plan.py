@@ -0,0 +1,68 @@
+"""Computes and renders the execution plan of a build without running any of its steps."""
+import argparse
+from typing import List, NamedTuple, Optional
+
+from step_exec_lib.steps import BuildStep
+
+from app_build_suite.build_steps.pipeline import PlannableStep, StepWrappingPipeline
+from app_build_suite.history import BuildHistory
+
+
+class PlanEntry(NamedTuple):
+    step_name: str
+    will_run: bool
+    reason: str
+    expected_duration: Optional[float]
+
+
+def _get_skip_reason(config: argparse.Namespace, step: BuildStep) -> Optional[str]:
+    if isinstance(step, PlannableStep):
+        return step.get_skip_reason(config)
+    return None
+
+
+def get_execution_plan(
+    config: argparse.Namespace, pipelines: List[BuildStep], history: Optional[BuildHistory] = None
+) -> List[PlanEntry]:
+    """
+    Evaluates which steps will be executed for the given config. Doesn't execute any step's code other than
+    the checks of config options and files present in the chart's directory.
+    :param config: parsed configuration Namespace
+    :param pipelines: the list of pipelines (or single BuildSteps) to check
+    :param history: optional history of previous builds, used to estimate duration of steps
+    :return: list of plan entries, one for each step, in execution order
+    """
+    plan: List[PlanEntry] = []
+    for pipeline in pipelines:
+        steps = pipeline.get_steps(config) if isinstance(pipeline, StepWrappingPipeline) else [pipeline]
+        for step in steps:
+            if isinstance(pipeline, StepWrappingPipeline) and not pipeline.is_step_requested(config, step):
+                plan.append(PlanEntry(step.name, False, "not selected by '--steps' or '--skip-steps'", None))
+                continue
+            reason = _get_skip_reason(config, step)
+            expected = history.get_expected_step_duration(config.chart_dir, step.name) if history else None
+            plan.append(PlanEntry(step.name, reason is None, reason or "", expected if reason is None else None))
+    return plan
+
+
+def format_execution_plan(config: argparse.Namespace, plan: List[PlanEntry]) -> str:
+    lines = [f"Execution plan for chart in '{config.chart_dir}':"]
+    name_width = max((len(e.step_name) for e in plan), default=0)
+    has_durations = False
+    total = 0.0
+    for i, entry in enumerate(plan, start=1):
+        if entry.will_run:
+            if entry.expected_duration is not None:
+                has_durations = True
+                total += entry.expected_duration
+                details = f"expected {entry.expected_duration:.2f}s"
+            else:
+                details = "no history"
+            lines.append(f"{i:>3}. {entry.step_name:<{name_width}}  run   {details}")
+        else:
+            lines.append(f"{i:>3}. {entry.step_name:<{name_width}}  skip  {entry.reason}")
+    if has_durations:
+        lines.append(f"Expected total duration of steps with history: {total:.2f}s")
+    else:
+        lines.append("No build history found for this chart, durations can't be estimated.")
+    return "\n".join(lines)
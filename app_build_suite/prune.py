@@ -0,0 +1,146 @@
+"""
+Pruning of old chart versions from a catalog directory. Versions to keep are selected with retention policies,
+based on metadata saved by HelmChartMetadataFinalizer in each chart's '-meta/main.yaml' file. Pruned versions
+are removed from the catalog's 'index.yaml' before their files are deleted, so the index never points to
+missing archives.
+"""
+import logging
+import os
+import shutil
+import tempfile
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Set
+
+import yaml
+
+from app_build_suite.catalog import (
+    CATALOG_INDEX_YAML,
+    DEFAULT_READ_WORKERS,
+    META_DIR_SUFFIX,
+    CatalogEntry,
+    read_catalog,
+)
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionPolicy(NamedTuple):
+    # number of the most recently created versions kept for each chart
+    keep_last: int
+    # versions created less than this many days ago are kept; 0 disables the policy
+    keep_days: float
+    # keep all versions without a pre-release part
+    keep_tagged: bool
+
+
+class PruneReport(NamedTuple):
+    kept: List[CatalogEntry]
+    pruned: List[CatalogEntry]
+    # number of versions removed from the catalog's index
+    removed_from_index: int
+
+
+def select_entries_to_prune(
+    entries: List[CatalogEntry], policy: RetentionPolicy, now: Optional[datetime] = None
+) -> List[CatalogEntry]:
+    """
+    Applies the retention policy to the entries. An entry is kept if any of the policies keeps it.
+    :param entries: entries of the catalog
+    :param policy: the retention policy
+    :param now: current UTC time, used to compute the age of entries
+    :return: entries that no policy keeps
+    """
+    min_created = (now or datetime.utcnow()) - timedelta(days=policy.keep_days) if policy.keep_days else None
+    by_chart: Dict[str, List[CatalogEntry]] = defaultdict(list)
+    for entry in entries:
+        by_chart[entry.name].append(entry)
+    pruned: List[CatalogEntry] = []
+    for chart_entries in by_chart.values():
+        chart_entries.sort(key=lambda e: e.created, reverse=True)
+        for position, entry in enumerate(chart_entries):
+            if position < policy.keep_last:
+                continue
+            if policy.keep_tagged and entry.is_tagged_release:
+                continue
+            if min_created is not None and entry.created >= min_created:
+                continue
+            pruned.append(entry)
+    return sorted(pruned, key=lambda e: e.chart_file)
+
+
+def prune_index(index_path: str, chart_files: Set[str]) -> int:
+    """
+    Removes versions, which archives are among 'chart_files', from the catalog's index and saves it atomically.
+    :return: number of removed versions
+    """
+    with open(index_path, "r") as f:
+        index = yaml.load(f, Loader=SafeLoader) or {}  # nosec, safe loader is used
+    removed = 0
+    entries = index.get("entries") or {}
+    for name in list(entries):
+        versions = entries[name] or []
+        kept = [v for v in versions if not any(os.path.basename(str(u)) in chart_files for u in v.get("urls") or [])]
+        removed += len(versions) - len(kept)
+        if kept:
+            entries[name] = kept
+        else:
+            del entries[name]
+    if removed:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(index_path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            yaml.dump(index, f, default_flow_style=False)
+        os.replace(temp_path, index_path)
+    return removed
+
+
+def _delete_entry_files(catalog_dir: str, entry: CatalogEntry) -> None:
+    chart_path = os.path.join(catalog_dir, entry.chart_file)
+    if os.path.exists(chart_path):
+        os.remove(chart_path)
+    if os.path.isdir(f"{chart_path}{META_DIR_SUFFIX}"):
+        shutil.rmtree(f"{chart_path}{META_DIR_SUFFIX}")
+
+
+def prune_catalog(
+    catalog_dir: str,
+    policy: RetentionPolicy,
+    dry_run: bool = False,
+    now: Optional[datetime] = None,
+    max_workers: int = DEFAULT_READ_WORKERS,
+) -> PruneReport:
+    """
+    Removes chart versions not kept by the retention policy from the catalog: their entries in 'index.yaml',
+    archives and metadata directories.
+    :param catalog_dir: the catalog directory
+    :param policy: the retention policy
+    :param dry_run: if True, only report what would be pruned
+    :param now: current UTC time, used to compute the age of entries
+    :param max_workers: max number of metadata files read concurrently
+    :return: the report of kept and pruned entries
+    """
+    entries = read_catalog(catalog_dir, max_workers)
+    pruned = select_entries_to_prune(entries, policy, now)
+    pruned_files = {entry.chart_file for entry in pruned}
+    kept = [entry for entry in entries if entry.chart_file not in pruned_files]
+    if dry_run or not pruned:
+        return PruneReport(kept, pruned, 0)
+    index_path = os.path.join(catalog_dir, CATALOG_INDEX_YAML)
+    removed_from_index = prune_index(index_path, pruned_files) if os.path.isfile(index_path) else 0
+    for entry in pruned:
+        _delete_entry_files(catalog_dir, entry)
+    return PruneReport(kept, pruned, removed_from_index)
+
+
+def format_prune_report(report: PruneReport, dry_run: bool) -> str:
+    action = "Would prune" if dry_run else "Pruned"
+    lines = [f"{action} {len(report.pruned)} and kept {len(report.kept)} chart version(s):"]
+    lines.extend(f"  {entry.chart_file} (created {entry.created.isoformat()})" for entry in report.pruned)
+    if not dry_run:
+        lines.append(f"Removed {report.removed_from_index} version(s) from {CATALOG_INDEX_YAML}.")
+    return "\n".join(lines)
@@ -0,0 +1,54 @@
+"""Runner of build pipelines that can be used many times in a single process."""
+import argparse
+import logging
+from typing import List, Optional
+
+from step_exec_lib.errors import Error
+from step_exec_lib.steps import BuildStep, Runner
+from step_exec_lib.types import Context
+
+from app_build_suite.build_steps.context import BuildContext
+
+logger = logging.getLogger(__name__)
+
+
+class BuildRunner(Runner):
+    """
+    Runner that reports a failed build with its 'has_failed' property instead of exiting the process,
+    so many builds can be executed by one process. Cleanup of the steps runs also when a step raises an
+    unexpected exception, which is then propagated. Accepts an initial context for the build, which is
+    passed to the steps as a BuildContext.
+    """
+
+    def __init__(self, config: argparse.Namespace, steps: List[BuildStep], context: Optional[Context] = None):
+        super().__init__(config, steps)
+        self._context = BuildContext(context or {})
+        self._failed_pre_run = False
+
+    @property
+    def has_failed(self) -> bool:
+        return self._failed_pre_run or self._failed_build
+
+    def run(self) -> None:
+        self.run_pre_steps()
+        if self._failed_pre_run:
+            return
+        try:
+            self.run_build_steps()
+        except BaseException:
+            # only step_exec_lib's errors are handled by 'run_build_steps'; steps still have to clean up
+            # after any other exception, like for any failed build
+            self._failed_build = True
+            raise
+        finally:
+            self.run_cleanup()
+        if self._failed_build:
+            logger.error("Build failed due to failed build step.")
+
+    def run_pre_steps(self) -> None:
+        try:
+            for step in self._steps:
+                step.pre_run(self._config)
+        except Error as e:
+            logger.error(f"Error when running pre-steps: {e}.")
+            self._failed_pre_run = True
@@ -0,0 +1,144 @@
+"""
+Static sharding of monorepo charts between CI jobs. Charts connected by 'file://' dependencies have to be
+built by the same job, so they are grouped together first. Groups are then assigned to shards with
+the longest processing time first rule: the most expensive group goes to the least loaded shard. Every job
+computes the whole assignment, so all the jobs have to see the same costs. By default, costs are sizes of
+the charts' files, which are the same in every checkout of a commit. Expected build durations from the history
+of previous builds are used only if the history is shared by all the jobs; charts with no history are then
+estimated from their size.
+"""
+import logging
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+from step_exec_lib.errors import ConfigError
+
+from app_build_suite.history import BuildHistory
+from app_build_suite.monorepo import ChartNode
+from app_build_suite.utils.hashing import IGNORED_DIR_NAMES
+
+logger = logging.getLogger(__name__)
+
+_shard_regexp = re.compile(r"^(?P<number>\d+)/(?P<total>\d+)$")
+
+
+class Shard(NamedTuple):
+    # 1-based index of the shard, like CI matrix job numbers
+    number: int
+    total: int
+
+
+class ShardAssignment(NamedTuple):
+    # chart directories of each shard, the first list is shard 1
+    charts: List[List[str]]
+    # expected durations of the shards, in the same units as the costs of charts
+    loads: List[float]
+
+
+def parse_shard(value: str) -> Shard:
+    """
+    Parses the shard passed as 'i/N'.
+    :raises ConfigError: if the value is not in the 'i/N' format or 'i' is not between 1 and N
+    """
+    match = _shard_regexp.match(value.strip())
+    if match is None:
+        raise ConfigError("shard", f"Shard '{value}' is not in the 'i/N' format, like '1/4'.")
+    shard = Shard(int(match.group("number")), int(match.group("total")))
+    if not 1 <= shard.number <= shard.total:
+        raise ConfigError("shard", f"Shard number has to be between 1 and {shard.total}, got {shard.number}.")
+    return shard
+
+
+def get_chart_size(chart_dir: str) -> int:
+    """Returns the total size of files in the chart's tree, including vendored subcharts."""
+    size = 0
+    for dir_path, dir_names, file_names in os.walk(chart_dir):
+        dir_names[:] = [d for d in dir_names if d not in IGNORED_DIR_NAMES]
+        for file_name in file_names:
+            file_path = os.path.join(dir_path, file_name)
+            if os.path.isfile(file_path):
+                size += os.path.getsize(file_path)
+    return size
+
+
+def get_chart_costs(chart_dirs: List[str], history: Optional[BuildHistory]) -> Dict[str, float]:
+    """
+    Returns the expected cost of building each chart. Charts with history cost their expected duration
+    in seconds. Other charts are estimated from their size, at the average seconds per byte of the charts
+    with history; if no chart has history or no history is given, sizes in bytes are used as costs of all
+    the charts.
+    """
+    durations: Dict[str, float] = {}
+    if history is not None:
+        for chart_dir in chart_dirs:
+            duration = history.get_expected_chart_duration(chart_dir)
+            if duration is not None:
+                durations[chart_dir] = duration
+    sizes = {chart_dir: get_chart_size(chart_dir) for chart_dir in chart_dirs if chart_dir not in durations}
+    if not sizes:
+        return durations
+    known_size = sum(get_chart_size(chart_dir) for chart_dir in durations)
+    seconds_per_byte = sum(durations.values()) / known_size if durations and known_size else 1.0
+    if durations:
+        logger.debug(f"Estimating durations of {len(sizes)} chart(s) without history by their size.")
+    return {**durations, **{chart_dir: size * seconds_per_byte for chart_dir, size in sizes.items()}}
+
+
+def get_connected_charts(graph: Dict[str, ChartNode]) -> List[List[str]]:
+    """Groups charts connected by dependencies in any direction; charts and groups are sorted by path."""
+    parents = {chart_dir: chart_dir for chart_dir in graph}
+
+    def find(chart_dir: str) -> str:
+        while parents[chart_dir] != chart_dir:
+            parents[chart_dir] = parents[parents[chart_dir]]
+            chart_dir = parents[chart_dir]
+        return chart_dir
+
+    for chart_dir, node in graph.items():
+        for dependency_dir in node.dependencies.values():
+            first, second = sorted([find(chart_dir), find(dependency_dir)])
+            parents[second] = first
+    groups: Dict[str, List[str]] = {}
+    for chart_dir in sorted(graph):
+        groups.setdefault(find(chart_dir), []).append(chart_dir)
+    return sorted(groups.values())
+
+
+def assign_shards(graph: Dict[str, ChartNode], costs: Dict[str, float], count: int) -> ShardAssignment:
+    """
+    Assigns groups of connected charts to shards, the most expensive group first, each to the shard
+    with the lowest load; ties are broken by the groups' paths and the shards' indexes.
+    :param graph: the graph of charts to split
+    :param costs: expected costs of the charts
+    :param count: number of shards
+    :return: the assignment
+    """
+    groups = get_connected_charts(graph)
+    groups.sort(key=lambda group: (-sum(costs[chart_dir] for chart_dir in group), group))
+    charts: List[List[str]] = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for group in groups:
+        target = min(range(count), key=lambda index: (loads[index], index))
+        charts[target].extend(group)
+        loads[target] += sum(costs[chart_dir] for chart_dir in group)
+    return ShardAssignment([sorted(shard_charts) for shard_charts in charts], loads)
+
+
+def select_shard(graph: Dict[str, ChartNode], shard: Shard, history: Optional[BuildHistory]) -> Dict[str, ChartNode]:
+    """
+    Returns the part of the graph built by the shard. All the charts are in the same tree, so ordering them
+    by path doesn't depend on where the repository is checked out.
+    :param graph: the graph of all the charts
+    :param shard: the shard to select
+    :param history: history of builds shared by all the jobs, keyed by paths relative to the git repository;
+    if None, costs of charts are their sizes
+    :return: the charts of the shard, with all their dependencies
+    """
+    assignment = assign_shards(graph, get_chart_costs(sorted(graph), history), shard.total)
+    shard_charts = assignment.charts[shard.number - 1]
+    logger.info(
+        f"Shard {shard.number}/{shard.total} builds {len(shard_charts)} of {len(graph)} chart(s), "
+        f"expected loads of the shards: {[round(load, 1) for load in assignment.loads]}."
+    )
+    return {chart_dir: graph[chart_dir] for chart_dir in shard_charts}
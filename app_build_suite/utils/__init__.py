@@ -0,0 +1 @@
+"""Utilities shared by build steps and other components."""
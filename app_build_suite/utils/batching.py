@@ -0,0 +1,78 @@
+"""Micro-batching of requests made concurrently by many threads."""
+import threading
+from typing import Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+R = TypeVar("R")
+
+
+class _Batch(Generic[K, R]):
+    def __init__(self) -> None:
+        self.items: List[K] = []
+        self.results: Dict[K, R] = {}
+        self.error: Optional[BaseException] = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class MicroBatcher(Generic[K, R]):
+    """
+    Collects items submitted by many threads into batches and processes each batch with a single call.
+    The first thread submitting to an empty batch becomes its leader: it waits until the batch is full or
+    'max_wait' seconds pass, processes the batch in its own thread and hands results over to the other
+    threads waiting for their items.
+    """
+
+    def __init__(self, run_batch: Callable[[List[K]], Dict[K, R]], max_batch_size: int, max_wait: float):
+        """
+        :param run_batch: processes a batch of unique items and returns a result for each one of them
+        :param max_batch_size: max number of items in a batch
+        :param max_wait: max time in seconds the leader waits for other items before processing the batch
+        """
+        self._run_batch = run_batch
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._lock = threading.Lock()
+        self._open_batch: Optional[_Batch[K, R]] = None
+
+    def submit(self, item: K) -> R:
+        """Adds the item to the current batch and blocks until the batch is processed."""
+        with self._lock:
+            batch = self._open_batch
+            is_leader = batch is None
+            if batch is None:
+                batch = self._open_batch = _Batch()
+            batch.items.append(item)
+            if len(batch.items) >= self._max_batch_size:
+                self._open_batch = None
+                batch.full.set()
+        if not is_leader:
+            batch.done.wait()
+        else:
+            batch.full.wait(self._max_wait)
+            with self._lock:
+                if self._open_batch is batch:
+                    self._open_batch = None
+            try:
+                batch.results = self._run_batch(list(batch.items))
+            except BaseException as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[item]
+
+
+class BatcherRegistry:
+    """Keeps a single MicroBatcher for each key, so all the users of the same key share batches."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._batchers: Dict[Hashable, MicroBatcher] = {}
+
+    def get(self, key: Hashable, factory: Callable[[], MicroBatcher]) -> MicroBatcher:
+        with self._lock:
+            if key not in self._batchers:
+                self._batchers[key] = factory()
+            return self._batchers[key]
@@ -0,0 +1,31 @@
+"""Hashing of files and directory trees."""
+import hashlib
+import os
+from typing import Any, Set
+
+IGNORED_DIR_NAMES = {".git"}
+
+
+def hash_file(digest: Any, path: str) -> None:
+    """Updates the digest with the contents of the file."""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+
+def hash_directory(digest: Any, path: str, ignored_dir_names: Set[str] = IGNORED_DIR_NAMES) -> None:
+    """Updates the digest with paths relative to the directory and contents of all the files in its tree."""
+    for dir_path, dir_names, file_names in os.walk(path):
+        dir_names[:] = sorted(d for d in dir_names if d not in ignored_dir_names)
+        for file_name in sorted(file_names):
+            file_path = os.path.join(dir_path, file_name)
+            digest.update(f"\0file:{os.path.relpath(file_path, path)}\0".encode())
+            if os.path.isfile(file_path):
+                hash_file(digest, file_path)
+
+
+def get_directory_digest(path: str) -> str:
+    """Returns sha256 of the directory's tree; directories with the same contents have the same digest."""
+    digest = hashlib.sha256()
+    hash_directory(digest, path)
+    return digest.hexdigest()
@@ -0,0 +1,114 @@
+"""Minimal thread-safe HTTP client that keeps and reuses persistent connections."""
+import http.client
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, str, int]
+
+
+class HttpResponse(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+    def header(self, name: str, default: str = "") -> str:
+        return self.headers.get(name.lower(), default)
+
+
+class HttpConnectionPool:
+    """
+    Keeps idle HTTP(S) connections per (scheme, host, port) and hands them out to callers, so
+    subsequent requests to the same server don't pay the TCP and TLS handshake costs again.
+    The pool can be safely shared between threads; each request uses one connection exclusively.
+    """
+
+    def __init__(self, max_idle_per_host: int = 8, timeout: float = 60.0):
+        self._max_idle_per_host = max_idle_per_host
+        self._timeout = timeout
+        self._idle: Dict[PoolKey, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._connections_created = 0
+
+    @property
+    def connections_created(self) -> int:
+        return self._connections_created
+
+    @staticmethod
+    def _get_pool_key(url: str) -> PoolKey:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        port = parts.port or (443 if scheme == "https" else 80)
+        return scheme, parts.hostname or "", port
+
+    def _acquire(self, key: PoolKey) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+            self._connections_created += 1
+        scheme, host, port = key
+        conn_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return conn_cls(host, port, timeout=self._timeout), False
+
+    def _release(self, key: PoolKey, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self._max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: Optional[Union[bytes, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> HttpResponse:
+        """
+        Executes a single request and reads the full response.
+        :param method: HTTP method
+        :param url: full URL (including scheme and host)
+        :param body: optional request body
+        :param headers: optional request headers
+        :return: HttpResponse with lower-cased header names
+        """
+        key = self._get_pool_key(url)
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+        data = body.encode() if isinstance(body, str) else body
+        while True:
+            conn, reused = self._acquire(key)
+            try:
+                conn.request(method, path, body=data, headers=headers or {})
+                resp = conn.getresponse()
+                resp_body = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    # the server closed an idle connection, try again with a fresh one
+                    logger.debug(f"Pooled connection to {key[1]}:{key[2]} was closed by the server, reconnecting.")
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return HttpResponse(resp.status, resp_headers, resp_body)
@@ -0,0 +1,161 @@
+"""
+Logging setup. All log records are put on a queue by the logging threads and written to the console and files
+by a separate listener thread, so slow log consumers don't slow down the build.
+"""
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from step_exec_lib.steps import BuildStep
+
+from app_build_suite.build_steps.pipeline import StepWrapper
+
+LOG_FORMAT_TEXT = "text"
+LOG_FORMAT_JSON = "json"
+ALL_LOG_FORMATS = [LOG_FORMAT_TEXT, LOG_FORMAT_JSON]
+TEXT_LOG_FORMAT = "%(asctime)s %(name)s %(levelname)s: %(message)s"
+
+current_step: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_step", default=None)
+current_chart: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_chart", default=None)
+
+
+class StepContextFilter(logging.Filter):
+    """Adds 'step' and 'chart' attributes to log records. Has to run in the thread that emits the record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.step = current_step.get()
+        record.chart = current_chart.get()
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "step": getattr(record, "step", None),
+            "chart": getattr(record, "chart", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for a queue read by a listener in the same process. The base class merges the formatted
+    exception into the message and drops 'exc_info', as records put on queues are often pickled; here the
+    exception is kept, so formatters of the listener's handlers can format it on their own.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # arguments are formatted right away, as they can be changed before the listener handles the record
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class QuietStepsFilter(logging.Filter):
+    """Passes records logged outside of build steps, and only warnings and errors logged by build steps."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return getattr(record, "step", None) is None or record.levelno >= logging.WARNING
+
+
+class StepLogFileHandler(logging.Handler):
+    """Writes records logged by each build step to a separate '<step name>.log' file."""
+
+    def __init__(self, log_dir: str):
+        super().__init__()
+        self._log_dir = log_dir
+        self._handlers: Dict[str, logging.FileHandler] = {}
+        self._handlers_lock = threading.Lock()
+        os.makedirs(log_dir, exist_ok=True)
+
+    def _get_handler(self, step: str) -> logging.FileHandler:
+        with self._handlers_lock:
+            if step not in self._handlers:
+                handler = logging.FileHandler(os.path.join(self._log_dir, f"{step}.log"))
+                handler.setFormatter(self.formatter)
+                self._handlers[step] = handler
+            return self._handlers[step]
+
+    def emit(self, record: logging.LogRecord) -> None:
+        step = getattr(record, "step", None)
+        if step is None:
+            return
+        self._get_handler(step).handle(record)
+
+    def close(self) -> None:
+        with self._handlers_lock:
+            for handler in self._handlers.values():
+                handler.close()
+            self._handlers.clear()
+        super().close()
+
+
+def get_formatter(log_format: str) -> logging.Formatter:
+    if log_format == LOG_FORMAT_JSON:
+        return JsonLinesFormatter()
+    return logging.Formatter(TEXT_LOG_FORMAT)
+
+
+def configure_logging(
+    level: int, log_format: str = LOG_FORMAT_TEXT, step_log_dir: Optional[str] = None
+) -> logging.handlers.QueueListener:
+    """
+    Replaces handlers of the root logger with a single QueueHandler and starts a QueueListener
+    that writes the records to the console and, optionally, to per-step log files.
+    :param level: log level of the root logger
+    :param log_format: one of ALL_LOG_FORMATS
+    :param step_log_dir: if set, records logged by build steps are saved to files in this directory and
+    only warnings and errors logged by build steps are shown on the console
+    :return: the started listener; call its 'stop()' method to flush all the records before exiting
+    """
+    formatter = get_formatter(log_format)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    target_handlers: List[logging.Handler] = [console_handler]
+    if step_log_dir:
+        console_handler.addFilter(QuietStepsFilter())
+        file_handler = StepLogFileHandler(step_log_dir)
+        file_handler.setFormatter(formatter)
+        target_handlers.append(file_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = InProcessQueueHandler(log_queue)
+    queue_handler.addFilter(StepContextFilter())
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *target_handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def step_log_context(chart_dir: str) -> StepWrapper:
+    """Returns a StepWrapper that marks all records logged during execution of a step with step and chart names."""
+
+    def wrapper(step: BuildStep, stage: str, call: Callable[[], None]) -> None:
+        step_token = current_step.set(step.name)
+        chart_token = current_chart.set(chart_dir)
+        try:
+            call()
+        finally:
+            current_step.reset(step_token)
+            current_chart.reset(chart_token)
+
+    return wrapper
@@ -0,0 +1,154 @@
+"""Running external tools with per-step time limits and resource limits."""
+import argparse
+import contextvars
+import logging
+import os
+import shutil
+import signal
+import subprocess  # nosec: we need it to invoke binaries from system
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from step_exec_lib.errors import ConfigError
+from step_exec_lib.steps import BuildStep
+
+from app_build_suite.build_steps.pipeline import STAGE_CLEANUP, StepWrapper
+from app_build_suite.errors import BuildError
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 * 1024
+PRLIMIT_BIN = "prlimit"
+
+
+class ProcessLimits(NamedTuple):
+    step_name: str
+    timeout: Optional[float] = None
+    deadline: Optional[float] = None
+    max_memory_bytes: Optional[int] = None
+    max_cpu_seconds: Optional[int] = None
+
+    def remaining_time(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def has_rlimits(self) -> bool:
+        return self.max_memory_bytes is not None or self.max_cpu_seconds is not None
+
+
+current_limits: contextvars.ContextVar[Optional[ProcessLimits]] = contextvars.ContextVar("current_limits", default=None)
+
+
+def rlimits_supported() -> bool:
+    """Resource limits are set by running tools with 'prlimit' from util-linux, which is only available on Linux."""
+    return shutil.which(PRLIMIT_BIN) is not None
+
+
+def _get_prlimit_args(limits: ProcessLimits) -> List[str]:
+    """
+    Returns the 'prlimit' command that sets the resource limits and then executes the tool, so the limits
+    apply from its start, including to processes it starts right away. 'preexec_fn' isn't used, as it's not
+    safe to use it in a process with threads, like parallel builds.
+    """
+    args = [PRLIMIT_BIN]
+    if limits.max_memory_bytes is not None:
+        args.append(f"--as={limits.max_memory_bytes}:{limits.max_memory_bytes}")
+    if limits.max_cpu_seconds is not None:
+        args.append(f"--cpu={limits.max_cpu_seconds}:{limits.max_cpu_seconds}")
+    return [*args, "--"]
+
+
+def run_and_log(args: List[str], **kwargs: Any) -> subprocess.CompletedProcess:
+    """
+    Works like 'step_exec_lib.utils.processes.run_and_log', but enforces the limits configured for the
+    currently executed build step. The process is started in a new process group and the whole
+    group is killed if the step's deadline passes.
+    :param args: command line to execute
+    :param kwargs: the same keyword arguments as accepted by 'subprocess.run'
+    :return: the completed process
+    """
+    logger.info("Running command:")
+    logger.info(" ".join(args))
+    if "text" not in kwargs:
+        kwargs["text"] = True
+    if kwargs.pop("capture_output", False):
+        kwargs["stdout"] = subprocess.PIPE
+        kwargs["stderr"] = subprocess.PIPE
+    stdin_input = kwargs.pop("input", None)
+    if stdin_input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+
+    limits = current_limits.get()
+    timeout = limits.remaining_time() if limits is not None else None
+
+    command = [*_get_prlimit_args(limits), *args] if limits is not None and limits.has_rlimits() else args
+    with subprocess.Popen(command, start_new_session=True, **kwargs) as proc:  # nosec
+        try:
+            stdout, stderr = proc.communicate(stdin_input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill_process_group(proc)
+            proc.communicate()
+            # timeout is only set when limits are present
+            step_name = limits.step_name if limits is not None else ""
+            step_timeout = limits.timeout if limits is not None else timeout
+            logger.error(f"Command '{args[0]}' exceeded the time limit of step {step_name} and was killed.")
+            raise BuildError(
+                step_name,
+                f"step didn't finish within its time limit of {step_timeout}s, command '{args[0]}' was killed",
+            )
+        except BaseException:
+            _kill_process_group(proc)
+            raise
+    run_res = subprocess.CompletedProcess(args, proc.returncode, stdout, stderr)
+    logger.info(f"Command executed, exit code: {run_res.returncode}.")
+    return run_res
+
+
+def _kill_process_group(proc: subprocess.Popen) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        proc.kill()
+
+
+def parse_step_timeouts(value: str) -> Dict[str, float]:
+    """Parses a comma separated list of 'StepName=seconds' pairs."""
+    timeouts: Dict[str, float] = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, seconds = entry.partition("=")
+        try:
+            timeout = float(seconds)
+        except ValueError:
+            timeout = 0
+        if not name.strip() or timeout <= 0:
+            raise ConfigError("step-timeouts", f"Invalid entry '{entry}', expected 'StepName=seconds'.")
+        timeouts[name.strip()] = timeout
+    return timeouts
+
+
+def process_limits(config: argparse.Namespace) -> StepWrapper:
+    """
+    Returns a StepWrapper that makes 'run_and_log' enforce the timeout configured for the step and the
+    configured resource limits. Cleanup stage is never limited, so restoring files can't be interrupted.
+    """
+    timeouts = parse_step_timeouts(config.step_timeouts)
+    max_memory = config.child_max_memory * MIB if config.child_max_memory else None
+    max_cpu = config.child_max_cpu_time or None
+
+    def wrapper(step: BuildStep, stage: str, call: Callable[[], None]) -> None:
+        if stage == STAGE_CLEANUP:
+            call()
+            return
+        timeout = timeouts.get(step.name, config.default_step_timeout) or None
+        deadline = time.monotonic() + timeout if timeout else None
+        token = current_limits.set(ProcessLimits(step.name, timeout, deadline, max_memory, max_cpu))
+        try:
+            call()
+        finally:
+            current_limits.reset(token)
+
+    return wrapper
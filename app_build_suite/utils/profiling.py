@@ -0,0 +1,102 @@
+"""Profiling of the Python code executed by build steps."""
+import cProfile
+import logging
+import os
+import threading
+import tracemalloc
+from typing import Callable, Dict, Set
+
+from step_exec_lib.steps import BuildStep
+
+from app_build_suite.build_steps.pipeline import StepWrapper
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FILE_SUFFIX = ".prof"
+MEMORY_SUMMARY_FILE_SUFFIX = ".memory.txt"
+
+
+# number of stages traced at the moment; steps of many charts can be profiled concurrently, so tracing is
+# only stopped when the last of them finishes
+_tracing_stages = 0
+# tracing started outside of app_build_suite, like with PYTHONTRACEMALLOC, is never stopped
+_started_tracing = False
+_tracing_lock = threading.Lock()
+
+
+def _start_tracing() -> None:
+    global _tracing_stages, _started_tracing
+    with _tracing_lock:
+        if _tracing_stages == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _tracing_stages += 1
+
+
+def _stop_tracing() -> None:
+    global _tracing_stages, _started_tracing
+    with _tracing_lock:
+        _tracing_stages -= 1
+        if _tracing_stages == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def _write_memory_summary(
+    file_path: str, mode: str, stage: str, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, top_n: int
+) -> None:
+    stats = after.compare_to(before, "lineno")[:top_n]
+    with open(file_path, mode) as f:
+        f.write(f"== {stage}: top {len(stats)} allocation differences ==\n")
+        for stat in stats:
+            f.write(f"{stat}\n")
+
+
+def step_profiler(output_dir: str, trace_memory: bool = False, top_n: int = 25) -> StepWrapper:
+    """
+    Returns a StepWrapper that profiles all the stages of every step with cProfile. Stats of all stages
+    of a step are saved to a single '<step name>.prof' file, which can be loaded by 'pstats', 'snakeviz'
+    or converted into a flame graph.
+    :param output_dir: directory to save the files in
+    :param trace_memory: if True, memory allocations are traced with 'tracemalloc' and 'top_n' allocation
+    sites of each stage are saved to the '<step name>.memory.txt' file
+    :param top_n: number of allocation sites included in memory summaries
+    :return: the wrapper
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    profiles: Dict[str, cProfile.Profile] = {}
+    # summaries left by previous runs are overwritten by the first stage of each step
+    summarized_steps: Set[str] = set()
+
+    def trace(step: BuildStep, stage: str, call: Callable[[], None]) -> None:
+        _start_tracing()
+        try:
+            memory_before = tracemalloc.take_snapshot()
+            call()
+            memory_after = tracemalloc.take_snapshot()
+        finally:
+            _stop_tracing()
+        summary_path = os.path.join(output_dir, f"{step.name}{MEMORY_SUMMARY_FILE_SUFFIX}")
+        mode = "a" if step.name in summarized_steps else "w"
+        summarized_steps.add(step.name)
+        _write_memory_summary(summary_path, mode, stage, memory_before, memory_after, top_n)
+
+    def wrapper(step: BuildStep, stage: str, call: Callable[[], None]) -> None:
+        profile = profiles.setdefault(step.name, cProfile.Profile())
+        try:
+            profile.enable()
+        except ValueError as e:
+            # only one profiler can be active at a time in some python versions
+            logger.warning(f"Can't profile {stage} stage of step {step.name}: {e}.")
+            call()
+            return
+        try:
+            if trace_memory:
+                trace(step, stage, call)
+            else:
+                call()
+        finally:
+            profile.disable()
+            profile.dump_stats(os.path.join(output_dir, f"{step.name}{PROFILE_FILE_SUFFIX}"))
+
+    return wrapper
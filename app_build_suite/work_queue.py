@@ -0,0 +1,396 @@
+"""
+Work queue of chart builds shared by 'abs' workers on many machines through a shared filesystem. Charts of
+a monorepo are added as jobs, and every worker claims the jobs ready to build (with all their dependencies
+built) with the longest expected duration first. A claim is a lease file created atomically; the worker
+renews it while it builds the chart. Leases of crashed workers expire and their jobs are claimed again. A worker
+that loses its lease discards its build, so every job's result is recorded by a single worker.
+
+Layout of the queue directory:
+  jobs/<job id>.json    the chart's path relative to the monorepo root, its dependencies and expected duration
+  leases/<job id>.json  the claim: the worker's id and a unique id of the claim; the lease expires at the file's
+                        modification time, which is moved forward on renewal without replacing the file
+  done/<job id>.json    the result of the build
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from app_build_suite.monorepo import ChartBuildResult, ChartNode
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = "jobs"
+LEASES_DIR = "leases"
+DONE_DIR = "done"
+
+
+class QueueJob(NamedTuple):
+    job_id: str
+    # path relative to the monorepo root, so workers can have the repository checked out in different places
+    chart_path: str
+    # maps names of the chart's local dependencies to ids of their jobs
+    dependencies: Dict[str, str]
+    expected_duration: float
+
+
+def get_default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def get_job_id(chart_path: str) -> str:
+    return hashlib.sha256(chart_path.encode()).hexdigest()[:16]
+
+
+def _write_json_atomically(path: str, data: Any) -> None:
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def _create_json_exclusively(path: str, data: Any) -> bool:
+    """
+    Creates the file with complete contents, unless it already exists; hard-linking a temporary file
+    is atomic, so other workers never read a partially written file.
+    :return: False if the file already exists
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.link(temp_path, path)
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(temp_path)
+    return True
+
+
+class Lease(NamedTuple):
+    worker_id: str
+    claim_id: str
+    expires: float
+
+
+def _read_lease(path: str) -> Optional[Lease]:
+    """Reads the lease's contents and its expiry time from the same open file."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+            return Lease(data["worker_id"], data["claim_id"], os.fstat(f.fileno()).st_mtime)
+    except FileNotFoundError:
+        return None
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class FileWorkQueue:
+    """Queue of jobs kept in a directory; all operations are safe to run concurrently from many processes."""
+
+    def __init__(
+        self,
+        queue_dir: str,
+        worker_id: str,
+        lease_timeout: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param queue_dir: the queue directory, shared by all the workers
+        :param worker_id: unique id of this worker
+        :param lease_timeout: seconds after which a claim that wasn't renewed can be taken by another worker
+        :param clock: returns current time in seconds since the epoch; clocks of workers have to be in sync
+        """
+        self._queue_dir = queue_dir
+        self._worker_id = worker_id
+        self._lease_timeout = lease_timeout
+        self._clock = clock
+        # ids of the claims made by this worker, by job id
+        self._claims: Dict[str, str] = {}
+        for dir_name in [JOBS_DIR, LEASES_DIR, DONE_DIR]:
+            os.makedirs(os.path.join(queue_dir, dir_name), exist_ok=True)
+
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
+    @property
+    def lease_timeout(self) -> float:
+        return self._lease_timeout
+
+    def _path(self, dir_name: str, job_id: str) -> str:
+        return os.path.join(self._queue_dir, dir_name, f"{job_id}.json")
+
+    def add_jobs(self, jobs: List[QueueJob]) -> None:
+        """Adds jobs that are not in the queue yet. Jobs already added by other workers are not changed."""
+        for job in jobs:
+            _create_json_exclusively(self._path(JOBS_DIR, job.job_id), job._asdict())
+
+    def get_jobs(self) -> Dict[str, QueueJob]:
+        jobs: Dict[str, QueueJob] = {}
+        for file_name in os.listdir(os.path.join(self._queue_dir, JOBS_DIR)):
+            if not file_name.endswith(".json"):
+                continue
+            data = _read_json(os.path.join(self._queue_dir, JOBS_DIR, file_name))
+            if data is not None:
+                jobs[data["job_id"]] = QueueJob(**data)
+        return jobs
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return _read_json(self._path(DONE_DIR, job_id))
+
+    def _create_lease(self, job_id: str) -> bool:
+        """
+        Creates the lease file, unless one already exists. Its modification time is set before it's linked
+        into place, so other workers never see a lease without its expiry time.
+        """
+        lease_path = self._path(LEASES_DIR, job_id)
+        claim_id = uuid.uuid4().hex
+        expires = self._clock() + self._lease_timeout
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(lease_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"worker_id": self._worker_id, "claim_id": claim_id}, f)
+            os.utime(temp_path, (expires, expires))
+            os.link(temp_path, lease_path)
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(temp_path)
+        self._claims[job_id] = claim_id
+        return True
+
+    def _remove_lease(self, job_id: str, expected: Lease) -> bool:
+        """
+        Removes the lease file if it's still the expected lease. The file is first moved to a name owned by this
+        worker, which succeeds for only one worker, and then checked: if another worker has renewed or replaced
+        the lease since it was read, the file is put back.
+        :return: True if the expected lease was removed
+        """
+        lease_path = self._path(LEASES_DIR, job_id)
+        moved_path = f"{lease_path}.{self._worker_id}.moved"
+        try:
+            os.rename(lease_path, moved_path)
+        except FileNotFoundError:
+            return False
+        try:
+            if _read_lease(moved_path) == expected:
+                return True
+            try:
+                os.link(moved_path, lease_path)
+            except FileExistsError:
+                # another worker claimed the job while the file was moved; the owner of the moved lease
+                # finds out on its next renewal
+                logger.warning(f"Lease of worker '{expected.worker_id}' on job '{job_id}' was replaced.")
+            return False
+        finally:
+            os.remove(moved_path)
+
+    def _is_own_lease(self, lease: Optional[Lease], job_id: str) -> bool:
+        return lease is not None and lease.claim_id == self._claims.get(job_id)
+
+    def claim(self, job_id: str) -> bool:
+        """
+        Claims the job. Creating the lease file is atomic, so only one worker succeeds. An expired lease
+        is first removed, which also succeeds for only one worker.
+        :return: True if this worker got the job
+        """
+        lease = _read_lease(self._path(LEASES_DIR, job_id))
+        if lease is not None:
+            if lease.expires > self._clock() or not self._remove_lease(job_id, lease):
+                return False
+            logger.warning(f"Lease of worker '{lease.worker_id}' on job '{job_id}' expired, claiming the job again.")
+        return self._create_lease(job_id)
+
+    def renew(self, job_id: str) -> bool:
+        """
+        Extends the lease on the job by moving the modification time of the lease file forward. The file
+        is never replaced, so a lease taken over by another worker meanwhile can only get a later expiry time;
+        the check after the update detects the loss.
+        :return: False if the lease was taken over by another worker
+        """
+        lease_path = self._path(LEASES_DIR, job_id)
+        if not self._is_own_lease(_read_lease(lease_path), job_id):
+            return False
+        expires = self._clock() + self._lease_timeout
+        try:
+            os.utime(lease_path, (expires, expires))
+        except FileNotFoundError:
+            return False
+        return self._is_own_lease(_read_lease(lease_path), job_id)
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        """Saves the result of the job and releases the lease."""
+        _write_json_atomically(self._path(DONE_DIR, job_id), {**result, "worker_id": self._worker_id})
+        self.release(job_id)
+
+    def release(self, job_id: str) -> None:
+        """Removes the lease on the job, if it's held by this worker."""
+        lease = _read_lease(self._path(LEASES_DIR, job_id))
+        if lease is not None and self._is_own_lease(lease, job_id):
+            self._remove_lease(job_id, lease)
+        self._claims.pop(job_id, None)
+
+
+def create_jobs(
+    graph: Dict[str, ChartNode], root_dir: str, get_expected_duration: Callable[[str], float]
+) -> List[QueueJob]:
+    """
+    Creates jobs for all the charts of a dependency graph.
+    :param graph: the graph of charts in the monorepo
+    :param root_dir: root directory of the monorepo; paths of charts in jobs are relative to it
+    :param get_expected_duration: returns the expected build duration of a chart directory
+    """
+    jobs: List[QueueJob] = []
+    for chart_dir, node in sorted(graph.items()):
+        chart_path = os.path.relpath(chart_dir, root_dir)
+        dependencies = {
+            name: get_job_id(os.path.relpath(dependency_dir, root_dir))
+            for name, dependency_dir in node.dependencies.items()
+        }
+        jobs.append(QueueJob(get_job_id(chart_path), chart_path, dependencies, get_expected_duration(chart_dir)))
+    return jobs
+
+
+class QueueWorker:
+    """
+    Claims and builds jobs from the queue until all the jobs are done. Charts depending on a chart that
+    failed to build are not built at all.
+    """
+
+    def __init__(
+        self,
+        queue: FileWorkQueue,
+        root_dir: str,
+        build_chart: Callable[[str, Dict[str, str]], ChartBuildResult],
+        poll_interval: float = 2.0,
+        renew_interval: Optional[float] = None,
+    ):
+        """
+        :param queue: the queue to take jobs from
+        :param root_dir: local path of the monorepo root
+        :param build_chart: called with the chart's directory and a map of names of the chart's dependencies
+        to paths of their archives; returns the result of the build
+        :param poll_interval: seconds to wait when no job is ready to build
+        :param renew_interval: seconds between renewals of the lease of the job being built
+        """
+        self._queue = queue
+        self._root_dir = root_dir
+        self._build_chart = build_chart
+        self._poll_interval = poll_interval
+        self._renew_interval = renew_interval if renew_interval is not None else queue.lease_timeout / 3
+
+    def _get_ready_jobs(self, jobs: Dict[str, QueueJob], results: Dict[str, Dict[str, Any]]) -> List[QueueJob]:
+        ready = [
+            job
+            for job in jobs.values()
+            if job.job_id not in results and all(d in results for d in job.dependencies.values())
+        ]
+        return sorted(ready, key=lambda j: (-j.expected_duration, j.chart_path))
+
+    def _claim_next(self, jobs: Dict[str, QueueJob], results: Dict[str, Dict[str, Any]]) -> Optional[QueueJob]:
+        for job in self._get_ready_jobs(jobs, results):
+            if not self._queue.claim(job.job_id):
+                continue
+            # the job could have been completed by another worker since the results were read
+            if self._queue.get_result(job.job_id) is not None:
+                self._queue.release(job.job_id)
+                continue
+            return job
+        return None
+
+    def _build_with_lease(self, job: QueueJob, prebuilt_subcharts: Dict[str, str]) -> Optional[ChartBuildResult]:
+        """
+        Builds the chart while renewing the lease on its job.
+        :return: the result, or None if the lease was lost and the job belongs to another worker now
+        """
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def renew_lease() -> None:
+            while not stop.wait(self._renew_interval):
+                if not self._queue.renew(job.job_id):
+                    lost.set()
+                    return
+
+        renewer = threading.Thread(target=renew_lease, name="lease-renewer", daemon=True)
+        renewer.start()
+        chart_dir = os.path.join(self._root_dir, job.chart_path)
+        try:
+            result = self._build_chart(chart_dir, prebuilt_subcharts)
+        except Exception as e:
+            logger.exception(f"Unexpected error when building chart '{chart_dir}'.")
+            result = ChartBuildResult(chart_dir, False, reason=f"unexpected error: {e}")
+        finally:
+            stop.set()
+            renewer.join()
+        if lost.is_set() or not self._queue.renew(job.job_id):
+            logger.warning(
+                f"Lease on the build of '{job.chart_path}' was taken over by another worker, discarding the build."
+            )
+            return None
+        return result
+
+    def _run_job(self, job: QueueJob, results: Dict[str, Dict[str, Any]]) -> None:
+        failed = sorted(d for d in job.dependencies.values() if not results[d]["succeeded"])
+        if failed:
+            reason = f"dependencies failed: {[results[d]['chart_path'] for d in failed]}"
+            self._queue.complete(job.job_id, {"chart_path": job.chart_path, "succeeded": False, "reason": reason})
+            return
+        prebuilt = {name: results[d]["archive"] for name, d in job.dependencies.items() if results[d]["archive"]}
+        logger.info(f"Worker '{self._queue.worker_id}' starts build of chart '{job.chart_path}'.")
+        result = self._build_with_lease(job, prebuilt)
+        if result is None:
+            self._queue.release(job.job_id)
+            return
+        self._queue.complete(
+            job.job_id,
+            {
+                "chart_path": job.chart_path,
+                "succeeded": result.succeeded,
+                "reason": result.reason,
+                # archives are saved in '--destination', which has to be shared by the workers
+                "archive": result.chart_path,
+            },
+        )
+
+    def run(self) -> Dict[str, ChartBuildResult]:
+        """
+        Builds jobs until all the jobs in the queue are done.
+        :return: results of all the jobs, including ones built by other workers, by chart directory
+        """
+        while True:
+            jobs = self._queue.get_jobs()
+            results: Dict[str, Dict[str, Any]] = {}
+            for job_id in jobs:
+                result = self._queue.get_result(job_id)
+                if result is not None:
+                    results[job_id] = result
+            if len(results) == len(jobs):
+                break
+            job = self._claim_next(jobs, results)
+            if job is None:
+                time.sleep(self._poll_interval)
+            else:
+                self._run_job(job, results)
+        return {
+            os.path.join(self._root_dir, job.chart_path): ChartBuildResult(
+                os.path.join(self._root_dir, job.chart_path),
+                results[job.job_id]["succeeded"],
+                results[job.job_id].get("archive"),
+                results[job.job_id].get("reason", ""),
+            )
+            for job in sorted(jobs.values(), key=lambda j: j.chart_path)
+        }
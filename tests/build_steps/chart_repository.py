@@ -0,0 +1,75 @@
+"""In-memory stand-in of a Helm chart repository, serving 'index.yaml' and chart archives over HTTP."""
+import hashlib
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import yaml
+
+
+class _RepositoryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def repository(self) -> "FakeChartRepository":
+        return self.server.repository  # type: ignore[attr-defined]
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        with self.repository.lock:
+            self.repository.requests[self.path] += 1
+            body = self.repository.files.get(self.path)
+        etag = f'"{hashlib.sha256(body).hexdigest()}"' if body is not None else ""
+        if body is not None and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            with self.repository.lock:
+                self.repository.not_modified += 1
+            body = b""
+        else:
+            self.send_response(200 if body is not None else 404)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+
+class FakeChartRepository:
+    def __init__(self) -> None:
+        self.files: Dict[str, bytes] = {}
+        self.entries: Dict[str, List[Dict[str, object]]] = {}
+        self.requests: Counter = Counter()
+        self.not_modified = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _RepositoryHandler)
+        self.server.repository = self  # type: ignore[attr-defined]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/charts"
+
+    def add_chart(self, name: str, version: str, content: bytes, digest: Optional[str] = None) -> None:
+        """Adds a chart archive and its index entry; 'digest' overrides the correct digest of 'content'."""
+        file_name = f"{name}-{version}.tgz"
+        self.files[f"/charts/{file_name}"] = content
+        self.entries.setdefault(name, []).append(
+            {
+                "name": name,
+                "version": version,
+                "urls": [file_name],
+                "digest": digest or hashlib.sha256(content).hexdigest(),
+            }
+        )
+        self.files["/charts/index.yaml"] = yaml.safe_dump({"apiVersion": "v1", "entries": self.entries}).encode()
+
+    def start(self) -> "FakeChartRepository":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
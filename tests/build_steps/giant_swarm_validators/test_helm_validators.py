@@ -4,8 +4,13 @@ import pytest
 from configargparse import Namespace
 from pytest_mock import MockerFixture
 
-from app_build_suite.build_steps.giant_swarm_validators.helm import HasValuesSchema, HasTeamLabel
-from app_build_suite.build_steps.helm import GiantSwarmHelmValidator
+from app_build_suite.build_steps.giant_swarm_validators.helm import (
+    HasValuesSchema,
+    HasTeamLabel,
+    HasTeamLabelOnObjects,
+)
+from app_build_suite.build_steps.helm import GiantSwarmHelmValidator, context_key_manifest_index
+from app_build_suite.build_steps.manifests import ManifestIndex
 from app_build_suite.build_steps.helm_consts import VALUES_SCHEMA_JSON, CHART_YAML, TEMPLATES_DIR, HELPERS_YAML
 from tests.build_steps.helpers import init_config_for_step
 
@@ -91,3 +96,36 @@ def test_has_team_label_validator(
     if mock_exists.call_count > 1:
         assert mock_exists.call_args_list[1].args[0] == os.path.join(config.chart_dir, TEMPLATES_DIR, HELPERS_YAML)
         assert mock_opens.call_args_list[1].args[0] == os.path.join(config.chart_dir, TEMPLATES_DIR, HELPERS_YAML)
+
+
+@pytest.mark.parametrize(
+    "service_labels,expected_result",
+    [
+        ("application.giantswarm.io/team: honeybadger", True),
+        ("app: hello-world-app", False),
+    ],
+)
+def test_has_team_label_on_objects_validator(
+    tmp_path: pytest.TempPathFactory, config: Namespace, service_labels: str, expected_result: bool
+) -> None:
+    config.chart_dir = str(tmp_path)
+    with open(os.path.join(config.chart_dir, CHART_YAML), "w") as f:
+        f.write("name: hello-world-app\n")
+    index = ManifestIndex()
+    index.add_rendered_text(
+        f"""---
+# Source: hello-world-app/templates/service.yaml
+kind: Service
+metadata:
+  name: hello
+  labels:
+    {service_labels}
+---
+# Source: hello-world-app/charts/upstream/templates/service.yaml
+kind: Service
+metadata:
+  name: upstream
+"""
+    )
+
+    assert HasTeamLabelOnObjects().validate_manifests(config, {context_key_manifest_index: index}) == expected_result
@@ -0,0 +1,102 @@
+"""In-memory stand-in of an OCI registry, implementing just enough of the distribution API for pushing."""
+import hashlib
+import threading
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+class _RegistryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def registry(self) -> "FakeRegistry":
+        return self.server.registry  # type: ignore[attr-defined]
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def _reply(self, status: int, headers: Optional[Dict[str, str]] = None, body: bytes = b"") -> None:
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _authorized(self) -> bool:
+        if self.registry.token is None or self.headers.get("Authorization") == f"Bearer {self.registry.token}":
+            return True
+        self._body()
+        realm = f"http://{self.headers['Host']}/token"
+        self._reply(401, {"WWW-Authenticate": f'Bearer realm="{realm}",service="fake"'})
+        return False
+
+    def _upload(self, path: str, query: str) -> None:
+        repo = path.split("/blobs/uploads/")[0]
+        data = self._body()
+        if self.command == "POST":
+            self._reply(202, {"Location": f"/v2/{repo}/blobs/uploads/{uuid.uuid4()}"})
+            return
+        digest = parse_qs(query)["digest"][0]
+        assert digest == f"sha256:{hashlib.sha256(data).hexdigest()}"
+        self.registry.blobs[(repo, digest)] = data
+        self._reply(201)
+
+    def _manifest(self, path: str) -> None:
+        repo, tag = path.split("/manifests/")
+        data = self._body()
+        self.registry.manifests[(repo, tag)] = data
+        self._reply(201, {"Docker-Content-Digest": f"sha256:{hashlib.sha256(data).hexdigest()}"})
+
+    def _route(self) -> None:
+        url = urlsplit(self.path)
+        with self.registry.lock:
+            self.registry.requests[self.command] += 1
+        if url.path == "/token":
+            self._reply(200, {"Content-Type": "application/json"}, f'{{"token": "{self.registry.token}"}}'.encode())
+            return
+        if not self._authorized():
+            return
+        path = url.path[len("/v2/") :]
+        if "/blobs/uploads/" in path:
+            self._upload(path, url.query)
+        elif "/blobs/" in path:
+            repo, digest = path.split("/blobs/")
+            self._reply(200 if (repo, digest) in self.registry.blobs else 404)
+        elif "/manifests/" in path:
+            self._manifest(path)
+        else:
+            self._reply(404)
+
+    do_GET = do_HEAD = do_POST = do_PUT = _route
+
+
+class FakeRegistry:
+    def __init__(self, token: Optional[str] = None) -> None:
+        self.blobs: Dict[Tuple[str, str], bytes] = {}
+        self.manifests: Dict[Tuple[str, str], bytes] = {}
+        self.requests: Counter = Counter()
+        self.token = token
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _RegistryHandler)
+        self.server.registry = self  # type: ignore[attr-defined]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "FakeRegistry":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,101 @@
+import json
+import threading
+from typing import List
+
+import pytest
+
+from app_build_suite.build_steps.context import (
+    BuildContext,
+    ContextConflictError,
+    context_key_changes_made,
+    context_key_chart_full_path,
+)
+
+
+def test_typed_attributes_share_values_with_keys() -> None:
+    context = BuildContext({context_key_chart_full_path: "/tmp/app-0.1.0.tgz"})
+
+    assert context.chart_full_path == "/tmp/app-0.1.0.tgz"
+    assert context.changes_made is False
+    assert context.injected_subcharts == []
+    context.chart_digest = "abc"
+    assert context["chart_digest"] == "abc"
+    assert json.loads(json.dumps(context)) == {
+        "chart_full_path": "/tmp/app-0.1.0.tgz",
+        "changes_made": False,
+        "injected_subcharts": [],
+        "chart_digest": "abc",
+    }
+    assert not hasattr(context, "__dict__")
+
+
+def test_changes_of_mutable_defaults_persist() -> None:
+    context = BuildContext()
+
+    context.staged_dirs.append("/tmp/staged")
+    context.replaced_subcharts["/tmp/lib.tgz.bak"] = "/tmp/lib.tgz"
+
+    assert context.staged_dirs == ["/tmp/staged"]
+    assert context["replaced_subcharts"] == {"/tmp/lib.tgz.bak": "/tmp/lib.tgz"}
+
+
+def test_snapshots_of_concurrent_steps_are_merged() -> None:
+    context = BuildContext({"shared": "base"})
+    snapshots = [context.snapshot() for _ in range(4)]
+    barrier = threading.Barrier(len(snapshots))
+
+    def step(index: int) -> None:
+        snapshot = snapshots[index]
+        barrier.wait()
+        snapshot[f"result_{index}"] = index
+        # both HelmGitVersionSetter and HelmChartMetadataPreparer write this key
+        snapshot.changes_made = index % 2 == 1
+        snapshot["shared"] = "changed"
+
+    threads = [threading.Thread(target=step, args=(i,)) for i in range(len(snapshots))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for index, snapshot in enumerate(snapshots):
+        context.merge(snapshot, f"step-{index}")
+
+    assert {k: context[k] for k in ["result_0", "result_3", "shared", context_key_changes_made]} == {
+        "result_0": 0,
+        "result_3": 3,
+        "shared": "changed",
+        context_key_changes_made: True,
+    }
+
+
+def test_conflicting_changes_are_detected() -> None:
+    context = BuildContext()
+    first, second = context.snapshot(), context.snapshot()
+    first[context_key_chart_full_path] = "/tmp/a.tgz"
+    second[context_key_chart_full_path] = "/tmp/b.tgz"
+    second["other"] = True
+    context.merge(first, "first")
+
+    with pytest.raises(ContextConflictError) as e:
+        context.merge(second, "second")
+
+    keys: List[str] = e.value.keys
+    assert keys == [context_key_chart_full_path]
+    assert context.chart_full_path == "/tmp/a.tgz"
+    assert "other" not in context
+
+
+def test_snapshots_copy_mutable_values() -> None:
+    context = BuildContext()
+    context.staged_dirs.append("/tmp/first")
+    snapshot = context.snapshot()
+    # reading a missing key only stores its default, which is not a change
+    assert snapshot.chart_full_path is None
+
+    snapshot.staged_dirs.append("/tmp/second")
+    context.chart_full_path = "/tmp/app-0.1.0.tgz"
+    assert context.staged_dirs == ["/tmp/first"]
+    context.merge(snapshot, "snapshot")
+
+    assert context.staged_dirs == ["/tmp/first", "/tmp/second"]
+    assert context.chart_full_path == "/tmp/app-0.1.0.tgz"
@@ -0,0 +1,127 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List
+
+import pytest
+import yaml
+
+from app_build_suite.build_steps.dependencies import DependencyError, NativeDependencyResolver
+from app_build_suite.build_steps.helm import HelmRequirementsUpdater
+from app_build_suite.errors import BuildError
+from app_build_suite.utils.http import HttpConnectionPool
+from tests.build_steps.chart_repository import FakeChartRepository
+from tests.build_steps.helpers import init_config_for_step
+
+
+@pytest.fixture
+def repository() -> Iterator[FakeChartRepository]:
+    repo = FakeChartRepository().start()
+    yield repo
+    repo.stop()
+
+
+def make_chart(chart_dir: str, repository: str, dependencies: Dict[str, str]) -> None:
+    os.makedirs(chart_dir)
+    deps: List[Dict[str, Any]] = [
+        {"name": name, "version": f"~{version}", "repository": repository} for name, version in dependencies.items()
+    ]
+    with open(os.path.join(chart_dir, "Chart.yaml"), "w") as f:
+        yaml.safe_dump({"apiVersion": "v2", "name": os.path.basename(chart_dir), "dependencies": deps}, f)
+    locked = [{"name": name, "version": version, "repository": repository} for name, version in dependencies.items()]
+    with open(os.path.join(chart_dir, "Chart.lock"), "w") as f:
+        yaml.safe_dump({"dependencies": locked, "digest": "sha256:0"}, f)
+
+
+def test_locked_dependencies_are_downloaded_and_index_fetched_once(
+    repository: FakeChartRepository, tmp_path: pytest.TempPathFactory
+) -> None:
+    repository.add_chart("redis", "1.0.0", b"old redis")
+    repository.add_chart("redis", "1.2.0", b"redis")
+    repository.add_chart("nginx", "3.0.0", b"nginx")
+    chart_dirs = [os.path.join(str(tmp_path), name) for name in ["app-a", "app-b"]]
+    for chart_dir in chart_dirs:
+        make_chart(chart_dir, repository.url, {"redis": "1.2.0", "nginx": "3.0.0"})
+    pool = HttpConnectionPool()
+    resolver = NativeDependencyResolver(pool)
+
+    def resolve(chart_dir: str) -> List[str]:
+        with open(os.path.join(chart_dir, "Chart.yaml")) as f:
+            dependencies = yaml.safe_load(f)["dependencies"]
+        return resolver.download(resolver.resolve(chart_dir, dependencies), os.path.join(chart_dir, "charts"))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        downloaded = list(executor.map(resolve, chart_dirs))
+
+    assert [sorted(os.path.basename(p) for p in paths) for paths in downloaded] == [
+        ["nginx-3.0.0.tgz", "redis-1.2.0.tgz"]
+    ] * 2
+    with open(os.path.join(chart_dirs[0], "charts", "redis-1.2.0.tgz"), "rb") as f:
+        assert f.read() == b"redis"
+    assert repository.requests["/charts/index.yaml"] == 1
+    assert pool.connections_created <= 4
+
+
+def test_archive_with_wrong_digest_is_rejected(
+    repository: FakeChartRepository, tmp_path: pytest.TempPathFactory
+) -> None:
+    repository.add_chart("redis", "1.2.0", b"tampered", digest="0" * 64)
+    chart_dir = os.path.join(str(tmp_path), "app")
+    make_chart(chart_dir, repository.url, {"redis": "1.2.0"})
+    resolver = NativeDependencyResolver()
+    resolved = resolver.resolve(chart_dir, [{"name": "redis", "repository": repository.url}])
+
+    with pytest.raises(DependencyError, match="Digest of"):
+        resolver.download(resolved, os.path.join(chart_dir, "charts"))
+    assert os.listdir(os.path.join(chart_dir, "charts")) == []
+
+
+def test_updater_fails_when_lock_file_is_out_of_date(
+    repository: FakeChartRepository, tmp_path: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    repository.add_chart("redis", "1.2.0", b"redis")
+    chart_dir = os.path.join(str(tmp_path), "app")
+    make_chart(chart_dir, repository.url, {"redis": "1.2.0"})
+    with open(os.path.join(chart_dir, "Chart.yaml")) as f:
+        chart_yaml = yaml.safe_load(f)
+    chart_yaml["dependencies"].append({"name": "nginx", "version": "3.0.0", "repository": repository.url})
+    with open(os.path.join(chart_dir, "Chart.yaml"), "w") as f:
+        yaml.safe_dump(chart_yaml, f)
+    monkeypatch.setattr(HelmRequirementsUpdater, "_native_resolvers", {})
+    updater = HelmRequirementsUpdater()
+    config = init_config_for_step(updater)
+    config.chart_dir = chart_dir
+    config.replace_chart_version_with_git = True
+    config.dependency_resolver = "native"
+    config.index_cache_dir = ""
+
+    with pytest.raises(BuildError, match="'nginx' .* not pinned in the lock file"):
+        updater.run(config, {})
+
+
+def test_outdated_archives_of_dependencies_are_removed(
+    repository: FakeChartRepository, tmp_path: pytest.TempPathFactory
+) -> None:
+    repository.add_chart("redis", "1.2.0", b"redis")
+    chart_dir = os.path.join(str(tmp_path), "app")
+    make_chart(chart_dir, repository.url, {"redis": "1.2.0"})
+    charts_dir = os.path.join(chart_dir, "charts")
+    os.mkdir(charts_dir)
+    for file_name in ["redis-1.0.0.tgz", "redis-ha-1.0.0.tgz"]:
+        open(os.path.join(charts_dir, file_name), "w").close()
+    resolver = NativeDependencyResolver()
+
+    resolver.download(resolver.resolve(chart_dir, [{"name": "redis", "repository": repository.url}]), charts_dir)
+
+    assert sorted(os.listdir(charts_dir)) == ["redis-1.2.0.tgz", "redis-ha-1.0.0.tgz"]
+
+
+def test_invalid_index_is_reported_as_dependency_error(
+    repository: FakeChartRepository, tmp_path: pytest.TempPathFactory
+) -> None:
+    repository.add_chart("redis", "1.2.0", b"redis")
+    repository.files["/charts/index.yaml"] = b"entries: [unclosed"
+    chart_dir = os.path.join(str(tmp_path), "app")
+    make_chart(chart_dir, repository.url, {"redis": "1.2.0"})
+
+    with pytest.raises(DependencyError, match="Can't parse"):
+        NativeDependencyResolver().resolve(chart_dir, [{"name": "redis", "repository": repository.url}])
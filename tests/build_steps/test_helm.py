@@ -1,33 +1,67 @@
 import argparse
 import os.path
 import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
-from unittest.mock import mock_open, patch
+from unittest.mock import call, mock_open, patch
 
 import yaml
 import pytest
 from pytest_mock import MockerFixture
 from step_exec_lib.errors import ValidationError
 
+from app_build_suite.errors import BuildError
+
 import app_build_suite
+from app_build_suite.build_steps import native_lint
+from app_build_suite.build_steps.context import BuildContext
+from app_build_suite.build_steps.steps import STEP_VALIDATE
 from app_build_suite.build_steps.helm import (
+    HelmBuildFilteringPipeline,
+    HelmChartBuilder,
     HelmChartMetadataFinalizer,
     HelmChartMetadataPreparer,
+    HelmChartOciPublisher,
+    HelmChartStager,
+    HelmChartTemplateRenderer,
+    HelmChartToolLinter,
+    HelmChartYAMLRestorer,
+    HelmGitVersionSetter,
+    HelmRequirementsUpdater,
     context_key_chart_file_name,
     context_key_chart_full_path,
     context_key_meta_dir_path,
     context_key_git_version,
     context_key_changes_made,
+    context_key_chart_digest,
+    context_key_package_dir,
+    context_key_prebuilt_subcharts,
+    context_key_rendered_manifests,
+    context_key_staged_chart_dir,
+    context_key_staged_dirs,
     GiantSwarmHelmValidator,
+    KubeLinter,
+    RenderedManifests,
+    get_helm_version,
+    stage_chart,
 )
-from tests.build_steps.helpers import init_config_for_step
+from tests.build_steps.helpers import get_test_config_parser, init_config_for_step
 
 
-def test_prepare_metadata(monkeypatch: pytest.MonkeyPatch) -> None:
+@pytest.mark.parametrize("modify_chart_in_place", [False, True])
+def test_prepare_metadata(monkeypatch: pytest.MonkeyPatch, modify_chart_in_place: bool) -> None:
     input_chart_path = os.path.join(os.path.dirname(__file__), "res_test_helm/Chart.yaml")
     step = HelmChartMetadataPreparer()
     config = init_config_for_step(step)
     config.generate_metadata = True
+    config.modify_chart_in_place = modify_chart_in_place
+    config.keep_chart_changes = False
+    config.speculative_packaging = False
     config.catalog_base_url = "https://some-bogus-catalog/"
     config.chart_dir = os.path.dirname(input_chart_path)
     config.destination = "."
@@ -55,6 +89,9 @@ def test_prepare_metadata(monkeypatch: pytest.MonkeyPatch) -> None:
         }
 
         def monkey_write_chart_yaml(_: str, chart_yaml_file_name: str, data: Dict[str, Any]) -> None:
+            # by default, the chart's Chart.yaml is not changed, annotations are added to a staged copy
+            assert (chart_yaml_file_name == input_chart_path) == modify_chart_in_place
+            assert data["version"] == git_version
             annotation_base_url = f"{config.catalog_base_url}hello-world-app-{git_version}.tgz-meta/"
             assert data["annotations"]["application.giantswarm.io/metadata"] == f"{annotation_base_url}main.yaml"
             assert (
@@ -69,7 +106,48 @@ def test_prepare_metadata(monkeypatch: pytest.MonkeyPatch) -> None:
         )
 
         step.run(config, context)
-        m.assert_called_once_with(input_chart_path, "r")
+        # the chart's Chart.yaml is read once; the staged copy's one is only read to fix 'file://' dependencies
+        staged_dir = context.get(context_key_package_dir)
+        expected_calls = [call(input_chart_path, "r")]
+        if staged_dir is not None:
+            expected_calls.append(call(os.path.join(staged_dir, "Chart.yaml"), "r"))
+        assert [c for c in m.call_args_list if c.args] == expected_calls
+    assert (staged_dir is None) == modify_chart_in_place
+    HelmChartBuilder().cleanup(config, context, False)
+    assert staged_dir is None or not os.path.exists(staged_dir)
+
+
+def test_speculative_packaging_keeps_chart_unmodified_until_finalized(tmp_path: pytest.TempPathFactory) -> None:
+    chart_dir = os.path.join(str(tmp_path), "hello")
+    os.mkdir(chart_dir)
+    chart_yaml_path = os.path.join(chart_dir, "Chart.yaml")
+    with open(chart_yaml_path, "w") as f:
+        yaml.dump({"apiVersion": "v2", "name": "hello", "version": "0.1.0"}, f)
+    preparer = HelmChartMetadataPreparer()
+    finalizer = HelmChartMetadataFinalizer()
+    config = init_config_for_step(preparer)
+    config.generate_metadata = True
+    config.modify_chart_in_place = True
+    config.keep_chart_changes = False
+    config.speculative_packaging = True
+    config.precompress_metadata = ""
+    config.catalog_base_url = "https://some-bogus-catalog/"
+    config.chart_dir = chart_dir
+    config.destination = str(tmp_path)
+    context: Dict[str, Any] = {context_key_chart_digest: "abc"}
+
+    preparer.run(config, context)
+    # the checks run after the preparer with '--speculative-packaging', so they must see the original file
+    with open(chart_yaml_path) as f:
+        assert "annotations" not in yaml.safe_load(f)
+    with open(os.path.join(context[context_key_package_dir], "Chart.yaml")) as f:
+        assert "annotations" in yaml.safe_load(f)
+
+    finalizer.run(config, context)
+    with open(chart_yaml_path) as f:
+        assert "annotations" in yaml.safe_load(f)
+    assert os.path.isfile(chart_yaml_path + ".back")
+    HelmChartBuilder().cleanup(config, context, False)
 
 
 def test_generate_metadata(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -77,6 +155,9 @@ def test_generate_metadata(monkeypatch: pytest.MonkeyPatch) -> None:
     step = HelmChartMetadataFinalizer()
     config = init_config_for_step(step)
     config.generate_metadata = True
+    config.precompress_metadata = ""
+    config.modify_chart_in_place = False
+    config.keep_chart_changes = False
     config.chart_dir = os.path.dirname(input_chart_path)
 
     with open(input_chart_path) as f:
@@ -118,6 +199,289 @@ def test_generate_metadata(monkeypatch: pytest.MonkeyPatch) -> None:
         m.assert_called_with(input_chart_path, "r")
 
 
+class FakeRepoInfo:
+    def get_git_version(self) -> str:
+        return "0.2.0-abc"
+
+
+def test_git_versions_are_set_in_staged_copy_of_chart(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pytest.TempPathFactory
+) -> None:
+    chart_dir = os.path.join(str(tmp_path), "chart")
+    os.makedirs(chart_dir)
+    with open(os.path.join(chart_dir, "Chart.yaml"), "w") as f:
+        f.write("name: hello\nversion: 0.1.0\nappVersion: 0.1.0\ndependencies:\n- repository: file://../lib\n")
+    commands: List[List[str]] = []
+    rendered_chart_yaml: List[str] = []
+
+    def fake_run_and_log(args: List[str], **_: Any) -> subprocess.CompletedProcess:
+        commands.append(args)
+        if args[1] == "template":
+            with open(os.path.join(args[2], "Chart.yaml")) as f:
+                rendered_chart_yaml.append(f.read())
+            return subprocess.CompletedProcess(args, 0, "kind: Deployment", "")
+        chart_path = os.path.join(args[4], "hello-0.2.0-abc.tgz")
+        return subprocess.CompletedProcess(args, 0, f"Successfully packaged chart and saved it to: {chart_path}", "")
+
+    monkeypatch.setattr("app_build_suite.build_steps.helm.run_and_log", fake_run_and_log)
+    setter, stager, renderer, builder = (
+        HelmGitVersionSetter(),
+        HelmChartStager(),
+        HelmChartTemplateRenderer(),
+        HelmChartBuilder(),
+    )
+    config_parser = get_test_config_parser()
+    for step in [setter, renderer, builder, HelmChartYAMLRestorer()]:
+        step.initialize_config(config_parser)
+    config = config_parser.parse_args(["--replace-chart-version-with-git", "--replace-app-version-with-git"])
+    config.chart_dir = chart_dir
+    config.destination = str(tmp_path)
+    config.lint_engine = "ct"
+    config.disable_giantswarm_helm_validator = False
+    setter.repo_info = FakeRepoInfo()  # type: ignore[assignment]
+    context: Dict[str, Any] = {}
+
+    for step in [setter, stager, renderer, builder]:
+        step.run(config, context)
+
+    staged_dir = context[context_key_staged_chart_dir]
+    # the staged copy is outside of the source tree, so relative 'file://' dependencies are made absolute
+    assert os.path.dirname(staged_dir) == tempfile.gettempdir()
+    assert commands[0][:3] == ["helm", "template", staged_dir]
+    assert rendered_chart_yaml == [
+        "name: hello\nversion: 0.2.0-abc\nappVersion: 0.2.0-abc\ndependencies:\n"
+        f"- repository: file://{os.path.join(str(tmp_path), 'lib')}\n"
+    ]
+    # only the versions changed, so the chart itself is packaged
+    assert commands[1][:3] == ["helm", "package", chart_dir]
+    assert commands[1][5:] == ["--version", "0.2.0-abc", "--app-version", "0.2.0-abc"]
+    assert context[context_key_chart_file_name] == "hello-0.2.0-abc.tgz"
+    assert not context[context_key_changes_made]
+    renderer.cleanup(config, context, False)
+    builder.cleanup(config, context, False)
+    assert not os.path.exists(staged_dir)
+    assert os.listdir(str(tmp_path)) == ["chart"]
+    assert os.listdir(chart_dir) == ["Chart.yaml"]
+    with open(os.path.join(chart_dir, "Chart.yaml")) as f:
+        assert "version: 0.1.0" in f.read()
+
+
+def test_keeping_chart_changes_modifies_chart_in_place(tmp_path: pytest.TempPathFactory) -> None:
+    chart_dir = str(tmp_path)
+    with open(os.path.join(chart_dir, "Chart.yaml"), "w") as f:
+        f.write("name: hello\nversion: 0.1.0\n")
+    setter, stager = HelmGitVersionSetter(), HelmChartStager()
+    config_parser = get_test_config_parser()
+    setter.initialize_config(config_parser)
+    HelmChartYAMLRestorer().initialize_config(config_parser)
+    config = config_parser.parse_args(["--replace-chart-version-with-git", "--keep-chart-changes"])
+    config.chart_dir = chart_dir
+    setter.repo_info = FakeRepoInfo()  # type: ignore[assignment]
+    context: Dict[str, Any] = {}
+
+    setter.run(config, context)
+    stager.run(config, context)
+
+    assert "modified in place" in str(stager.get_skip_reason(config))
+    assert context_key_staged_chart_dir not in context
+    with open(os.path.join(chart_dir, "Chart.yaml")) as f:
+        assert f.read() == "name: hello\nversion: 0.2.0-abc\n"
+
+
+def test_speculative_packaging_moves_packaging_before_linters() -> None:
+    pipeline = HelmBuildFilteringPipeline()
+    config_parser = get_test_config_parser()
+    pipeline.initialize_config(config_parser)
+
+    default_order = [s.name for s in pipeline.get_steps(config_parser.parse_args([]))]
+    speculative_order = [s.name for s in pipeline.get_steps(config_parser.parse_args(["--speculative-packaging"]))]
+
+    assert default_order.index("HelmChartToolLinter") < default_order.index("HelmChartMetadataPreparer")
+    assert speculative_order.index("HelmChartMetadataPreparer") < speculative_order.index("HelmChartToolLinter")
+    assert speculative_order.index("HelmChartSpeculativePackager") < speculative_order.index("HelmChartToolLinter")
+    assert speculative_order.index("KubeLinter") < speculative_order.index("HelmChartBuilder")
+    assert sorted(default_order) == sorted(speculative_order)
+
+
+def fake_package(
+    _: HelmChartBuilder, __: argparse.Namespace, destination: str, chart_dir: str, version_overrides: Dict[str, str]
+) -> str:
+    chart_path = os.path.abspath(os.path.join(destination, "hello-world-app-0.1.0.tgz"))
+    with open(chart_path, "wb") as f:
+        f.write(b"chart")
+    return chart_path
+
+
+def test_speculative_build_is_committed_by_run(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pytest.TempPathFactory
+) -> None:
+    monkeypatch.setattr(HelmChartBuilder, "_package", fake_package)
+    step = HelmChartBuilder()
+    config = init_config_for_step(step)
+    config.destination = str(tmp_path)
+    context = BuildContext()
+
+    step.start_speculative_build(config, context)
+    assert not os.listdir(str(tmp_path))
+    step.run(config, context)
+    step.cleanup(config, context, False)
+
+    expected_path = os.path.join(str(tmp_path), "hello-world-app-0.1.0.tgz")
+    assert context[context_key_chart_full_path] == expected_path
+    assert context[context_key_chart_file_name] == "hello-world-app-0.1.0.tgz"
+    assert context[context_key_chart_digest] == "cc57fc1903e444cf6a726490b43b27ee9f87facc037f86872201847c565b45fb"
+    assert os.path.isfile(expected_path)
+
+
+def test_speculative_build_is_discarded_on_failure(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pytest.TempPathFactory
+) -> None:
+    monkeypatch.setattr(HelmChartBuilder, "_package", fake_package)
+    step = HelmChartBuilder()
+    config = init_config_for_step(step)
+    config.destination = str(tmp_path)
+    context = BuildContext()
+
+    step.start_speculative_build(config, context)
+    speculative_dir = step._speculative_dir
+    # a validation step failed, so 'run' is never called
+    step.cleanup(config, context, True)
+
+    assert speculative_dir is not None and not os.path.exists(speculative_dir)
+    assert not os.listdir(str(tmp_path))
+    assert context_key_chart_full_path not in context
+
+
+def test_staged_chart_is_removed_after_speculative_build_finishes(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pytest.TempPathFactory
+) -> None:
+    package_started = threading.Event()
+    packaged_dirs: List[bool] = []
+
+    def slow_package(_: HelmChartBuilder, __: argparse.Namespace, ___: str, chart_dir: str, ____: Any) -> str:
+        package_started.set()
+        time.sleep(0.2)
+        packaged_dirs.append(os.path.isdir(chart_dir))
+        return fake_package(_, __, ___, chart_dir, ____)
+
+    monkeypatch.setattr(HelmChartBuilder, "_package", slow_package)
+    step = HelmChartBuilder()
+    config = init_config_for_step(step)
+    config.chart_dir = str(tmp_path)
+    config.destination = str(tmp_path)
+    context = BuildContext()
+    staged_dir = stage_chart(str(tmp_path), context)
+    context[context_key_package_dir] = staged_dir
+
+    step.start_speculative_build(config, context)
+    package_started.wait()
+    # a validation step failed, so 'run' is never called
+    step.cleanup(config, context, True)
+
+    assert packaged_dirs == [True]
+    assert not os.path.exists(staged_dir)
+    assert context[context_key_staged_dirs] == []
+
+
+def test_prebuilt_subcharts_are_injected_and_removed(tmp_path: pytest.TempPathFactory) -> None:
+    chart_dir = os.path.join(str(tmp_path), "umbrella")
+    os.makedirs(os.path.join(chart_dir, "charts"))
+    with open(os.path.join(chart_dir, "Chart.yaml"), "w") as f:
+        yaml.dump({"name": "umbrella", "dependencies": [{"name": "lib", "repository": "file://../lib"}]}, f)
+    with open(os.path.join(chart_dir, "Chart.lock"), "w") as f:
+        f.write("dependencies: []\n")
+    lib_archive = os.path.join(str(tmp_path), "lib-0.2.0-abc.tgz")
+    with open(lib_archive, "wb") as f:
+        f.write(b"lib")
+    updater = HelmRequirementsUpdater()
+    restorer = HelmChartYAMLRestorer()
+    config = init_config_for_step(updater)
+    config.chart_dir = chart_dir
+    config.replace_chart_version_with_git = True
+    config.keep_chart_changes = False
+    context: Dict[str, Any] = {context_key_prebuilt_subcharts: {"lib": lib_archive}}
+
+    # all the dependencies are prebuilt, so 'helm dependencies update' is not executed
+    updater.run(config, context)
+    assert os.listdir(os.path.join(chart_dir, "charts")) == ["lib-0.2.0-abc.tgz"]
+
+    restorer.cleanup(config, context, False)
+    assert os.listdir(os.path.join(chart_dir, "charts")) == []
+
+
+def test_vendored_subchart_is_replaced_by_prebuilt_one(tmp_path: pytest.TempPathFactory) -> None:
+    chart_dir = os.path.join(str(tmp_path), "umbrella")
+    subcharts_dir = os.path.join(chart_dir, "charts")
+    os.makedirs(subcharts_dir)
+    with open(os.path.join(chart_dir, "Chart.yaml"), "w") as f:
+        yaml.dump({"name": "umbrella", "dependencies": [{"name": "lib", "repository": "file://../lib"}]}, f)
+    with open(os.path.join(subcharts_dir, "lib-0.1.0.tgz"), "wb") as f:
+        f.write(b"stale")
+    lib_archive = os.path.join(str(tmp_path), "lib-0.2.0-abc.tgz")
+    with open(lib_archive, "wb") as f:
+        f.write(b"lib")
+    updater = HelmRequirementsUpdater()
+    restorer = HelmChartYAMLRestorer()
+    config = init_config_for_step(updater)
+    config.chart_dir = chart_dir
+    config.replace_chart_version_with_git = False
+    config.keep_chart_changes = False
+    context: Dict[str, Any] = {context_key_prebuilt_subcharts: {"lib": lib_archive}}
+
+    updater.run(config, context)
+    assert os.listdir(subcharts_dir) == ["lib-0.2.0-abc.tgz"]
+
+    restorer.cleanup(config, context, False)
+    assert os.listdir(subcharts_dir) == ["lib-0.1.0.tgz"]
+    with open(os.path.join(subcharts_dir, "lib-0.1.0.tgz"), "rb") as f:
+        assert f.read() == b"stale"
+
+
+def test_native_lint_shards_report_failing_values_file(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pytest.TempPathFactory
+) -> None:
+    chart_dir = str(tmp_path)
+    os.mkdir(os.path.join(chart_dir, native_lint.CI_VALUES_DIR))
+    for name in ["a-values.yaml", "b-values.yaml", "c-values.yaml"]:
+        open(os.path.join(chart_dir, native_lint.CI_VALUES_DIR, name), "w").close()
+    commands: List[List[str]] = []
+
+    def fake_run_and_log(args: List[str], **_: Any) -> subprocess.CompletedProcess:
+        commands.append(args)
+        failed = args[1] == "template" and args[-1].endswith("b-values.yaml")
+        return subprocess.CompletedProcess(args, 1 if failed else 0, "ok", "render error" if failed else "")
+
+    monkeypatch.setattr("app_build_suite.build_steps.helm.run_and_log", fake_run_and_log)
+    monkeypatch.setattr(native_lint, "lint_chart_files", lambda _, __: [])
+    step = HelmChartToolLinter()
+    config = init_config_for_step(step)
+    config.chart_dir = chart_dir
+    config.lint_engine = "native"
+    config.lint_workers = 3
+    step._native_settings = native_lint.NativeLintSettings(None, None, False, False)
+
+    context = BuildContext()
+    with pytest.raises(BuildError, match=r"values files: ci/b-values.yaml\.$"):
+        step.run(config, context)
+    assert len(commands) == 6
+    assert sorted(context.lint_results) == ["ci/a-values.yaml", "ci/b-values.yaml", "ci/c-values.yaml"]
+
+
+def test_oci_password_is_read_from_file_or_env(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pytest.TempPathFactory
+) -> None:
+    step = HelmChartOciPublisher()
+    config = init_config_for_step(step)
+    monkeypatch.setenv("ABS_OCI_PASSWORD", "from-env")
+    assert step._read_password(config) == "from-env"
+
+    password_file = os.path.join(str(tmp_path), "password")
+    with open(password_file, "w") as f:
+        f.write("from-file\n")
+    config.oci_password_file = password_file
+    assert step._read_password(config) == "from-file"
+
+
 def test_format_timestamp_to_match_helms() -> None:
     ts_str = HelmChartMetadataFinalizer.get_build_timestamp()
     ts_regex = re.compile("^[0-9]{4}-(1[0-2]|0[1-9])-[0-3][0-9]T[0-2][0-9]:[0-5][0-9]:[0-5][0-9](.[0-9]+)?Z?$")
@@ -125,9 +489,10 @@ def test_format_timestamp_to_match_helms() -> None:
 
 
 class GiantSwarmTestValidator:
-    def __init__(self, valid: bool, check_code: str) -> None:
+    def __init__(self, valid: bool, check_code: str, warn_only: bool = False) -> None:
         self.check_code = check_code
         self.valid = valid
+        self.warn_only = warn_only
         self.validate_called = False
 
     def validate(self, config: argparse.Namespace) -> bool:
@@ -145,6 +510,7 @@ class GiantSwarmTestValidator:
         ([GiantSwarmTestValidator(False, "W1")], True, True, ""),
         ([GiantSwarmTestValidator(False, "W1")], False, True, "W1"),
         ([GiantSwarmTestValidator(False, "W1")], False, False, ""),
+        ([GiantSwarmTestValidator(False, "W1", warn_only=True)], False, True, ""),
         (
             [
                 GiantSwarmTestValidator(True, "W1"),
@@ -161,6 +527,7 @@ class GiantSwarmTestValidator:
         "single invalid",
         "failed in ignored",
         "failed in non-strict mode",
+        "failed warn-only check",
         "multiple with one invalid",
     ],
 )
@@ -192,3 +559,136 @@ def test_giant_swarm_validator(
         assert failed_regex.group(1) in expected_to_fail
 
     assert all(v.validate_called for v in validators)
+
+
+def test_giant_swarm_validators_are_loaded_concurrently_without_changing_sys_path() -> None:
+    original_path = list(sys.path)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        loaded = list(executor.map(lambda _: GiantSwarmHelmValidator()._load_giant_swarm_validators(), range(8)))
+
+    assert sys.path == original_path
+    codes = [sorted(v.get_check_code() for v in validators) for validators in loaded]
+    assert codes[0] == ["C0001", "F0001", "K0001"]
+    assert all(c == codes[0] for c in codes)
+
+
+def test_chart_is_rendered_once_per_values_file_for_all_checks(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pytest.TempPathFactory
+) -> None:
+    chart_dir = os.path.join(str(tmp_path), "chart")
+    os.makedirs(os.path.join(chart_dir, native_lint.CI_VALUES_DIR))
+    ci_values = os.path.join(chart_dir, native_lint.CI_VALUES_DIR, "ha-values.yaml")
+    open(ci_values, "w").close()
+    commands: List[List[str]] = []
+
+    def fake_run_and_log(args: List[str], **_: Any) -> subprocess.CompletedProcess:
+        commands.append(args)
+        return subprocess.CompletedProcess(args, 0, f"kind: Deployment # {args[-1]}", "")
+
+    monkeypatch.setattr("app_build_suite.build_steps.helm.run_and_log", fake_run_and_log)
+    renderer = HelmChartTemplateRenderer()
+    kube_linter = KubeLinter()
+    config = init_config_for_step(renderer)
+    config.chart_dir = chart_dir
+    config.kubelinter_config = None
+    config.kubelinter_batch_size = 1
+    config.lint_engine = "ct"
+    config.disable_giantswarm_helm_validator = False
+    context: Dict[str, Any] = {}
+
+    renderer.run(config, context)
+    kube_linter.run(config, context)
+    rendered = context[context_key_rendered_manifests]
+    render_dir = os.path.dirname(rendered[0].path)
+
+    assert [r.values_file for r in rendered] == [None, ci_values]
+    assert [os.path.basename(r.path) for r in rendered] == ["default.yaml", "ha-values.yaml"]
+    with open(rendered[1].path) as f:
+        assert f.read() == f"kind: Deployment # {ci_values}"
+    assert commands[-1][:3] == ["kube-linter", "lint", rendered[0].path]
+    renderer.cleanup(config, context, False)
+    assert not os.path.exists(render_dir)
+
+
+def test_charts_are_rendered_to_own_subdirectories_only_when_needed(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pytest.TempPathFactory
+) -> None:
+    commands: List[List[str]] = []
+
+    def fake_run_and_log(args: List[str], **_: Any) -> subprocess.CompletedProcess:
+        commands.append(args)
+        return subprocess.CompletedProcess(args, 0, "kind: Deployment", "")
+
+    monkeypatch.setattr("app_build_suite.build_steps.helm.run_and_log", fake_run_and_log)
+    renderer = HelmChartTemplateRenderer()
+    config = init_config_for_step(renderer)
+    config.render_dir = os.path.join(str(tmp_path), "rendered")
+    config.lint_engine = "ct"
+    config.disable_giantswarm_helm_validator = False
+    rendered_paths: List[str] = []
+    for chart in ["apps/hello", "libs/hello"]:
+        config.chart_dir = os.path.join(str(tmp_path), chart)
+        os.makedirs(config.chart_dir)
+        context: Dict[str, Any] = {}
+        renderer.run(config, context)
+        rendered_paths.append(context[context_key_rendered_manifests][0].path)
+
+    assert len(set(rendered_paths)) == 2
+    assert all(os.path.basename(os.path.dirname(p)).startswith("hello-") for p in rendered_paths)
+
+    # kube-linter is not requested, ct doesn't read rendered manifests and the Giant Swarm validator is disabled
+    config.steps = [STEP_VALIDATE]
+    config.disable_giantswarm_helm_validator = True
+    commands.clear()
+    context = {}
+    assert renderer.get_skip_reason(config) is not None
+    renderer.run(config, context)
+    assert commands == []
+    assert context_key_rendered_manifests not in context
+
+
+class ManifestTestValidator:
+    def __init__(self) -> None:
+        self.manifests: List[str] = []
+
+    def validate_manifests(self, config: argparse.Namespace, context: Dict[str, Any]) -> bool:
+        self.manifests = [r.path for r in context[context_key_rendered_manifests]]
+        return False
+
+    def get_check_code(self) -> str:
+        return "K9999"
+
+
+def test_giant_swarm_manifest_validators_run_in_build_stage(mocker: MockerFixture) -> None:
+    manifest_validator = ManifestTestValidator()
+    source_validator = GiantSwarmTestValidator(True, "W1")
+    step = GiantSwarmHelmValidator()
+    config = init_config_for_step(step)
+    mocker.patch.object(
+        step, "_load_giant_swarm_validators", mocker.Mock(return_value=[source_validator, manifest_validator])
+    )
+
+    step.pre_run(config)
+    assert source_validator.validate_called
+    assert manifest_validator.manifests == []
+
+    context = {context_key_rendered_manifests: [RenderedManifests(None, "/tmp/default.yaml")]}
+    with pytest.raises(ValidationError, match="K9999: ManifestTestValidator"):
+        step.run(config, context)
+    assert manifest_validator.manifests == ["/tmp/default.yaml"]
+
+
+def test_tool_versions_are_probed_once_per_binary(monkeypatch: pytest.MonkeyPatch) -> None:
+    commands: List[List[str]] = []
+
+    def fake_run_and_log(args: List[str], **_: Any) -> subprocess.CompletedProcess:
+        commands.append(args)
+        return subprocess.CompletedProcess(args, 0, 'version.BuildInfo{Version:"v3.8.1", GitCommit:"5cb9af4"}\n', "")
+
+    monkeypatch.setattr("app_build_suite.build_steps.helm.run_and_log", fake_run_and_log)
+    monkeypatch.setattr("app_build_suite.build_steps.helm._tool_versions", {})
+
+    assert get_helm_version("test", "sh") == "v3.8.1"
+    assert get_helm_version("test", "sh") == "v3.8.1"
+    assert commands == [["sh", "version"]]
@@ -0,0 +1,55 @@
+import datetime
+import os
+
+import pytest
+
+from app_build_suite.build_steps.dependencies import NativeDependencyResolver
+from app_build_suite.build_steps.index_cache import INDEX_FILE_SUFFIX, CompiledIndex, IndexCache, compile_index
+from tests.build_steps.chart_repository import FakeChartRepository
+
+
+def test_compiled_index_lookup(tmp_path: pytest.TempPathFactory) -> None:
+    path = os.path.join(str(tmp_path), "index.idx")
+    created = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    entries = {
+        name: [{"name": name, "version": "1.0.0", "created": created}, {"name": name, "version": "0.9.0"}]
+        for name in ["nginx", "redis", "ąść", "a", "zookeeper"]
+    }
+
+    compile_index(entries, path)
+    index = CompiledIndex(path)
+
+    assert len(index) == 5
+    for name in entries:
+        assert [e["version"] for e in index.get_entries(name)] == ["1.0.0", "0.9.0"]
+    assert index.get_entries("redis")[0]["created"] == str(created)
+    assert index.get_entries("missing") == []
+    index.close()
+
+
+def test_resolver_reuses_cached_index_when_not_modified(tmp_path: pytest.TempPathFactory) -> None:
+    repository = FakeChartRepository().start()
+    try:
+        repository.add_chart("redis", "1.2.0", b"redis")
+        cache_dir = os.path.join(str(tmp_path), "cache")
+        locked = [{"name": "redis", "repository": repository.url}]
+        chart_dir = str(tmp_path)
+        with open(os.path.join(chart_dir, "Chart.lock"), "w") as f:
+            f.write(f"dependencies:\n- name: redis\n  version: 1.2.0\n  repository: {repository.url}\n")
+
+        first = NativeDependencyResolver(index_cache=IndexCache(cache_dir)).resolve(chart_dir, locked)
+        assert any(f.endswith(INDEX_FILE_SUFFIX) for f in os.listdir(cache_dir))
+        # the repository answers with '304 Not Modified', so the compiled index is used
+        second = NativeDependencyResolver(index_cache=IndexCache(cache_dir)).resolve(chart_dir, locked)
+        assert second == first
+        assert repository.not_modified == 1
+
+        repository.add_chart("redis", "1.3.0", b"new redis")
+        with open(os.path.join(chart_dir, "Chart.lock"), "w") as f:
+            f.write(f"dependencies:\n- name: redis\n  version: 1.3.0\n  repository: {repository.url}\n")
+        third = NativeDependencyResolver(index_cache=IndexCache(cache_dir)).resolve(chart_dir, locked)
+        assert third[0].version == "1.3.0"
+        assert repository.not_modified == 1
+        assert repository.requests["/charts/index.yaml"] == 3
+    finally:
+        repository.stop()
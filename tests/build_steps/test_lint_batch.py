@@ -0,0 +1,114 @@
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+import pytest
+
+from app_build_suite.build_steps.helm import HelmChartToolLinter
+from app_build_suite.build_steps.lint_batch import (
+    BatchLintResult,
+    attribute_ct_output,
+    attribute_kube_linter_output,
+    lint_batch,
+)
+from app_build_suite.errors import BuildError
+from tests.build_steps.helpers import init_config_for_step
+
+CT_OUTPUT = """Linting charts...
+Version increment checking disabled.
+Linting chart "app-a => (version: \\"1.0.0\\", path: \\"/repo/app-a\\")"
+==> Linting /repo/app-a
+[ERROR] templates/: parse error
+Linting chart "app-b => (version: \\"0.1.0\\", path: \\"/repo/app-b\\")"
+==> Linting /repo/app-b
+1 chart(s) linted, 0 chart(s) failed
+------------------------------------------------------------------------------------------------------------------------
+ ✖︎ app-a => (version: "1.0.0", path: "/repo/app-a") > helm lint failed
+ ✔︎ app-b => (version: "0.1.0", path: "/repo/app-b")
+------------------------------------------------------------------------------------------------------------------------
+"""
+
+
+def test_ct_output_is_attributed_to_charts() -> None:
+    results = attribute_ct_output(CT_OUTPUT, ["/repo/app-a", "/repo/app-b", "/repo/app-c"])
+
+    assert set(results.keys()) == {"/repo/app-a", "/repo/app-b"}
+    assert results["/repo/app-a"].failed
+    assert "[ERROR] templates/: parse error" in results["/repo/app-a"].output
+    assert not results["/repo/app-b"].failed
+    assert all("app-a" not in line for line in results["/repo/app-b"].output)
+
+
+def test_kube_linter_failure_relints_charts_without_reports(tmp_path: pytest.TempPathFactory) -> None:
+    targets = [os.path.join(str(tmp_path), name) for name in ["a.yaml", "b.yaml"]]
+    for target in targets:
+        open(target, "w").close()
+    calls: List[List[str]] = []
+
+    def run_tool(batch: List[str]) -> subprocess.CompletedProcess:
+        calls.append(batch)
+        output = f"{targets[0]}: (object: <no namespace>/app apps/v1, Kind=Deployment) problem\n"
+        failed = targets[0] in batch
+        return subprocess.CompletedProcess(batch, 1 if failed else 0, output if failed else "", "")
+
+    results = lint_batch(targets, run_tool, attribute_kube_linter_output)
+
+    assert results[targets[0]].failed
+    assert results[targets[1]] == BatchLintResult(False, [])
+    assert calls == [targets, [targets[1]]]
+
+
+def test_ct_batch_lints_charts_of_parallel_builds_together(monkeypatch: pytest.MonkeyPatch) -> None:
+    commands: List[List[str]] = []
+    lock = threading.Lock()
+
+    def fake_run_and_log(args: List[str], **_: Any) -> subprocess.CompletedProcess:
+        with lock:
+            commands.append(args)
+        return subprocess.CompletedProcess(args, 1, CT_OUTPUT, "")
+
+    monkeypatch.setattr("app_build_suite.build_steps.helm.run_and_log", fake_run_and_log)
+    monkeypatch.setattr(HelmChartToolLinter, "_batchers", HelmChartToolLinter._batchers.__class__())
+
+    def lint(chart_dir: str) -> None:
+        step = HelmChartToolLinter()
+        config = init_config_for_step(step)
+        config.chart_dir = chart_dir
+        config.debug = False
+        config.ct_batch_size = 2
+        config.monorepo_root = "/repo"
+        config.jobs = 2
+        step.run(config, {})
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(lint, chart_dir) for chart_dir in ["/repo/app-a", "/repo/app-b"]]
+        with pytest.raises(BuildError, match="Linting failed"):
+            futures[0].result()
+        futures[1].result()
+    assert len(commands) == 1
+    assert commands[0][-1] in ["--charts=/repo/app-a,/repo/app-b", "--charts=/repo/app-b,/repo/app-a"]
+
+
+def test_single_chart_builds_are_not_batched(monkeypatch: pytest.MonkeyPatch) -> None:
+    commands: List[List[str]] = []
+
+    def fake_run_and_log(args: List[str], **_: Any) -> subprocess.CompletedProcess:
+        commands.append(args)
+        return subprocess.CompletedProcess(args, 0, "", "")
+
+    monkeypatch.setattr("app_build_suite.build_steps.helm.run_and_log", fake_run_and_log)
+    batchers = HelmChartToolLinter._batchers.__class__()
+    monkeypatch.setattr(HelmChartToolLinter, "_batchers", batchers)
+    step = HelmChartToolLinter()
+    config = init_config_for_step(step)
+    config.chart_dir = "/repo/app-a"
+    config.debug = False
+    config.ct_batch_size = 2
+    config.monorepo_root = ""
+    config.jobs = 1
+
+    step.run(config, {})
+    assert commands[0][-1] == "--charts=/repo/app-a"
+    assert not batchers._batchers
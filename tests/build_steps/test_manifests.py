@@ -0,0 +1,93 @@
+import os
+from typing import Any, Dict
+
+import pytest
+from step_exec_lib.errors import ValidationError
+
+from app_build_suite.build_steps.helm import RenderedManifests, context_key_rendered_manifests
+from app_build_suite.build_steps.manifests import ManifestIndex, ObjectKey, get_manifest_index
+
+RENDERED = """---
+# Source: app/templates/service.yaml
+apiVersion: v1
+kind: Service
+metadata:
+  name: app
+  labels:
+    application.giantswarm.io/team: honeybadger
+---
+# Source: app/templates/deployment.yaml
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: app
+  namespace: default
+  labels:
+    app: app
+spec:
+  template:
+    spec:
+      initContainers:
+        - name: init
+          image: busybox
+      containers:
+        - name: app
+          image: app:1.0.0
+---
+# Source: app/charts/redis/templates/cronjob.yaml
+apiVersion: batch/v1
+kind: CronJob
+metadata:
+  name: redis-backup
+spec:
+  jobTemplate:
+    spec:
+      template:
+        spec:
+          containers:
+            - name: backup
+              image: redis:6
+"""
+
+
+def test_index_lookups() -> None:
+    index = ManifestIndex()
+    index.add_rendered_text(RENDERED)
+
+    assert len(index) == 3
+    deployment = index.get("Deployment", "app", namespace="default", api_version="apps/v1")[0]
+    assert deployment.key == ObjectKey("Deployment", "apps/v1", "default", "app")
+    assert index.get("Deployment", "app") == []
+    assert [(c.owner.key.name, c.container["name"], c.is_init_container) for c in index.get_containers()] == [
+        ("app", "init", True),
+        ("app", "app", False),
+        ("redis-backup", "backup", False),
+    ]
+    assert [o.key.kind for o in index.get_by_label("application.giantswarm.io/team")] == ["Service"]
+    assert index.get_by_label("app", "other") == []
+    assert [o.template for o in index.get_from_chart_templates("app")] == [
+        "app/templates/service.yaml",
+        "app/templates/deployment.yaml",
+    ]
+
+
+def test_index_is_built_once_from_rendered_files(tmp_path: pytest.TempPathFactory) -> None:
+    rendered = []
+    for values_file in [None, "ci/ha-values.yaml"]:
+        path = os.path.join(str(tmp_path), os.path.basename(values_file or "default.yaml"))
+        with open(path, "w") as f:
+            f.write(RENDERED)
+        rendered.append(RenderedManifests(values_file, path))
+    context: Dict[str, Any] = {context_key_rendered_manifests: rendered}
+
+    index = get_manifest_index(context)
+
+    assert index is not None
+    assert get_manifest_index(context) is index
+    assert [o.values_file for o in index.get_by_kind("Service")] == [None, "ci/ha-values.yaml"]
+    assert get_manifest_index({}) is None
+
+
+def test_invalid_rendered_manifest_is_a_validation_error() -> None:
+    with pytest.raises(ValidationError, match="hello/templates/broken.yaml"):
+        ManifestIndex().add_rendered_text("---\n# Source: hello/templates/broken.yaml\nkind: [Service\n")
@@ -0,0 +1,98 @@
+import gzip
+import hashlib
+import json
+import os
+
+import pytest
+import yaml
+from step_exec_lib.errors import ValidationError
+
+from app_build_suite.build_steps.context import BuildContext, context_key_chart_digest
+from app_build_suite.build_steps.helm import HelmChartBuilder, HelmChartMetadataFinalizer, HelmChartMetadataPreparer
+from app_build_suite.build_steps.meta_files import write_file_variants
+from tests.build_steps.helpers import get_test_config_parser
+
+
+def sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_json_files_are_minified_and_compressed(tmp_path: pytest.TempPathFactory) -> None:
+    path = os.path.join(str(tmp_path), "values.schema.json")
+    with open(path, "w") as f:
+        json.dump({"type": "object", "properties": {"replicas": {"type": "integer"}}}, f, indent=4)
+
+    digests = write_file_variants(path, ["gzip"])
+
+    assert sorted(digests) == [
+        "values.schema.json",
+        "values.schema.json.gz",
+        "values.schema.min.json",
+        "values.schema.min.json.gz",
+    ]
+    with open(os.path.join(str(tmp_path), "values.schema.min.json")) as f:
+        assert f.read() == '{"type":"object","properties":{"replicas":{"type":"integer"}}}'
+    with gzip.open(f"{path}.gz", "rb") as f, open(path, "rb") as original:
+        assert f.read() == original.read()
+    assert all(digests[name] == sha256(os.path.join(str(tmp_path), name)) for name in digests)
+    # compressed files don't depend on the time they were written at
+    assert write_file_variants(path, ["gzip"]) == digests
+
+
+def test_metadata_steps_write_variants_and_digests(tmp_path: pytest.TempPathFactory) -> None:
+    chart_dir = os.path.join(str(tmp_path), "chart")
+    os.makedirs(chart_dir)
+    with open(os.path.join(chart_dir, "Chart.yaml"), "w") as f:
+        yaml.dump({"apiVersion": "v2", "name": "hello", "version": "0.1.0"}, f)
+    with open(os.path.join(chart_dir, "values.schema.json"), "w") as f:
+        json.dump({"type": "object"}, f, indent=2)
+    preparer, finalizer = HelmChartMetadataPreparer(), HelmChartMetadataFinalizer()
+    config_parser = get_test_config_parser()
+    preparer.initialize_config(config_parser)
+    config = config_parser.parse_known_args(
+        ["--generate-metadata", "--catalog-base-url", "https://example.com/", "--precompress-metadata", "gzip"]
+    )[0]
+    config.chart_dir = chart_dir
+    config.modify_chart_in_place = False
+    config.keep_chart_changes = False
+    config.speculative_packaging = False
+    config.destination = os.path.join(str(tmp_path), "build")
+    context = BuildContext({context_key_chart_digest: "123"})
+
+    preparer.pre_run(config)
+    preparer.run(config, context)
+    finalizer.run(config, context)
+    HelmChartBuilder().cleanup(config, context, False)
+
+    meta_dir = os.path.join(config.destination, "hello-0.1.0.tgz-meta")
+    assert sorted(os.listdir(meta_dir)) == [
+        "main.yaml",
+        "main.yaml.gz",
+        "values.schema.json",
+        "values.schema.json.gz",
+        "values.schema.min.json",
+        "values.schema.min.json.gz",
+    ]
+    with open(os.path.join(meta_dir, "main.yaml")) as f:
+        meta = yaml.safe_load(f)
+    assert meta["fileDigests"]["values.schema.min.json.gz"] == sha256(
+        os.path.join(meta_dir, "values.schema.min.json.gz")
+    )
+
+    config.precompress_metadata = "gzip,zstd"
+    with pytest.raises(ValidationError, match="Unknown encodings"):
+        preparer.pre_run(config)
+
+
+def test_brotli_variants(tmp_path: pytest.TempPathFactory) -> None:
+    brotli = pytest.importorskip("brotli")
+    path = os.path.join(str(tmp_path), "README.md")
+    with open(path, "w") as f:
+        f.write("# hello\n" * 100)
+
+    digests = write_file_variants(path, ["br"])
+
+    assert sorted(digests) == ["README.md", "README.md.br"]
+    with open(f"{path}.br", "rb") as f, open(path, "rb") as original:
+        assert brotli.decompress(f.read()) == original.read()
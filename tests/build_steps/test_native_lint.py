@@ -0,0 +1,66 @@
+import os
+from typing import Iterator
+
+import pytest
+
+from app_build_suite.build_steps import native_lint
+from app_build_suite.build_steps.helm_consts import CHART_YAML, VALUES_YAML
+
+pytest.importorskip("yamale")
+pytest.importorskip("yamllint")
+
+GS_SCHEMA_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "..", "resources", "ct_schemas", "gs_metadata_chart_schema.yaml"
+)
+LINT_CONF = """
+rules:
+  indentation:
+    spaces: 2
+  trailing-spaces: enable
+"""
+
+
+@pytest.fixture
+def chart_dir(tmp_path: pytest.TempPathFactory) -> Iterator[str]:
+    path = str(tmp_path)
+    with open(os.path.join(path, CHART_YAML), "w") as f:
+        f.write("apiVersion: v2\nname: test-chart\nversion: 0.1.0\ndescription: test\n")
+    with open(os.path.join(path, VALUES_YAML), "w") as f:
+        f.write("image:\n  tag: latest\n")
+    with open(os.path.join(path, "lintconf.yaml"), "w") as f:
+        f.write(LINT_CONF)
+    with open(os.path.join(path, "ct.yaml"), "w") as f:
+        f.write(f"lint-conf: {os.path.join(path, 'lintconf.yaml')}\n")
+    yield path
+
+
+def test_valid_chart_has_no_problems(chart_dir: str) -> None:
+    settings = native_lint.resolve_settings(os.path.join(chart_dir, "ct.yaml"), GS_SCHEMA_PATH)
+
+    assert settings.lint_conf_path == os.path.join(chart_dir, "lintconf.yaml")
+    assert native_lint.lint_chart_files(chart_dir, settings) == []
+
+
+def test_schema_and_yaml_problems_are_reported(chart_dir: str) -> None:
+    with open(os.path.join(chart_dir, CHART_YAML), "a") as f:
+        f.write("restrictions:\n  clusterSingleton: 'yes'\n")
+    os.mkdir(os.path.join(chart_dir, native_lint.CI_VALUES_DIR))
+    ci_values_path = os.path.join(chart_dir, native_lint.CI_VALUES_DIR, "test-values.yaml")
+    with open(ci_values_path, "w") as f:
+        f.write("image:\n   tag: latest   \n")
+    settings = native_lint.resolve_settings(os.path.join(chart_dir, "ct.yaml"), GS_SCHEMA_PATH)
+
+    problems = native_lint.lint_chart_files(chart_dir, settings)
+
+    assert any(p.is_error and p.file_path.endswith(CHART_YAML) and "clusterSingleton" in p.message for p in problems)
+    assert {p.file_path for p in problems if "trailing-spaces" in p.message} == {ci_values_path}
+    assert any("indentation" in p.message for p in problems)
+
+
+def test_schema_is_compiled_once(chart_dir: str) -> None:
+    native_lint.load_chart_schema.cache_clear()
+    settings = native_lint.resolve_settings(None, GS_SCHEMA_PATH)
+    for _ in range(3):
+        native_lint.lint_chart_files(chart_dir, settings._replace(validate_yaml=False))
+
+    assert native_lint.load_chart_schema.cache_info().misses == 1
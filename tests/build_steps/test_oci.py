@@ -0,0 +1,85 @@
+import io
+import json
+import os
+import tarfile
+from typing import Iterator, List
+
+import pytest
+
+from app_build_suite.build_steps.oci import (
+    ChartArtifact,
+    OciRegistryClient,
+    push_charts,
+    MEDIA_TYPE_HELM_CHART,
+    META_REPOSITORY_SUFFIX,
+)
+from app_build_suite.utils.http import HttpConnectionPool
+from tests.build_steps.oci_registry import FakeRegistry
+
+
+def make_chart(dest_dir: str, name: str, version: str) -> ChartArtifact:
+    chart_path = os.path.join(dest_dir, f"{name}-{version}.tgz")
+    chart_yaml = f"apiVersion: v2\nname: {name}\nversion: {version}\n".encode()
+    with tarfile.open(chart_path, "w:gz") as tar:
+        info = tarfile.TarInfo(f"{name}/Chart.yaml")
+        info.size = len(chart_yaml)
+        tar.addfile(info, io.BytesIO(chart_yaml))
+    meta_dir = f"{chart_path}-meta"
+    os.mkdir(meta_dir)
+    with open(os.path.join(meta_dir, "main.yaml"), "w") as f:
+        f.write(f"chartFile: {name}-{version}.tgz\n")
+    return ChartArtifact(chart_path, meta_dir)
+
+
+@pytest.fixture
+def registry() -> Iterator[FakeRegistry]:
+    reg = FakeRegistry().start()
+    yield reg
+    reg.stop()
+
+
+def test_push_chart_and_metadata(registry: FakeRegistry, tmp_path: pytest.TempPathFactory) -> None:
+    artifact = make_chart(str(tmp_path), "hello", "1.0.0+abc")
+    client = OciRegistryClient(f"{registry.url}/charts")
+
+    results = push_charts(client, [artifact], max_workers=2)
+
+    assert [r.reference.split("/", 1)[1] for r in results] == [
+        "charts/hello:1.0.0_abc",
+        f"charts/hello{META_REPOSITORY_SUFFIX}:1.0.0_abc",
+    ]
+    manifest = json.loads(registry.manifests[("charts/hello", "1.0.0_abc")])
+    assert manifest["layers"][0]["mediaType"] == MEDIA_TYPE_HELM_CHART
+    meta_manifest = json.loads(registry.manifests[(f"charts/hello{META_REPOSITORY_SUFFIX}", "1.0.0_abc")])
+    assert meta_manifest["layers"][0]["annotations"]["org.opencontainers.image.title"] == "main.yaml"
+
+
+def test_existing_blobs_are_not_uploaded_again(registry: FakeRegistry, tmp_path: pytest.TempPathFactory) -> None:
+    artifact = make_chart(str(tmp_path), "hello", "1.0.0")
+    client = OciRegistryClient(f"{registry.url}/charts")
+    first = push_charts(client, [artifact], max_workers=2)
+    puts_after_first = registry.requests["PUT"]
+
+    second = push_charts(client, [artifact], max_workers=2)
+
+    assert sum(r.blobs_uploaded for r in first) == 4
+    assert sum(r.blobs_uploaded for r in second) == 0
+    assert sum(r.blobs_skipped for r in second) == 4
+    # only the 2 manifests are uploaded again
+    assert registry.requests["PUT"] - puts_after_first == 2
+
+
+def test_concurrent_push_reuses_connections_and_authenticates(tmp_path: pytest.TempPathFactory) -> None:
+    registry = FakeRegistry(token="secret").start()
+    try:
+        artifacts: List[ChartArtifact] = [make_chart(str(tmp_path), f"chart{i}", "0.1.0") for i in range(6)]
+        pool = HttpConnectionPool()
+        client = OciRegistryClient(registry.url, "user", "pass", pool=pool)
+
+        results = push_charts(client, artifacts, max_workers=3)
+
+        assert len(results) == 12
+        assert len(registry.manifests) == 12
+        assert pool.connections_created <= 6
+    finally:
+        registry.stop()
@@ -0,0 +1,113 @@
+import io
+import os
+import tarfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import pytest
+import yaml
+
+from app_build_suite.build_steps.context import BuildContext, context_key_chart_full_path
+from app_build_suite.build_steps.helm import HelmChartPackageSizeAnalyzer
+from app_build_suite.build_steps import package_size
+from app_build_suite.build_steps.package_size import META_KEY_PACKAGE_SIZE, analyze_package
+from app_build_suite.catalog import parse_date_created
+from app_build_suite.errors import BuildError
+from tests.build_steps.helpers import init_config_for_step
+
+
+def write_package(destination: str, version: str, files: Dict[str, bytes], name: str = "hello") -> str:
+    chart_path = os.path.join(destination, f"{name}-{version}.tgz")
+    with tarfile.open(chart_path, "w:gz") as archive:
+        for path, data in files.items():
+            info = tarfile.TarInfo(f"hello/{path}")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return chart_path
+
+
+def write_meta(chart_path: str, created: str, archive_size: int) -> None:
+    os.makedirs(f"{chart_path}-meta")
+    with open(os.path.join(f"{chart_path}-meta", "main.yaml"), "w") as f:
+        yaml.dump({"dateCreated": created, META_KEY_PACKAGE_SIZE: {"archive": archive_size}}, f)
+
+
+def test_package_is_broken_down_by_path(tmp_path: pytest.TempPathFactory) -> None:
+    chart_path = write_package(
+        str(tmp_path),
+        "0.1.0",
+        {
+            "Chart.yaml": b"name: hello\n",
+            "Chart.yaml.back": b"name: hello\n",
+            "templates/deployment.yaml": b"x" * 300,
+            "templates/service.yaml": b"x" * 100,
+            "files/big.bin": b"x" * 1000,
+        },
+    )
+
+    report = analyze_package(chart_path, ["*.back"])
+
+    assert report.unpacked_size == 1424
+    assert report.files[0].path == "files/big.bin"
+    assert report.get_directory_sizes() == {"files": 1000, "templates": 400, ".": 24}
+    assert report.unwanted_files == ["Chart.yaml.back"]
+    assert report.to_metadata() == {"archive": os.path.getsize(chart_path), "unpacked": 1424, "files": 5}
+
+
+def test_regressions_against_previous_build_fail_when_enforced(tmp_path: pytest.TempPathFactory) -> None:
+    destination = str(tmp_path)
+    write_meta(write_package(destination, "0.1.0", {"Chart.yaml": b"name: hello\n"}), "2022-01-01T00:00:00", 10)
+    write_meta(write_package(destination, "0.2.0", {"Chart.yaml": b"name: hello\n"}), "2022-02-01T00:00:00", 100)
+    chart_path = write_package(destination, "0.3.0", {"Chart.yaml": b"name: hello\n", "big.bin": os.urandom(200)})
+    step = HelmChartPackageSizeAnalyzer()
+    config = init_config_for_step(step)
+    config.destination = destination
+    config.analyze_package_size = True
+    context = BuildContext({context_key_chart_full_path: chart_path})
+
+    # the previous build is the most recently created one, not the last version
+    step.run(config, context)
+    assert context.package_size.archive_size == os.path.getsize(chart_path)
+
+    config.package_size_enforce = True
+    with pytest.raises(BuildError, match="grew by .* from 100 bytes"):
+        step.run(config, context)
+    config.package_size_max_growth = 1000.0
+    step.run(config, context)
+    config.package_size_budget = 100
+    with pytest.raises(BuildError, match="exceeds the budget of 100 bytes"):
+        step.run(config, context)
+
+
+def test_only_metadata_of_the_chart_is_read(monkeypatch: pytest.MonkeyPatch, tmp_path: pytest.TempPathFactory) -> None:
+    destination = str(tmp_path)
+    write_meta(write_package(destination, "0.1.0", {"Chart.yaml": b"name: hello\n"}), "2022-01-01T00:00:00", 10)
+    for name in ["hello-extra", "world"]:
+        write_meta(write_package(destination, "0.1.0", {}, name), "2022-03-01T00:00:00", 1000)
+    read_files: List[str] = []
+    read_meta_file = package_size.read_meta_file
+
+    def recording_read_meta_file(path: str) -> Dict[str, Any]:
+        read_files.append(os.path.relpath(path, destination))
+        return read_meta_file(path)
+
+    monkeypatch.setattr(package_size, "read_meta_file", recording_read_meta_file)
+
+    assert package_size.get_previous_archive_size(destination, "hello-0.2.0.tgz") == 10
+    assert read_files == [os.path.join("hello-0.1.0.tgz-meta", "main.yaml")]
+
+
+def test_previous_build_is_found_with_mixed_date_formats(tmp_path: pytest.TempPathFactory) -> None:
+    destination = str(tmp_path)
+    write_meta(write_package(destination, "0.1.0", {}), "2022-03-01T00:00:00.123456789Z", 10)
+    write_meta(write_package(destination, "0.2.0", {}), "2022-03-01T01:00:00+02:00", 20)
+    write_meta(write_package(destination, "0.3.0", {}), "2022-02-01T00:00:00", 30)
+    aware = datetime(2022, 2, 15, tzinfo=timezone(timedelta(hours=-5)))
+    write_meta(write_package(destination, "0.4.0", {}), aware, 40)  # type: ignore[arg-type]
+    write_meta(write_package(destination, "0.5.0", {}), "not a date", 50)
+    # the metadata without a valid date falls back to its modification time, a naive UTC datetime
+    os.utime(os.path.join(destination, "hello-0.5.0.tgz-meta", "main.yaml"), (0, 0))
+
+    assert package_size.get_previous_archive_size(destination, "hello-0.6.0.tgz") == 10
+    assert parse_date_created("2022-03-01T03:00:00+02:00") == datetime(2022, 3, 1, 1)
+    assert parse_date_created(aware) == datetime(2022, 2, 15, 5)
@@ -0,0 +1,73 @@
+import argparse
+from typing import Callable, List, Set
+
+from step_exec_lib.steps import BuildStep
+from step_exec_lib.types import Context, StepType
+
+from app_build_suite.build_steps.pipeline import StepWrappingPipeline, STAGE_BUILD, STAGE_PRE_RUN
+from app_build_suite.build_steps.steps import STEP_BUILD, STEP_VALIDATE
+
+
+class RecordingStep(BuildStep):
+    def __init__(self, calls: List[str], step_type: StepType) -> None:
+        self._calls = calls
+        self._step_type = step_type
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {self._step_type}
+
+    def pre_run(self, config: argparse.Namespace) -> None:
+        self._calls.append(f"pre_run:{self._step_type}")
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        self._calls.append(f"run:{self._step_type}")
+
+
+def test_wrappers_are_called_in_registration_order() -> None:
+    calls: List[str] = []
+    pipeline = StepWrappingPipeline([RecordingStep(calls, STEP_BUILD)], "test")
+
+    def make_wrapper(name: str) -> Callable[[BuildStep, str, Callable[[], None]], None]:
+        def wrapper(step: BuildStep, stage: str, call: Callable[[], None]) -> None:
+            calls.append(f"{name}-before:{stage}")
+            call()
+            calls.append(f"{name}-after:{stage}")
+
+        return wrapper
+
+    pipeline.add_step_wrapper(make_wrapper("outer"))
+    pipeline.add_step_wrapper(make_wrapper("inner"))
+    config = argparse.Namespace(steps=["all"], skip_steps=[])
+    pipeline.pre_run(config)
+    pipeline.run(config, {})
+
+    assert calls == [
+        f"outer-before:{STAGE_PRE_RUN}",
+        f"inner-before:{STAGE_PRE_RUN}",
+        f"pre_run:{STEP_BUILD}",
+        f"inner-after:{STAGE_PRE_RUN}",
+        f"outer-after:{STAGE_PRE_RUN}",
+        f"outer-before:{STAGE_BUILD}",
+        f"inner-before:{STAGE_BUILD}",
+        f"run:{STEP_BUILD}",
+        f"inner-after:{STAGE_BUILD}",
+        f"outer-after:{STAGE_BUILD}",
+    ]
+
+
+def test_filtered_steps_are_not_wrapped() -> None:
+    calls: List[str] = []
+    pipeline = StepWrappingPipeline([RecordingStep(calls, STEP_BUILD), RecordingStep(calls, STEP_VALIDATE)], "test")
+    wrapped: List[str] = []
+
+    def wrapper(step: BuildStep, stage: str, call: Callable[[], None]) -> None:
+        wrapped.append(stage)
+        call()
+
+    pipeline.add_step_wrapper(wrapper)
+    config = argparse.Namespace(steps=["all"], skip_steps=[STEP_VALIDATE])
+    pipeline.run(config, {})
+
+    assert calls == [f"run:{STEP_BUILD}"]
+    assert wrapped == [STAGE_BUILD]
@@ -0,0 +1,73 @@
+import os
+import threading
+from typing import List
+
+import pytest
+import yaml
+
+from app_build_suite.build_steps.helm import HelmSubchartValidator
+from app_build_suite.build_steps.steps import STEP_STATIC_CHECK
+from app_build_suite.build_steps.subcharts import SubchartValidationCache, find_subcharts, validate_subcharts
+from app_build_suite.errors import BuildError
+from tests.build_steps.helpers import get_test_config_parser
+
+
+def write_chart(chart_dir: str, name: str, with_values: bool = True) -> str:
+    os.makedirs(chart_dir)
+    with open(os.path.join(chart_dir, "Chart.yaml"), "w") as f:
+        yaml.dump({"apiVersion": "v2", "name": name, "version": "0.1.0"}, f)
+    if with_values:
+        with open(os.path.join(chart_dir, "values.yaml"), "w") as f:
+            f.write("replicas: 1\n")
+    return chart_dir
+
+
+def write_umbrella(root: str, name: str) -> str:
+    umbrella = write_chart(os.path.join(root, name), name)
+    write_chart(os.path.join(umbrella, "charts", "common"), "common")
+    write_chart(os.path.join(umbrella, "charts", "app"), "app")
+    write_chart(os.path.join(umbrella, "charts", "app", "charts", "broken"), "broken", with_values=False)
+    # packed subcharts are not validated
+    open(os.path.join(umbrella, "charts", "remote-1.0.0.tgz"), "w").close()
+    return umbrella
+
+
+def test_identical_subcharts_are_validated_once(tmp_path: pytest.TempPathFactory) -> None:
+    umbrellas = [write_umbrella(str(tmp_path), name) for name in ["first", "second"]]
+    validated: List[str] = []
+    lock = threading.Lock()
+
+    def validate(subchart_dir: str) -> List[str]:
+        with lock:
+            validated.append(os.path.basename(subchart_dir))
+        return ["broken"] if os.path.basename(subchart_dir) == "broken" else []
+
+    cache = SubchartValidationCache()
+    results = [validate_subcharts(find_subcharts(u), validate, cache, "options", 4) for u in umbrellas]
+
+    assert [r.chart_dir for r in results[1]] == [
+        os.path.join(umbrellas[1], "charts", "app"),
+        os.path.join(umbrellas[1], "charts", "app", "charts", "broken"),
+        os.path.join(umbrellas[1], "charts", "common"),
+    ]
+    assert sorted(validated) == ["app", "broken", "common"]
+    assert all(r.cached for r in results[1])
+    assert [r.succeeded for r in results[1]] == [True, False, True]
+
+
+def test_failures_are_attributed_to_subcharts(tmp_path: pytest.TempPathFactory) -> None:
+    umbrella = write_umbrella(str(tmp_path), "umbrella")
+    step = HelmSubchartValidator()
+    config_parser = get_test_config_parser()
+    step.initialize_config(config_parser)
+    step._gs_validator.initialize_config(config_parser)
+    config_parser.add_argument("--kubelinter-config", required=False)
+    config = config_parser.parse_known_args(
+        ["--validate-subcharts", "--disable-giantswarm-helm-validator", "--skip-steps", STEP_STATIC_CHECK]
+    )[0]
+    config.chart_dir = umbrella
+    step.pre_run(config)
+
+    broken_dir = os.path.join(umbrella, "charts", "app", "charts", "broken")
+    with pytest.raises(BuildError, match=f"\\['{broken_dir}'\\]"):
+        step.run(config, {})
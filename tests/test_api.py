@@ -0,0 +1,92 @@
+import argparse
+import hashlib
+import os
+from typing import List, Set
+
+import configargparse
+import pytest
+from step_exec_lib.errors import ConfigError
+from step_exec_lib.steps import BuildStep, BuildStepsFilteringPipeline
+from step_exec_lib.types import Context, StepType
+
+from app_build_suite.api import ChartBuilder
+from app_build_suite.build_steps.helm import context_key_chart_full_path
+from app_build_suite.build_steps.pipeline import STAGE_BUILD, STAGE_PRE_RUN, StepWrappingPipeline
+from app_build_suite.build_steps.steps import STEP_BUILD
+from app_build_suite.errors import BuildError
+
+
+class PackageStep(BuildStep):
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {STEP_BUILD}
+
+    def initialize_config(self, config_parser: configargparse.ArgParser) -> None:
+        config_parser.add_argument("--destination", required=False, default=".")
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        if os.path.basename(config.chart_dir) == "broken":
+            raise BuildError(self.name, "can't package")
+        chart_path = os.path.join(config.destination, f"{os.path.basename(config.chart_dir)}-0.1.0.tgz")
+        with open(chart_path, "wb") as f:
+            f.write(b"archive")
+        context[context_key_chart_full_path] = chart_path
+
+
+def test_builds_reuse_pipelines_and_report_results(tmp_path: pytest.TempPathFactory) -> None:
+    created: List[BuildStepsFilteringPipeline] = []
+
+    def create_pipeline() -> List[BuildStepsFilteringPipeline]:
+        created.append(StepWrappingPipeline([PackageStep()], "test"))
+        return [created[-1]]
+
+    builder = ChartBuilder(create_pipeline)
+    destination = str(tmp_path)
+
+    result = builder.build(os.path.join(destination, "app"), destination=destination)
+    failed_result = builder.build(os.path.join(destination, "broken"), destination=destination)
+
+    assert len(created) == 1
+    assert result.succeeded
+    assert result.chart_path == os.path.join(destination, "app-0.1.0.tgz")
+    assert result.digest == hashlib.sha256(b"archive").hexdigest()
+    assert [(s.name, s.stage, s.succeeded) for s in result.steps] == [
+        ("PackageStep", STAGE_PRE_RUN, True),
+        ("PackageStep", STAGE_BUILD, True),
+        ("PackageStep", "cleanup", True),
+    ]
+    assert not failed_result.succeeded
+    assert failed_result.chart_path is None
+    assert failed_result.error == "PackageStep: can't package"
+    with pytest.raises(ConfigError):
+        builder.build("app", no_such_option=True)
+    with pytest.raises(ConfigError):
+        builder.build("app", jobs=0)
+
+
+def test_unexpected_error_cleans_up_and_drops_pipelines(tmp_path: pytest.TempPathFactory) -> None:
+    created: List[BuildStepsFilteringPipeline] = []
+    cleanups: List[bool] = []
+
+    class CrashingStep(PackageStep):
+        def run(self, config: argparse.Namespace, context: Context) -> None:
+            if os.path.basename(config.chart_dir) == "crash":
+                raise RuntimeError("unexpected")
+            super().run(config, context)
+
+        def cleanup(self, config: argparse.Namespace, context: Context, has_build_failed: bool) -> None:
+            cleanups.append(has_build_failed)
+
+    def create_pipeline() -> List[BuildStepsFilteringPipeline]:
+        created.append(StepWrappingPipeline([CrashingStep()], "test"))
+        return [created[-1]]
+
+    builder = ChartBuilder(create_pipeline)
+    destination = str(tmp_path)
+
+    with pytest.raises(RuntimeError):
+        builder.build(os.path.join(destination, "crash"), destination=destination)
+    assert cleanups == [True]
+    assert builder.build(os.path.join(destination, "app"), destination=destination).succeeded
+    assert cleanups == [True, False]
+    assert len(created) == 2
@@ -0,0 +1,119 @@
+import argparse
+import os
+from typing import List, Set
+
+import pytest
+from step_exec_lib.steps import BuildStep
+from step_exec_lib.types import STEP_ALL, Context, StepType
+
+from app_build_suite.__main__ import get_global_config_parser
+from app_build_suite.build_steps.helm import HelmBuildFilteringPipeline
+from app_build_suite.build_steps.pipeline import STAGE_BUILD, ResumableStep, StepWrappingPipeline, current_context
+from app_build_suite.build_steps.steps import STEP_BUILD, STEP_VALIDATE
+from app_build_suite.checkpoints import get_checkpoint_dir, get_default_checkpoint_dir, step_checkpointer
+from app_build_suite.errors import BuildError
+from app_build_suite.runner import BuildRunner
+
+
+class LintStep(BuildStep):
+    def __init__(self, runs: List[str]) -> None:
+        self.runs = runs
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {STEP_VALIDATE}
+
+    def get_checkpoint_inputs(self, config: argparse.Namespace) -> List[str]:
+        return [config.chart_dir]
+
+    def get_checkpoint_options(self) -> List[str]:
+        return ["chart_dir", "lint_engine"]
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        self.runs.append(self.name)
+        context["lint_report"] = {"warnings": 2}
+
+
+class PackageStep(BuildStep):
+    def __init__(self, runs: List[str], fail: bool) -> None:
+        self.runs = runs
+        self.fail = fail
+        self.cleaned_up = False
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {STEP_BUILD}
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        self.runs.append(self.name)
+        assert context["lint_report"] == {"warnings": 2}
+        if self.fail:
+            raise BuildError(self.name, "failed")
+
+    def cleanup(self, config: argparse.Namespace, context: Context, has_build_failed: bool) -> None:
+        self.cleaned_up = True
+
+
+def build(config: argparse.Namespace, state_file: str, resume: bool, fail: bool) -> List[str]:
+    runs: List[str] = []
+    package_step = PackageStep(runs, fail)
+    pipeline = StepWrappingPipeline([LintStep(runs), package_step], "test")
+    pipeline.add_step_wrapper(step_checkpointer(config, state_file, resume))
+    runner = BuildRunner(config, [pipeline])
+    runner.run()
+    assert runner.has_failed == fail
+    assert package_step.cleaned_up
+    return runs
+
+
+def test_resumed_build_skips_steps_with_unchanged_inputs(tmp_path: pytest.TempPathFactory) -> None:
+    chart_dir = os.path.join(str(tmp_path), "chart")
+    os.makedirs(chart_dir)
+    with open(os.path.join(chart_dir, "values.yaml"), "w") as f:
+        f.write("replicas: 1\n")
+    state_file = os.path.join(str(tmp_path), "state", "chart.json")
+    config = argparse.Namespace(chart_dir=chart_dir, steps=[STEP_ALL], skip_steps=[], resume=False)
+
+    assert build(config, state_file, resume=False, fail=True) == ["LintStep", "PackageStep"]
+    # the lint step is skipped and its results are restored from the checkpoint
+    assert build(config, state_file, resume=True, fail=False) == ["PackageStep"]
+    # without '--resume' checkpoints are not used
+    assert build(config, state_file, resume=False, fail=False) == ["LintStep", "PackageStep"]
+
+    with open(os.path.join(chart_dir, "values.yaml"), "w") as f:
+        f.write("replicas: 2\n")
+    assert build(config, state_file, resume=True, fail=False) == ["LintStep", "PackageStep"]
+    config.lint_engine = "native"
+    assert build(config, state_file, resume=True, fail=False) == ["LintStep", "PackageStep"]
+
+
+def test_checkpoints_are_only_used_when_requested() -> None:
+    assert get_checkpoint_dir(argparse.Namespace(checkpoint_dir="", resume=False)) == ""
+    assert get_checkpoint_dir(argparse.Namespace(checkpoint_dir="", resume=True)) == get_default_checkpoint_dir()
+    assert get_checkpoint_dir(argparse.Namespace(checkpoint_dir="/tmp/abs", resume=False)) == "/tmp/abs"
+
+
+def test_configs_parsed_by_separate_runs_resume(tmp_path: pytest.TempPathFactory) -> None:
+    chart_dir = os.path.join(str(tmp_path), "chart")
+    os.makedirs(chart_dir)
+    state_file = os.path.join(str(tmp_path), "state", "chart.json")
+    pipeline = HelmBuildFilteringPipeline()
+    resumable_steps = [step for step in pipeline._pipeline if isinstance(step, ResumableStep)]
+    assert resumable_steps
+
+    def run_steps(resume: bool) -> List[str]:
+        config_parser = get_global_config_parser(add_help=False, default_config_files=[])
+        pipeline.initialize_config(config_parser)
+        config = config_parser.parse_args(["-c", chart_dir, "--resume"])
+        wrapper = step_checkpointer(config, state_file, resume)
+        runs: List[str] = []
+        token = current_context.set({})
+        try:
+            for step in resumable_steps:
+                wrapper(step, STAGE_BUILD, lambda: runs.append(step.name))
+        finally:
+            current_context.reset(token)
+        return runs
+
+    assert run_steps(resume=False) == [step.name for step in resumable_steps]
+    assert run_steps(resume=True) == []
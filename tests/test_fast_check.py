@@ -0,0 +1,94 @@
+import argparse
+import os
+import subprocess  # nosec
+from typing import List, Set
+
+import pytest
+from step_exec_lib.steps import BuildStep
+from step_exec_lib.types import Context, StepType
+
+from app_build_suite.build_steps.helm import HelmBuilderValidator
+from app_build_suite.fast_check import (
+    FastCheckReport,
+    FastCheckResult,
+    find_charts_of_files,
+    get_fast_check_failure,
+    get_staged_files,
+    run_fast_checks,
+)
+
+
+def write_file(path: str, content: str = "") -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+def test_only_charts_with_staged_files_are_found(tmp_path: pytest.TempPathFactory) -> None:
+    root = str(tmp_path)
+    for name in ["app-a", "app-b", "app-c"]:
+        write_file(os.path.join(root, "helm", name, "Chart.yaml"), f"name: {name}\n")
+    write_file(os.path.join(root, "helm", "app-a", "charts", "sub", "Chart.yaml"), "name: sub\n")
+    subprocess.run(["git", "init", "-q", root], check=True)  # nosec
+    staged = [
+        write_file(os.path.join(root, "helm", "app-a", "templates", "deployment.yaml")),
+        write_file(os.path.join(root, "helm", "app-a", "charts", "sub", "values.yaml")),
+        write_file(os.path.join(root, "helm", "app-b", "values.yaml")),
+        write_file(os.path.join(root, "README.md")),
+    ]
+    write_file(os.path.join(root, "helm", "app-c", "values.yaml"))
+    subprocess.run(["git", "-C", root, "add", *staged], check=True)  # nosec
+
+    files = get_staged_files(os.path.join(root, "helm"))
+    charts = find_charts_of_files(files, os.path.join(root, "helm"))
+
+    assert sorted(files) == sorted(staged)
+    assert charts == [os.path.join(root, "helm", name) for name in ["app-a", "app-a/charts/sub", "app-b"]]
+
+
+class SlowStep(BuildStep):
+    def __init__(self, clock: List[float]) -> None:
+        self.clock = clock
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return set()
+
+    def pre_run(self, config: argparse.Namespace) -> None:
+        self.clock[0] += 10
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        pass
+
+
+def test_fast_checks_report_failures_and_respect_budget(
+    tmp_path: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    root = str(tmp_path)
+    bad = os.path.dirname(write_file(os.path.join(root, "bad", "Chart.yaml")))
+    good = os.path.dirname(write_file(os.path.join(root, "good", "Chart.yaml")))
+    write_file(os.path.join(good, "values.yaml"))
+    late = os.path.join(root, "late")
+    clock = [0.0]
+    monkeypatch.setattr("app_build_suite.fast_check.time.monotonic", lambda: clock[0])
+
+    report = run_fast_checks(
+        argparse.Namespace(), [bad, good, late], 1.0, lambda: [HelmBuilderValidator(), SlowStep(clock)]
+    )
+
+    assert report.results[0].errors == ["HelmBuilderValidator: Can't find 'Chart.yaml' or 'values.yaml' files."]
+    assert report.results[1].succeeded
+    assert report.skipped == [late]
+
+
+def test_skipped_charts_fail_fast_check_unless_partial_checks_are_allowed() -> None:
+    checked = [FastCheckResult("/repo/a", [])]
+    partial = FastCheckReport(checked, ["/repo/b"])
+
+    assert get_fast_check_failure(FastCheckReport(checked, []), 1.0, False) is None
+    failure = get_fast_check_failure(partial, 1.0, False)
+    assert failure is not None and "1 chart(s) were not checked within 1.0s" in failure
+    assert get_fast_check_failure(partial, 1.0, True) is None
+    failed = FastCheckReport([FastCheckResult("/repo/a", ["error"])], ["/repo/b"])
+    assert get_fast_check_failure(failed, 1.0, True) == "Exit 1 due to failed fast checks."
@@ -0,0 +1,111 @@
+import argparse
+import os
+import threading
+from typing import Dict, List, Optional, Set
+
+import pytest
+import yaml
+from step_exec_lib.errors import ValidationError
+from step_exec_lib.steps import BuildStep
+from step_exec_lib.types import Context, StepType
+
+from app_build_suite.build_steps.steps import STEP_BUILD
+from app_build_suite.errors import BuildError
+from app_build_suite.monorepo import ChartBuildResult, MonorepoBuilder, build_dependency_graph, get_build_order
+from app_build_suite.runner import BuildRunner
+
+
+def write_chart(root: str, name: str, dependencies: Optional[List[str]] = None) -> str:
+    chart_dir = os.path.join(root, name)
+    os.makedirs(os.path.join(chart_dir, "charts", "vendored"))
+    chart_yaml = {
+        "apiVersion": "v2",
+        "name": name,
+        "version": "0.1.0",
+        "dependencies": [
+            {"name": dep, "version": "0.1.0", "repository": f"file://../{dep}"} for dep in dependencies or []
+        ]
+        + [{"name": "remote", "version": "1.0.0", "repository": "https://charts.example.com"}],
+    }
+    with open(os.path.join(chart_dir, "Chart.yaml"), "w") as f:
+        yaml.dump(chart_yaml, f)
+    # subcharts vendored in 'charts/' are not separate charts of the tree
+    with open(os.path.join(chart_dir, "charts", "vendored", "Chart.yaml"), "w") as f:
+        yaml.dump({"apiVersion": "v2", "name": "vendored", "version": "0.1.0"}, f)
+    return chart_dir
+
+
+@pytest.fixture
+def tree(tmp_path: pytest.TempPathFactory) -> str:
+    root = str(tmp_path)
+    write_chart(root, "lib")
+    write_chart(root, "app", ["lib"])
+    write_chart(root, "umbrella", ["app", "lib"])
+    write_chart(root, "other")
+    return root
+
+
+def test_graph_and_build_order(tree: str) -> None:
+    graph = build_dependency_graph(tree)
+
+    assert sorted(os.path.basename(d) for d in graph) == ["app", "lib", "other", "umbrella"]
+    umbrella = graph[os.path.join(tree, "umbrella")]
+    assert umbrella.dependencies == {"app": os.path.join(tree, "app"), "lib": os.path.join(tree, "lib")}
+    assert [os.path.basename(d) for d in get_build_order(graph)] == ["lib", "other", "app", "umbrella"]
+
+
+def test_cycles_are_detected(tmp_path: pytest.TempPathFactory) -> None:
+    write_chart(str(tmp_path), "a", ["b"])
+    write_chart(str(tmp_path), "b", ["a"])
+
+    with pytest.raises(ValidationError, match="cycle"):
+        get_build_order(build_dependency_graph(str(tmp_path)))
+
+
+def test_builder_passes_built_subcharts_and_skips_dependents_of_failed_charts(tree: str) -> None:
+    graph = build_dependency_graph(tree)
+    received: Dict[str, Dict[str, str]] = {}
+    lock = threading.Lock()
+
+    def build_chart(chart_dir: str, prebuilt: Dict[str, str]) -> ChartBuildResult:
+        name = os.path.basename(chart_dir)
+        with lock:
+            received[name] = prebuilt
+        if name == "app":
+            return ChartBuildResult(chart_dir, False, reason="build failed")
+        return ChartBuildResult(chart_dir, True, f"/dist/{name}-0.1.0.tgz")
+
+    results = MonorepoBuilder(graph, build_chart, jobs=4).run()
+
+    assert received["app"] == {"lib": "/dist/lib-0.1.0.tgz"}
+    assert "umbrella" not in received
+    umbrella_result = results[os.path.join(tree, "umbrella")]
+    assert not umbrella_result.succeeded
+    assert os.path.join(tree, "app") in umbrella_result.reason
+    assert results[os.path.join(tree, "other")].succeeded
+
+
+class FailingStep(BuildStep):
+    def __init__(self) -> None:
+        self.cleaned_up = False
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return {STEP_BUILD}
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        assert context["initial"] == 1
+        raise BuildError(self.name, "failed")
+
+    def cleanup(self, config: argparse.Namespace, context: Context, has_build_failed: bool) -> None:
+        self.cleaned_up = has_build_failed
+
+
+def test_build_runner_reports_failure_without_exiting() -> None:
+    step = FailingStep()
+    runner = BuildRunner(argparse.Namespace(), [step], {"initial": 1})
+
+    runner.run()
+
+    assert runner.has_failed
+    assert step.cleaned_up
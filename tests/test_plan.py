@@ -0,0 +1,67 @@
+import argparse
+import os
+from typing import Iterator
+
+import pytest
+
+from app_build_suite.build_steps.helm import HelmBuildFilteringPipeline
+from app_build_suite.build_steps.steps import STEP_VALIDATE
+from app_build_suite.history import BuildHistory
+from app_build_suite.plan import format_execution_plan, get_execution_plan
+from tests.build_steps.helpers import get_test_config_parser
+
+CHART_DIR = os.path.join(os.path.dirname(__file__), "build_steps", "res_test_helm")
+
+
+def get_config(pipeline: HelmBuildFilteringPipeline, *args: str) -> argparse.Namespace:
+    config_parser = get_test_config_parser()
+    pipeline.initialize_config(config_parser)
+    return config_parser.parse_args(["-c", CHART_DIR, *args])
+
+
+def test_plan_reflects_config_options() -> None:
+    pipeline = HelmBuildFilteringPipeline()
+    config = get_config(pipeline, "--skip-steps", STEP_VALIDATE, "--replace-chart-version-with-git")
+
+    plan = {e.step_name: e for e in get_execution_plan(config, [pipeline])}
+
+    assert not plan["HelmChartToolLinter"].will_run
+    assert not plan["GiantSwarmHelmValidator"].will_run
+    assert plan["HelmGitVersionSetter"].will_run
+    assert plan["KubeLinter"].will_run
+    assert not plan["HelmChartMetadataPreparer"].will_run
+    assert "generate-metadata" in plan["HelmChartMetadataPreparer"].reason
+    assert not plan["HelmRequirementsUpdater"].will_run
+    assert "lock" in plan["HelmRequirementsUpdater"].reason
+
+
+@pytest.fixture
+def history_file(tmp_path: pytest.TempPathFactory) -> Iterator[str]:
+    yield os.path.join(str(tmp_path), "history.json")
+
+
+def test_plan_uses_recorded_history(history_file: str) -> None:
+    history = BuildHistory(history_file)
+    ticks = iter([0.0, 2.0, 10.0, 14.0])
+    timer = history.step_timer(CHART_DIR, clock=lambda: next(ticks))
+    pipeline = HelmBuildFilteringPipeline()
+    kube_linter = next(s for s in pipeline.pipeline if s.name == "KubeLinter")
+    timer(kube_linter, "pre-run", lambda: None)
+    timer(kube_linter, "build", lambda: None)
+    history.save()
+
+    reloaded = BuildHistory(history_file)
+    config = get_config(pipeline)
+    plan = {e.step_name: e for e in get_execution_plan(config, [pipeline], reloaded)}
+
+    assert plan["KubeLinter"].expected_duration == pytest.approx(6.0)
+    assert plan["HelmChartBuilder"].expected_duration is None
+    assert "Expected total duration of steps with history: 6.00s" in format_execution_plan(config, list(plan.values()))
+
+
+def test_history_keeps_limited_number_of_samples(history_file: str) -> None:
+    history = BuildHistory(history_file)
+    for i in range(20):
+        history.record(CHART_DIR, "KubeLinter", "build", float(i))
+
+    assert history.get_expected_step_duration(CHART_DIR, "KubeLinter") == pytest.approx(14.5)
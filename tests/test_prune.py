@@ -0,0 +1,66 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+import yaml
+
+from app_build_suite.prune import RetentionPolicy, prune_catalog
+
+NOW = datetime(2022, 6, 1, 12, 0, 0)
+
+
+def add_chart_version(catalog_dir: str, name: str, version: str, age_days: int, with_meta: bool = True) -> str:
+    chart_file = f"{name}-{version}.tgz"
+    with open(os.path.join(catalog_dir, chart_file), "wb") as f:
+        f.write(b"archive")
+    if with_meta:
+        meta_dir = os.path.join(catalog_dir, f"{chart_file}-meta")
+        os.makedirs(meta_dir)
+        with open(os.path.join(meta_dir, "main.yaml"), "w") as f:
+            date_created = (NOW - timedelta(days=age_days)).isoformat(timespec="microseconds")
+            yaml.dump({"chartFile": chart_file, "dateCreated": date_created}, f)
+    return chart_file
+
+
+def test_versions_kept_by_no_policy_are_pruned_with_index_entries(tmp_path: pytest.TempPathFactory) -> None:
+    catalog = str(tmp_path)
+    charts = {
+        "old_tagged": add_chart_version(catalog, "hello-world-app", "0.1.0", 100),
+        "old_dev": add_chart_version(catalog, "hello-world-app", "0.1.1-6a8c3b2", 90),
+        "recent_dev": add_chart_version(catalog, "hello-world-app", "0.1.1-7b9d4c3", 5),
+        "latest": add_chart_version(catalog, "hello-world-app", "0.2.0-8cae5d4", 1),
+        # without metadata, so its modification time (now) is used
+        "other": add_chart_version(catalog, "other-app", "v1.0.0-rc1", 0, with_meta=False),
+    }
+    index = {
+        "apiVersion": "v1",
+        "entries": {
+            "hello-world-app": [
+                {"version": chart_file[len("hello-world-app-") : -len(".tgz")], "urls": [f"https://c.io/{chart_file}"]}
+                for chart_file in [charts["old_tagged"], charts["old_dev"], charts["recent_dev"], charts["latest"]]
+            ],
+        },
+    }
+    with open(os.path.join(catalog, "index.yaml"), "w") as f:
+        yaml.dump(index, f)
+    policy = RetentionPolicy(keep_last=1, keep_days=30, keep_tagged=True)
+
+    dry_run_report = prune_catalog(catalog, policy, dry_run=True, now=NOW)
+    assert [e.chart_file for e in dry_run_report.pruned] == [charts["old_dev"]]
+    assert os.path.exists(os.path.join(catalog, charts["old_dev"]))
+
+    report = prune_catalog(catalog, policy, now=NOW)
+
+    assert [e.chart_file for e in report.pruned] == [charts["old_dev"]]
+    assert report.removed_from_index == 1
+    assert not os.path.exists(os.path.join(catalog, charts["old_dev"]))
+    assert not os.path.exists(os.path.join(catalog, f"{charts['old_dev']}-meta"))
+    assert os.path.exists(os.path.join(catalog, charts["old_tagged"]))
+    with open(os.path.join(catalog, "index.yaml"), "r") as f:
+        versions = [v["version"] for v in yaml.safe_load(f)["entries"]["hello-world-app"]]
+    assert versions == ["0.1.0", "0.1.1-7b9d4c3", "0.2.0-8cae5d4"]
+
+    report = prune_catalog(catalog, RetentionPolicy(keep_last=1, keep_days=0, keep_tagged=False), now=NOW)
+    assert sorted(e.chart_file for e in report.pruned) == sorted([charts["old_tagged"], charts["recent_dev"]])
+    with open(os.path.join(catalog, "index.yaml"), "r") as f:
+        assert [v["version"] for v in yaml.safe_load(f)["entries"]["hello-world-app"]] == ["0.2.0-8cae5d4"]
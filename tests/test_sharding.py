@@ -0,0 +1,86 @@
+import os
+import subprocess  # nosec
+from typing import Dict
+
+import pytest
+import yaml
+from step_exec_lib.errors import ConfigError
+
+from app_build_suite.history import BuildHistory
+from app_build_suite.monorepo import ChartNode
+from app_build_suite.sharding import (
+    Shard,
+    assign_shards,
+    get_chart_costs,
+    get_connected_charts,
+    parse_shard,
+    select_shard,
+)
+
+
+def node(chart_dir: str, *dependencies: str) -> ChartNode:
+    return ChartNode(chart_dir, chart_dir, {d: d for d in dependencies})
+
+
+def test_parse_shard() -> None:
+    assert parse_shard("2/4") == Shard(2, 4)
+    for value in ["0/4", "5/4", "2", "a/b"]:
+        with pytest.raises(ConfigError):
+            parse_shard(value)
+
+
+def test_connected_charts_are_assigned_together_balancing_loads() -> None:
+    graph = {
+        "app": node("app", "lib"),
+        "lib": node("lib"),
+        "big": node("big"),
+        "small-1": node("small-1"),
+        "small-2": node("small-2"),
+        "umbrella": node("umbrella", "lib"),
+    }
+    costs = {"app": 10.0, "lib": 5.0, "umbrella": 10.0, "big": 20.0, "small-1": 4.0, "small-2": 3.0}
+
+    assert get_connected_charts(graph) == [["app", "lib", "umbrella"], ["big"], ["small-1"], ["small-2"]]
+    assignment = assign_shards(graph, costs, 2)
+    assert assignment.charts == [["app", "lib", "umbrella"], ["big", "small-1", "small-2"]]
+    assert assignment.loads == [25.0, 27.0]
+    # the assignment doesn't depend on the order of the graph
+    assert assign_shards(dict(reversed(list(graph.items()))), costs, 2) == assignment
+
+
+def test_charts_without_history_are_estimated_by_size(tmp_path: pytest.TempPathFactory) -> None:
+    sizes = {"known": 1000, "unknown": 3000}
+    for name, size in sizes.items():
+        os.makedirs(os.path.join(str(tmp_path), name))
+        with open(os.path.join(str(tmp_path), name, "Chart.yaml"), "w") as f:
+            yaml.dump({"apiVersion": "v2", "name": name, "version": "0.1.0"}, f)
+        with open(os.path.join(str(tmp_path), name, "values.yaml"), "wb") as f:
+            f.write(b"#" * (size - os.path.getsize(os.path.join(str(tmp_path), name, "Chart.yaml"))))
+    known, unknown = os.path.join(str(tmp_path), "known"), os.path.join(str(tmp_path), "unknown")
+    history = BuildHistory("")
+
+    assert get_chart_costs([known, unknown], history) == {known: 1000.0, unknown: 3000.0}
+    history.record(known, "HelmChartBuilder", "run", 2.0)
+    assert get_chart_costs([known, unknown], history) == {known: 2.0, unknown: 6.0}
+    # without a history shared by all the jobs, only sizes of charts are used
+    assert get_chart_costs([known, unknown], None) == {known: 1000.0, unknown: 3000.0}
+
+    graph: Dict[str, ChartNode] = {known: node(known), unknown: node(unknown)}
+    assert list(select_shard(graph, Shard(1, 2), history)) == [unknown]
+    assert list(select_shard(graph, Shard(2, 2), history)) == [known]
+
+
+def test_shards_dont_depend_on_checkout_path(tmp_path: pytest.TempPathFactory) -> None:
+    history_file = os.path.join(str(tmp_path), "history.json")
+    for job in ["job-1", "job-2"]:
+        os.makedirs(os.path.join(str(tmp_path), job, "repo", "helm", "app"))
+        subprocess.run(["git", "init", "-q", os.path.join(str(tmp_path), job, "repo")], check=True)  # nosec
+    history = BuildHistory(history_file)
+    history.record(os.path.join(str(tmp_path), "job-1", "repo", "helm", "app"), "HelmChartBuilder", "run", 10.0)
+    history.save()
+
+    # another job has the repository checked out somewhere else, but shares the history file
+    other = BuildHistory(history_file)
+    other_chart_dir = os.path.join(str(tmp_path), "job-2", "repo", "helm", "app")
+    assert other.chart_key(other_chart_dir) == os.path.join("helm", "app")
+    assert other.get_expected_chart_duration(other_chart_dir) == 10.0
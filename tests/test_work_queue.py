@@ -0,0 +1,144 @@
+import os
+import threading
+from typing import Dict, List, Optional
+
+import pytest
+import yaml
+
+from app_build_suite.monorepo import ChartBuildResult, build_dependency_graph
+from app_build_suite import work_queue
+from app_build_suite.work_queue import FileWorkQueue, QueueJob, QueueWorker, create_jobs, get_job_id
+
+
+def write_chart(root: str, name: str, dependencies: List[str]) -> None:
+    os.makedirs(os.path.join(root, name))
+    chart_yaml = {
+        "apiVersion": "v2",
+        "name": name,
+        "version": "0.1.0",
+        "dependencies": [{"name": dep, "version": "0.1.0", "repository": f"file://../{dep}"} for dep in dependencies],
+    }
+    with open(os.path.join(root, name, "Chart.yaml"), "w") as f:
+        yaml.dump(chart_yaml, f)
+
+
+@pytest.fixture
+def tree(tmp_path: pytest.TempPathFactory) -> str:
+    root = os.path.join(str(tmp_path), "repo")
+    write_chart(root, "lib", [])
+    write_chart(root, "app", ["lib"])
+    write_chart(root, "small", [])
+    write_chart(root, "broken", [])
+    write_chart(root, "uses-broken", ["broken"])
+    return root
+
+
+def test_workers_share_the_queue(tree: str, tmp_path: pytest.TempPathFactory) -> None:
+    queue_dir = os.path.join(str(tmp_path), "queue")
+    durations = {"lib": 30.0, "small": 1.0, "broken": 5.0}
+    graph = build_dependency_graph(tree)
+    jobs = create_jobs(graph, tree, lambda d: durations.get(os.path.basename(d), 0.0))
+    built: List[str] = []
+    received: Dict[str, Dict[str, str]] = {}
+    lock = threading.Lock()
+    # the first builds of both workers wait for each other, so neither worker claims a second job before
+    # the other one claimed its first
+    first_builds = threading.Barrier(2)
+
+    def build_chart(chart_dir: str, prebuilt: Dict[str, str]) -> ChartBuildResult:
+        name = os.path.basename(chart_dir)
+        with lock:
+            built.append(name)
+            received[name] = prebuilt
+            is_first_build = len(built) <= 2
+        if is_first_build:
+            first_builds.wait(timeout=5)
+        if name == "broken":
+            return ChartBuildResult(chart_dir, False, reason="build failed")
+        return ChartBuildResult(chart_dir, True, f"/dist/{name}-0.1.0.tgz")
+
+    workers = []
+    for worker_id in ["a", "b"]:
+        queue = FileWorkQueue(queue_dir, worker_id, lease_timeout=60)
+        # both workers add the same jobs, the queue keeps a single copy
+        queue.add_jobs(jobs)
+        workers.append(QueueWorker(queue, tree, build_chart, poll_interval=0.01))
+    all_results: List[Dict[str, ChartBuildResult]] = []
+    threads = [threading.Thread(target=lambda w=w: all_results.append(w.run())) for w in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert sorted(built) == ["app", "broken", "lib", "small"]
+    # jobs ready from the start are claimed with the longest expected duration first
+    assert set(built[:2]) == {"lib", "broken"}
+    assert received["app"] == {"lib": "/dist/lib-0.1.0.tgz"}
+    assert len(all_results) == 2 and all_results[0] == all_results[1]
+    results = all_results[0]
+    assert results[os.path.join(tree, "app")].succeeded
+    assert results[os.path.join(tree, "app")].chart_path == "/dist/app-0.1.0.tgz"
+    assert not results[os.path.join(tree, "uses-broken")].succeeded
+    assert "dependencies failed" in results[os.path.join(tree, "uses-broken")].reason
+
+
+def test_expired_lease_is_claimed_again(tmp_path: pytest.TempPathFactory) -> None:
+    now = [1000.0]
+    crashed = FileWorkQueue(str(tmp_path), "crashed", lease_timeout=60, clock=lambda: now[0])
+    other = FileWorkQueue(str(tmp_path), "other", lease_timeout=60, clock=lambda: now[0])
+    job_id = get_job_id("chart")
+
+    assert crashed.claim(job_id)
+    assert not other.claim(job_id)
+    now[0] += 61
+    assert other.claim(job_id)
+    # the original worker lost its lease and can't renew or release it anymore
+    assert not crashed.renew(job_id)
+    crashed.release(job_id)
+    assert not crashed.claim(job_id)
+    assert other.renew(job_id)
+
+
+def test_expired_lease_is_taken_over_by_one_worker(
+    tmp_path: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = [1000.0]
+    crashed, fast, late = (
+        FileWorkQueue(str(tmp_path), worker_id, lease_timeout=60, clock=lambda: now[0])
+        for worker_id in ["crashed", "fast", "late"]
+    )
+    job_id = get_job_id("chart")
+    assert crashed.claim(job_id)
+    now[0] += 61
+    read_lease = work_queue._read_lease
+
+    def read_lease_then_let_fast_claim(path: str) -> Optional[work_queue.Lease]:
+        lease = read_lease(path)
+        # 'fast' takes over the expired lease after 'late' has read it
+        monkeypatch.setattr(work_queue, "_read_lease", read_lease)
+        assert fast.claim(job_id)
+        return lease
+
+    monkeypatch.setattr(work_queue, "_read_lease", read_lease_then_let_fast_claim)
+    assert not late.claim(job_id)
+    assert fast.renew(job_id)
+    assert not late.renew(job_id)
+
+
+def test_build_is_discarded_when_lease_is_lost(tree: str, tmp_path: pytest.TempPathFactory) -> None:
+    queue_dir = os.path.join(str(tmp_path), "queue")
+    queue = FileWorkQueue(queue_dir, "slow", lease_timeout=60)
+    other = FileWorkQueue(queue_dir, "other", lease_timeout=60)
+    queue.add_jobs([QueueJob(get_job_id("small"), "small", {}, 1.0)])
+
+    def build_chart(chart_dir: str, _: Dict[str, str]) -> ChartBuildResult:
+        # another worker took over the job while it was being built
+        os.remove(os.path.join(queue_dir, "leases", f"{get_job_id('small')}.json"))
+        assert other.claim(get_job_id("small"))
+        other.complete(get_job_id("small"), {"chart_path": "small", "succeeded": False, "archive": None})
+        return ChartBuildResult(chart_dir, True, "/dist/small-0.1.0.tgz")
+
+    results = QueueWorker(queue, tree, build_chart, poll_interval=0.01).run()
+
+    assert not results[os.path.join(tree, "small")].succeeded
+    assert queue.get_result(get_job_id("small"))["worker_id"] == "other"
@@ -0,0 +1,59 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import pytest
+
+from app_build_suite.utils.batching import BatcherRegistry, MicroBatcher
+
+
+def test_concurrent_items_are_processed_in_one_batch() -> None:
+    batches: List[List[str]] = []
+
+    def run_batch(items: List[str]) -> Dict[str, str]:
+        batches.append(items)
+        return {item: item.upper() for item in items}
+
+    batcher: MicroBatcher[str, str] = MicroBatcher(run_batch, max_batch_size=3, max_wait=10)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(batcher.submit, ["a", "b", "c"]))
+
+    assert results == ["A", "B", "C"]
+    assert len(batches) == 1
+    assert sorted(batches[0]) == ["a", "b", "c"]
+
+
+def test_batch_is_processed_after_max_wait_when_not_full() -> None:
+    batcher: MicroBatcher[str, int] = MicroBatcher(lambda items: {i: len(items) for i in items}, 5, max_wait=0.01)
+
+    assert batcher.submit("a") == 1
+    assert batcher.submit("b") == 1
+
+
+def test_batch_error_is_raised_for_all_items() -> None:
+    started = threading.Barrier(2)
+
+    def run_batch(items: List[str]) -> Dict[str, str]:
+        raise RuntimeError("tool crashed")
+
+    batcher: MicroBatcher[str, str] = MicroBatcher(run_batch, max_batch_size=2, max_wait=10)
+
+    def submit(item: str) -> str:
+        started.wait()
+        return batcher.submit(item)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(submit, item) for item in ["a", "b"]]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="tool crashed"):
+                future.result()
+
+
+def test_registry_shares_batchers_by_key() -> None:
+    registry = BatcherRegistry()
+
+    first = registry.get(("ct", "lint"), lambda: MicroBatcher(dict, 2, 0))
+    second = registry.get(("ct", "lint"), lambda: MicroBatcher(dict, 2, 0))
+
+    assert first is second
+    assert registry.get(("kube-linter",), lambda: MicroBatcher(dict, 2, 0)) is not first
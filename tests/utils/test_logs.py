@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+from typing import Callable, Iterator, Set
+
+import pytest
+from step_exec_lib.steps import BuildStep
+from step_exec_lib.types import Context, StepType
+
+from app_build_suite.utils.logs import LOG_FORMAT_JSON, configure_logging, step_log_context
+
+
+class LoggingStep(BuildStep):
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return set()
+
+    def run(self, config: object, context: Context) -> None:
+        logging.getLogger("test").info("step info")
+        logging.getLogger("test").warning("step warning")
+
+
+@pytest.fixture
+def restore_root_logger() -> Iterator[None]:
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def run_wrapped(wrapper: Callable, step: BuildStep) -> None:
+    wrapper(step, "build", lambda: step.run(None, {}))
+
+
+@pytest.mark.usefixtures("restore_root_logger")
+def test_json_records_are_routed_to_step_files(tmp_path: pytest.TempPathFactory, capsys: pytest.CaptureFixture) -> None:
+    log_dir = os.path.join(str(tmp_path), "logs")
+    listener = configure_logging(logging.INFO, LOG_FORMAT_JSON, log_dir)
+    try:
+        logging.getLogger("test").info("outside of steps")
+        run_wrapped(step_log_context("charts/hello"), LoggingStep())
+    finally:
+        listener.stop()
+
+    with open(os.path.join(log_dir, "LoggingStep.log")) as f:
+        step_records = [json.loads(line) for line in f]
+    assert [r["message"] for r in step_records] == ["step info", "step warning"]
+    assert all(r["step"] == "LoggingStep" and r["chart"] == "charts/hello" for r in step_records)
+    assert all("timestamp" in r for r in step_records)
+
+    console_records = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert [r["message"] for r in console_records] == ["outside of steps", "step warning"]
+    assert console_records[0]["step"] is None
+
+
+@pytest.mark.usefixtures("restore_root_logger")
+def test_exceptions_are_logged_in_separate_json_field(capsys: pytest.CaptureFixture) -> None:
+    listener = configure_logging(logging.INFO, LOG_FORMAT_JSON)
+    try:
+        try:
+            raise ValueError("broken value")
+        except ValueError:
+            logging.getLogger("test").exception("step %s failed", "LoggingStep")
+    finally:
+        listener.stop()
+
+    records = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert records[0]["message"] == "step LoggingStep failed"
+    assert records[0]["exception"].startswith("Traceback")
+    assert "ValueError: broken value" in records[0]["exception"]
@@ -0,0 +1,135 @@
+import argparse
+import os
+import signal
+import subprocess  # nosec
+import sys
+import threading
+import time
+from typing import Callable, List, Set
+
+import pytest
+from step_exec_lib.errors import ConfigError
+from step_exec_lib.steps import BuildStep
+from step_exec_lib.types import Context, StepType
+
+from app_build_suite.build_steps.pipeline import STAGE_BUILD, STAGE_CLEANUP
+from app_build_suite.errors import BuildError
+from app_build_suite.utils.processes import parse_step_timeouts, process_limits, rlimits_supported, run_and_log
+
+
+class ToolStep(BuildStep):
+    def __init__(self, command: str) -> None:
+        self.command = command
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return set()
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        run_and_log([sys.executable, "-c", self.command], capture_output=True)
+
+
+def is_running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # killed processes that were not reaped yet by their new parent are zombies
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def get_config(**kwargs: object) -> argparse.Namespace:
+    defaults = {"step_timeouts": "", "default_step_timeout": 0, "child_max_memory": 0, "child_max_cpu_time": 0}
+    defaults.update(kwargs)
+    return argparse.Namespace(**defaults)
+
+
+def run_stage(wrapper: Callable, step: ToolStep, stage: str = STAGE_BUILD) -> None:
+    wrapper(step, stage, lambda: step.run(argparse.Namespace(), {}))
+
+
+def test_run_and_log_without_limits() -> None:
+    res = run_and_log([sys.executable, "-c", "print('hello')"], capture_output=True)
+
+    assert res.returncode == 0
+    assert res.stdout == "hello\n"
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="checks processes using /proc")
+def test_timeout_kills_whole_process_group(tmp_path: pytest.TempPathFactory) -> None:
+    pid_file = os.path.join(str(tmp_path), "child.pid")
+    # the tool starts a child of its own that would outlive it if only the direct child was killed
+    command = (
+        "import subprocess, sys, time; "
+        "p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']); "
+        f"open({pid_file!r}, 'w').write(str(p.pid)); time.sleep(60)"
+    )
+    wrapper = process_limits(get_config(step_timeouts="ToolStep=1"))
+
+    start = time.monotonic()
+    with pytest.raises(BuildError) as exc_info:
+        run_stage(wrapper, ToolStep(command))
+
+    assert time.monotonic() - start < 30
+    assert exc_info.value.source == "ToolStep"
+    with open(pid_file) as f:
+        grandchild_pid = int(f.read())
+    time.sleep(0.2)
+    assert not is_running(grandchild_pid)
+
+
+def test_cleanup_stage_is_not_limited() -> None:
+    wrapper = process_limits(get_config(default_step_timeout=0.5))
+
+    run_stage(wrapper, ToolStep("import time; time.sleep(1)"), STAGE_CLEANUP)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="rlimits enforcement differs between platforms")
+def test_memory_limit_is_applied() -> None:
+    wrapper = process_limits(get_config(child_max_memory=64))
+    command = [sys.executable, "-c", "b = bytearray(256 * 1024 * 1024)"]
+    results: List[subprocess.CompletedProcess] = []
+
+    wrapper(ToolStep(""), STAGE_BUILD, lambda: results.append(run_and_log(command, capture_output=True)))
+
+    assert results[0].returncode != 0
+    assert "MemoryError" in results[0].stderr
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="rlimits enforcement differs between platforms")
+def test_cpu_limit_is_applied_in_threads() -> None:
+    wrapper = process_limits(get_config(child_max_cpu_time=1))
+    command = [sys.executable, "-c", "while True: pass"]
+    results: List[subprocess.CompletedProcess] = []
+
+    def run() -> None:
+        wrapper(ToolStep(""), STAGE_BUILD, lambda: results.append(run_and_log(command, capture_output=True)))
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    # killed by the kernel when the hard limit is reached
+    assert [r.returncode for r in results] == [-signal.SIGKILL] * 2
+
+
+@pytest.mark.skipif(not rlimits_supported(), reason="resource limits require 'prlimit'")
+def test_limits_apply_to_processes_started_by_the_tool_right_away() -> None:
+    wrapper = process_limits(get_config(child_max_cpu_time=7))
+    child = "import resource; print(resource.getrlimit(resource.RLIMIT_CPU))"
+    command = [sys.executable, "-c", f"import subprocess, sys; subprocess.run([sys.executable, '-c', {child!r}])"]
+    results: List[subprocess.CompletedProcess] = []
+
+    wrapper(ToolStep(""), STAGE_BUILD, lambda: results.append(run_and_log(command, capture_output=True)))
+
+    assert results[0].stdout == "(7, 7)\n"
+
+
+def test_parse_step_timeouts() -> None:
+    assert parse_step_timeouts(" KubeLinter=10, HelmChartBuilder=2.5,") == {"KubeLinter": 10, "HelmChartBuilder": 2.5}
+    with pytest.raises(ConfigError):
+        parse_step_timeouts("KubeLinter")
+    with pytest.raises(ConfigError):
+        parse_step_timeouts("KubeLinter=-1")
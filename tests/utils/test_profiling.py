@@ -0,0 +1,58 @@
+import argparse
+import os
+import pstats
+import tracemalloc
+from typing import List, Set
+
+import pytest
+from step_exec_lib.steps import BuildStep
+from step_exec_lib.types import Context, StepType
+
+from app_build_suite.build_steps.pipeline import STAGE_BUILD, STAGE_PRE_RUN
+from app_build_suite.utils.profiling import step_profiler
+
+
+class AllocatingStep(BuildStep):
+    def __init__(self) -> None:
+        self.data: List[str] = []
+
+    @property
+    def steps_provided(self) -> Set[StepType]:
+        return set()
+
+    def pre_run(self, config: argparse.Namespace) -> None:
+        self.data = [str(i) for i in range(1000)]
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        self.data.extend(str(i) * 10 for i in range(10000))
+
+
+def test_all_stages_of_step_are_saved_to_one_profile(tmp_path: pytest.TempPathFactory) -> None:
+    output_dir = os.path.join(str(tmp_path), "profiles")
+    step = AllocatingStep()
+    wrapper = step_profiler(output_dir, trace_memory=True, top_n=3)
+
+    wrapper(step, STAGE_PRE_RUN, lambda: step.pre_run(argparse.Namespace()))
+    wrapper(step, STAGE_BUILD, lambda: step.run(argparse.Namespace(), {}))
+
+    stats = pstats.Stats(os.path.join(output_dir, "AllocatingStep.prof"))
+    profiled_functions = {func[2] for func in stats.stats}  # type: ignore[attr-defined]
+    assert {"pre_run", "run"} <= profiled_functions
+    with open(os.path.join(output_dir, "AllocatingStep.memory.txt")) as f:
+        summary = f.read().splitlines()
+    assert summary[0] == "== pre-run: top 3 allocation differences =="
+    assert summary[4] == "== build: top 3 allocation differences =="
+    assert "test_profiling.py" in summary[5]
+    assert not tracemalloc.is_tracing()
+
+
+def test_memory_summaries_of_previous_runs_are_overwritten(tmp_path: pytest.TempPathFactory) -> None:
+    output_dir = os.path.join(str(tmp_path), "profiles")
+    for _ in range(2):
+        step = AllocatingStep()
+        wrapper = step_profiler(output_dir, trace_memory=True, top_n=3)
+        wrapper(step, STAGE_PRE_RUN, lambda: step.pre_run(argparse.Namespace()))
+
+    with open(os.path.join(output_dir, "AllocatingStep.memory.txt")) as f:
+        summary = f.read().splitlines()
+    assert [line for line in summary if line.startswith("==")] == ["== pre-run: top 3 allocation differences =="]